@@ -0,0 +1,86 @@
+"""Compare the original per-group loop with the batched NumPy calculation of disaggregation
+allocation factors.
+
+The batched calculation is not faster: most of the time goes into the production volume lookup
+of each target, which both do once per target.
+
+Run with `python benchmarks/bench_allocation_factors.py`."""
+
+import random
+import timeit
+
+from loguru import logger
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.wrangling import add_keys, allocation_factors
+
+N_GROUPS = 10_000
+
+
+def synthetic_data(n_groups: int, seed: int = 42) -> tuple[list[list[dict]], dict]:
+    rng = random.Random(seed)
+    groups, lookup = [], {}
+    for index in range(n_groups):
+        source = {"name": f"a{index}", "location": "GLO", "reference product": "p", "unit": "kg"}
+        group = []
+        for location in rng.sample(["CH", "DE", "FR", "IT", "RoW", "US", "CN"], rng.randint(2, 5)):
+            target = source | {"location": location}
+            lookup[(target["name"], location, "p", "kg")] = {
+                "production_volume": rng.choice([0, rng.random() * 1e6])
+            }
+            group.append({"source": source, "target": target})
+        groups.append(group)
+    return groups, lookup
+
+
+def loop_disaggregated(data: list[dict], lookup: dict) -> dict:
+    """The per-group implementation which `allocation_factors` replaced, for comparison."""
+    for obj in data:
+        target = obj["target"]
+        key = (target["name"], target["location"], target["reference product"], target["unit"])
+        try:
+            obj["pv"] = lookup[key]["production_volume"]
+        except KeyError:
+            logger.warning("Missing target {ds}", ds=target)
+            obj["pv"] = 0
+
+    total = sum(obj["pv"] for obj in data)
+    if not total:
+        logger.warning("Total production is zero for source {s}", s=data[0]["source"])
+        return {
+            "source": data[0]["source"],
+            "targets": [obj["target"] | {"allocation": 1 / len(data)} for obj in data],
+        }
+    elif total < 0:
+        logger.warning("Total production is less than zero for source {s}", s=data[0]["source"])
+
+    return {
+        "source": data[0]["source"],
+        "targets": [obj["target"] | {"allocation": obj["pv"] / total} for obj in data if obj["pv"]],
+    }
+
+
+if __name__ == "__main__":
+    logger.remove()
+    groups, lookup = synthetic_data(N_GROUPS)
+    expected = [loop_disaggregated(group, lookup) for group in groups]
+    assert allocation_factors(groups, lookup, Diagnostics()) == expected
+
+    loop = min(
+        timeit.repeat(
+            lambda: [loop_disaggregated(group, lookup) for group in groups], number=1, repeat=7
+        )
+    )
+    batched = min(
+        timeit.repeat(lambda: allocation_factors(groups, lookup, Diagnostics()), number=1, repeat=7)
+    )
+    # Mappings in `generate_technosphere_mapping` carry their keys; see `wrangling.add_keys`
+    keyed = [add_keys(group) for group in groups]
+    batched_keyed = min(
+        timeit.repeat(lambda: allocation_factors(keyed, lookup, Diagnostics()), number=1, repeat=7)
+    )
+    print(f"{N_GROUPS} groups, {sum(len(g) for g in groups)} targets")
+    print(f"Original loop:        {loop * 1000:.1f} ms")
+    print(f"Batched:              {batched * 1000:.1f} ms ({loop / batched:.2f}x, identical output)")
+    print(f"Batched, stored keys: {batched_keyed * 1000:.1f} ms ({loop / batched_keyed:.2f}x)")
+    print("Ratios below 1x mean the batched calculation is slower than the original loop")
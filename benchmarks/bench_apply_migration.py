@@ -0,0 +1,74 @@
+"""Apply a published migration to a synthetic foreground inventory with one million exchanges.
+
+Run with `python benchmarks/bench_apply_migration.py`."""
+
+import random
+import time
+from pathlib import Path
+
+from ecoinvent_migrate.apply import (
+    ECOSPOLD2_KEY,
+    apply_migration,
+    compile_migration,
+    migration_data,
+)
+
+MIGRATION = (
+    Path(__file__).parent.parent / "outputs" / "ecoinvent-3.9.1-cutoff-ecoinvent-3.10-cutoff.json"
+)
+N_EXCHANGES = 1_000_000
+
+
+def synthetic_exchanges(data: dict, n: int, seed: int = 42) -> list[dict]:
+    """Exchanges where about one in five links to a migrated dataset."""
+    rng = random.Random(seed)
+    sources = [obj["source"] for verb in ("replace", "disaggregate") for obj in data.get(verb, [])]
+    others = [
+        {"name": f"unchanged {i}", "location": "GLO", "reference product": "p", "unit": "kg"}
+        for i in range(5000)
+    ]
+    return [
+        dict(rng.choice(sources) if rng.random() < 0.2 else rng.choice(others), amount=rng.random())
+        for _ in range(n)
+    ]
+
+
+def naive_apply(exchanges: list[dict], data: dict) -> list[dict]:
+    """Generic matching: compare each exchange against every migration entry."""
+    result = []
+    for exchange in exchanges:
+        for obj in data.get("replace", []):
+            if all(exchange.get(label) == obj["source"].get(label) for label in ECOSPOLD2_KEY):
+                result.append(exchange | obj["target"])
+                break
+        else:
+            for obj in data.get("disaggregate", []):
+                if all(exchange.get(label) == obj["source"].get(label) for label in ECOSPOLD2_KEY):
+                    result.extend(exchange | t for t in obj["targets"])
+                    break
+            else:
+                result.append(exchange)
+    return result
+
+
+if __name__ == "__main__":
+    data = migration_data(MIGRATION)
+    exchanges = synthetic_exchanges(data, N_EXCHANGES)
+
+    start = time.perf_counter()
+    compiled = compile_migration(data)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = apply_migration(exchanges, compiled)
+    apply_time = time.perf_counter() - start
+
+    sample = exchanges[:2000]
+    start = time.perf_counter()
+    naive_apply(sample, data)
+    naive_time = (time.perf_counter() - start) * len(exchanges) / len(sample)
+
+    print(f"{len(compiled)} migration entries, {len(exchanges)} exchanges -> {len(result)}")
+    print(f"Compile: {compile_time * 1000:.1f} ms")
+    print(f"Apply:   {apply_time:.2f} s ({len(exchanges) / apply_time:,.0f} exchanges/s)")
+    print(f"Naive (extrapolated from {len(sample)} exchanges): {naive_time:.1f} s")
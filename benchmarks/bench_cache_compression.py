@@ -0,0 +1,68 @@
+"""Compare file size, write time, and load time of release caches in each compression.
+
+Run with `python benchmarks/bench_cache_compression.py`. zstd is skipped unless Python 3.14 or
+`backports.zstd` is available."""
+
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from ecoinvent_migrate import utils
+from ecoinvent_migrate.utils import COMPRESSION_SUFFIXES, atomic_write_json, read_json
+
+N_DATASETS = 25_000
+
+
+def synthetic_data(n_datasets: int, seed: int = 42) -> list[dict]:
+    """`SOUPInfo` dictionaries shaped like those of a full release."""
+    rng = random.Random(seed)
+    words = ["market", "for", "production", "electricity", "heat", "steel", "treatment", "of"]
+    geographies = ["GLO", "RoW", "RER", "CH", "DE", "US", "CN", "IN", "BR"]
+    data = []
+    for _ in range(n_datasets):
+        activity = str(uuid.UUID(int=rng.getrandbits(128)))
+        product = str(uuid.UUID(int=rng.getrandbits(128)))
+        data.append(
+            {
+                "activity_name": " ".join(rng.choices(words, k=rng.randint(3, 8))),
+                "geography": rng.choice(geographies),
+                "product_name": " ".join(rng.choices(words, k=rng.randint(1, 4))),
+                "unit": rng.choice(["kg", "kWh", "MJ", "m3", "unit"]),
+                "production_volume": rng.random() * 1e9,
+                "filename": f"{activity}_{product}.spold",
+                "activity_uuid": activity,
+                "product_uuid": product,
+            }
+        )
+    return data
+
+
+def best_of(func, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    data = synthetic_data(N_DATASETS)
+    print(f"{N_DATASETS} datasets")
+    print(f"{'compression':<12} {'size (kB)':>10} {'write (ms)':>11} {'load (ms)':>10}")
+    with tempfile.TemporaryDirectory() as dirpath:
+        for compression, suffix in COMPRESSION_SUFFIXES.items():
+            if compression == "zstd" and utils.zstd is None:
+                print(f"{compression:<12} not available")
+                continue
+            filepath = Path(dirpath) / f"ecoinvent-3.10-cutoff{suffix}"
+            # Same formatting as `data_io.load_release_data`
+            indent = 2 if compression == "none" else None
+            write = best_of(
+                lambda: atomic_write_json(data, filepath, indent=indent, ensure_ascii=False)
+            )
+            load = best_of(lambda: read_json(filepath))
+            size = filepath.stat().st_size / 1024
+            print(f"{compression:<12} {size:>10.0f} {write * 1000:>11.1f} {load * 1000:>10.1f}")
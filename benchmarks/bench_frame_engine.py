@@ -0,0 +1,114 @@
+"""Compare the Python and pandas engines for geography resolution and the replace/disaggregate
+split at 100,000 mapping rows, with in-memory lookups and with SQLite `store.ReleaseLookup`s.
+
+Run with `python benchmarks/bench_frame_engine.py`."""
+
+import random
+import tempfile
+import time
+import warnings
+from copy import deepcopy
+from pathlib import Path
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.store import KEY_COLUMNS, ReleaseStore
+from ecoinvent_migrate.wrangling import (
+    add_keys,
+    resolve_glo_row_rer_roe,
+    split_replace_disaggregate,
+)
+
+N_ROWS = 100_000
+
+
+def ds(name: str, geography: str) -> dict:
+    return {"activity_name": name, "geography": geography, "product_name": "p", "unit": "kg"}
+
+
+def synthetic_data(n_rows: int, seed: int = 42) -> tuple[list[dict], dict, dict]:
+    """Mappings where a third of the sources are split over several targets, and a fifth of the
+    datasets are only in the lookups with a `RoW` or `RoE` geography."""
+    rng = random.Random(seed)
+    source_lookup, target_lookup, data = {}, {}, []
+    for index in range(n_rows):
+        source = ds(f"a{rng.randint(0, n_rows * 2 // 3)}", rng.choice(["GLO", "RER", "CH", "US"]))
+        target = ds(f"b{index}", rng.choice(["GLO", "RER", "CH", "US"]))
+        for obj, lookup in ((source, source_lookup), (target, target_lookup)):
+            choice, geography = rng.random(), obj["geography"]
+            if choice < 0.2:
+                geography = {"GLO": "RoW", "RER": "RoE"}.get(geography, geography)
+            elif choice > 0.95:
+                continue
+            lookup[(obj["activity_name"], geography, "p", "kg")] = {
+                "production_volume": rng.random() * 1e6
+            }
+        data.append({"source": source, "target": target})
+    return data, source_lookup, target_lookup
+
+
+def timed(func, data: list[dict], repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        given = deepcopy(data)
+        start = time.perf_counter()
+        result = func(given)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    # The pandas engine warns about in-memory lookups, which are measured here on purpose
+    warnings.simplefilter("ignore", UserWarning)
+    data, source_lookup, target_lookup = synthetic_data(N_ROWS)
+    data = add_keys(data)
+    print(
+        f"{N_ROWS} mappings, {len(source_lookup)} source and {len(target_lookup)} target datasets"
+    )
+
+    for label, func in [
+        (
+            "Resolve",
+            lambda engine: lambda given: resolve_glo_row_rer_roe(
+                given, "s", "t", source_lookup, target_lookup, Diagnostics(), engine=engine
+            ),
+        ),
+        (
+            "Split",
+            lambda engine: lambda given: split_replace_disaggregate(
+                given, target_lookup, Diagnostics(), engine=engine
+            ),
+        ),
+    ]:
+        python_time, python_result = timed(func("python"), data)
+        pandas_time, pandas_result = timed(func("pandas"), data)
+        assert python_result == pandas_result
+        print(f"{label} python: {python_time * 1000:.1f} ms")
+        print(
+            f"{label} pandas: {pandas_time * 1000:.1f} ms ({python_time / pandas_time:.1f}x, "
+            "identical output)"
+        )
+
+    # Every probe of a `ReleaseLookup` is a SQLite query; the pandas engine reads each lookup once
+    with tempfile.TemporaryDirectory() as dirpath:
+        store = ReleaseStore(Path(dirpath) / "releases.sqlite")
+        for version, lookup in (("source", source_lookup), ("target", target_lookup)):
+            rows = [dict(zip(KEY_COLUMNS, key), **value) for key, value in lookup.items()]
+            store.add_release(version, "cutoff", rows)
+        store_source, store_target = store.lookup("source", "cutoff"), store.lookup(
+            "target", "cutoff"
+        )
+
+        def resolve_store(engine: str):
+            return lambda given: resolve_glo_row_rer_roe(
+                given, "s", "t", store_source, store_target, Diagnostics(), engine=engine
+            )
+
+        python_time, python_result = timed(resolve_store("python"), data, repeat=1)
+        pandas_time, pandas_result = timed(resolve_store("pandas"), data, repeat=1)
+        store.close()
+        assert python_result == pandas_result
+        print(f"Resolve with ReleaseLookup python: {python_time * 1000:.1f} ms")
+        print(
+            f"Resolve with ReleaseLookup pandas: {pandas_time * 1000:.1f} ms "
+            f"({python_time / pandas_time:.1f}x, identical output)"
+        )
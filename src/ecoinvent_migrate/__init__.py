@@ -2,10 +2,22 @@
 
 __all__ = (
     "__version__",
+    "apply_migration",
+    "compile_migration",
     "generate_technosphere_mapping",
     "generate_biosphere_mapping",
+    "generate_mappings",
+    "iter_biosphere_mapping",
+    "iter_technosphere_mapping",
 )
 
 __version__ = "0.6.2"
 
-from ecoinvent_migrate.main import generate_biosphere_mapping, generate_technosphere_mapping
+from ecoinvent_migrate.apply import apply_migration, compile_migration
+from ecoinvent_migrate.main import (
+    generate_biosphere_mapping,
+    generate_mappings,
+    generate_technosphere_mapping,
+    iter_biosphere_mapping,
+    iter_technosphere_mapping,
+)
@@ -0,0 +1,5 @@
+import sys
+
+from ecoinvent_migrate.cli import main
+
+sys.exit(main())
@@ -0,0 +1,126 @@
+"""Apply generated technosphere migrations to foreground inventory exchanges.
+
+Exchanges are dictionaries which use the same labels as the migration files, i.e. `name`,
+`location`, `reference product`, and `unit`, plus numeric fields like `amount`.
+
+The `replace` and `disaggregate` sections of a migration are compiled into hash tables on the
+four-label key, so relinking is one dictionary lookup per exchange.
+
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Union
+
+from randonneur import Datapackage
+
+ECOSPOLD2_KEY = ("name", "location", "reference product", "unit")
+
+
+def ecospold2_key(obj: dict) -> tuple:
+    return tuple(obj.get(label) for label in ECOSPOLD2_KEY)
+
+
+def migration_data(migration: Union[Datapackage, dict, Path]) -> dict:
+    """Get the verb sections from a `Datapackage`, JSON filepath, or already loaded dictionary."""
+    if isinstance(migration, Datapackage):
+        return migration.data
+    elif isinstance(migration, (str, Path)):
+        return json.load(open(migration, encoding="utf-8"))
+    return migration
+
+
+@dataclass
+class CompiledMigration:
+    """Migration indexed on the source key.
+
+    * `replace` maps a source key to `(target attributes, conversion factor)`
+    * `disaggregate` maps a source key to a list of `(target attributes, allocation)`
+
+    """
+
+    replace: dict[tuple, tuple[dict, float]] = field(default_factory=dict)
+    disaggregate: dict[tuple, list[tuple[dict, float]]] = field(default_factory=dict)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.replace or key in self.disaggregate
+
+    def __len__(self) -> int:
+        return len(self.replace) + len(self.disaggregate)
+
+
+def compile_migration(migration: Union[Datapackage, dict, Path]) -> CompiledMigration:
+    data = migration_data(migration)
+    compiled = CompiledMigration()
+    for obj in data.get("replace", []):
+        compiled.replace[ecospold2_key(obj["source"])] = (
+            obj["target"],
+            obj.get("conversion_factor", 1.0),
+        )
+    for obj in data.get("disaggregate", []):
+        compiled.disaggregate[ecospold2_key(obj["source"])] = [
+            (
+                {key: value for key, value in target.items() if key != "allocation"},
+                target["allocation"],
+            )
+            for target in obj["targets"]
+        ]
+    return compiled
+
+
+def _scaled(exchange: dict, target: dict, factor: float, scale_fields: tuple[str, ...]) -> dict:
+    new = exchange | target
+    if factor != 1:
+        for label in scale_fields:
+            if label in new:
+                new[label] = new[label] * factor
+    return new
+
+
+def apply_migration(
+    exchanges: Iterable[dict],
+    migration: Union[CompiledMigration, Datapackage, dict, Path],
+    scale_fields: tuple[str, ...] = ("amount",),
+) -> list[dict]:
+    """Relink `exchanges` using `migration` in a single pass.
+
+    `replace` changes the exchange attributes to the target attributes, multiplying the
+    `scale_fields` by the `conversion_factor` if given. `disaggregate` splits an exchange into one
+    exchange per target, with `scale_fields` multiplied by the target `allocation`. Exchanges which
+    aren't matched are returned unchanged; relinked exchanges are new dictionaries.
+
+    """
+    if not isinstance(migration, CompiledMigration):
+        migration = compile_migration(migration)
+    replace, disaggregate = migration.replace, migration.disaggregate
+
+    result = []
+    for exchange in exchanges:
+        get = exchange.get
+        key = (get("name"), get("location"), get("reference product"), get("unit"))
+        if key in replace:
+            target, factor = replace[key]
+            result.append(_scaled(exchange, target, factor, scale_fields))
+        elif key in disaggregate:
+            for target, allocation in disaggregate[key]:
+                result.append(_scaled(exchange, target, allocation, scale_fields))
+        else:
+            result.append(exchange)
+    return result
+
+
+def apply_migration_to_datasets(
+    datasets: Iterable[dict],
+    migration: Union[CompiledMigration, Datapackage, dict, Path],
+    scale_fields: tuple[str, ...] = ("amount",),
+) -> list[dict]:
+    """Relink the `exchanges` of each dataset in `datasets`. Datasets are modified in place."""
+    if not isinstance(migration, CompiledMigration):
+        migration = compile_migration(migration)
+    datasets = list(datasets)
+    for dataset in datasets:
+        dataset["exchanges"] = apply_migration(
+            dataset.get("exchanges", []), migration, scale_fields
+        )
+    return datasets
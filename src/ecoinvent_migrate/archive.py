@@ -0,0 +1,76 @@
+"""Read members straight out of downloaded `.7z` release archives, without extracting to disk."""
+
+import io
+from pathlib import Path
+from typing import Callable, Iterable
+
+import py7zr
+from py7zr import Py7zIO, WriterFactory
+
+SPOLD_SUFFIXES = {".xml", ".spold"}
+
+
+class _CallbackIO(Py7zIO):
+    """In-memory buffer for one archive member. Passes its content to `callback` when complete."""
+
+    def __init__(self, filename: str, callback: Callable[[str, bytes], None]):
+        self.filename = filename
+        self.callback = callback
+        self.buffer = io.BytesIO()
+        self.processed = False
+
+    def write(self, s: bytes | bytearray) -> int:
+        return self.buffer.write(s)
+
+    def read(self, size: int | None = None) -> bytes:
+        return self.buffer.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.buffer.seek(offset, whence)
+
+    def flush(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return self.buffer.getbuffer().nbytes
+
+    def close(self) -> None:
+        if not self.processed:
+            self.processed = True
+            self.callback(self.filename, self.buffer.getvalue())
+            self.buffer = io.BytesIO()
+
+
+class _CallbackFactory(WriterFactory):
+    def __init__(self, callback: Callable[[str, bytes], None]):
+        self.callback = callback
+        self.writers = []
+
+    def create(self, filename: str) -> Py7zIO:
+        writer = _CallbackIO(filename, self.callback)
+        self.writers.append(writer)
+        return writer
+
+
+def archive_member_names(archive_path: Path, directory: str = "datasets") -> list[str]:
+    """List the names of the spold members in `directory` of the archive."""
+    with py7zr.SevenZipFile(archive_path, "r") as archive:
+        return [
+            name
+            for name in archive.getnames()
+            if Path(name).parent.name == directory and Path(name).suffix.lower() in SPOLD_SUFFIXES
+        ]
+
+
+def read_archive_members(
+    archive_path: Path, names: Iterable[str], callback: Callable[[str, bytes], None]
+) -> None:
+    """Decompress the members `names` of the archive, calling `callback(name, content)` for each.
+
+    Only one member is held in memory at a time; nothing is written to disk."""
+    factory = _CallbackFactory(callback)
+    with py7zr.SevenZipFile(archive_path, "r") as archive:
+        archive.extract(targets=list(names), factory=factory)
+    # Older `py7zr` versions don't call `close` on completed members
+    for writer in factory.writers:
+        writer.close()
@@ -0,0 +1,142 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+# Weights for attributes which agree between a deleted flow and a candidate successor
+MATCH_WEIGHTS = {
+    "name": 0.4,
+    "cas": 0.25,
+    "formula": 0.1,
+    "context": 0.15,
+    "unit": 0.1,
+}
+
+# Dimension and scale of the elementary flow units which can be converted into each other
+UNIT_SCALES = {
+    "kg": ("mass", 1.0),
+    "g": ("mass", 1e-3),
+    "mg": ("mass", 1e-6),
+    "t": ("mass", 1e3),
+    "MJ": ("energy", 1.0),
+    "kJ": ("energy", 1e-3),
+    "kWh": ("energy", 3.6),
+    "m3": ("volume", 1.0),
+    "l": ("volume", 1e-3),
+    "kBq": ("radioactivity", 1.0),
+    "Bq": ("radioactivity", 1e-3),
+    "m2": ("area", 1.0),
+    "ha": ("area", 1e4),
+    "km2": ("area", 1e6),
+    "m2*year": ("area time", 1.0),
+    "ha*year": ("area time", 1e4),
+}
+
+
+def unit_conversion_factor(source_unit: str, target_unit: str) -> Optional[float]:
+    """Factor to multiply amounts in `source_unit` by to get amounts in `target_unit`.
+
+    Returns `None` if the units can't be converted; see `UNIT_SCALES`."""
+    if source_unit == target_unit:
+        return 1.0
+    if source_unit not in UNIT_SCALES or target_unit not in UNIT_SCALES:
+        return None
+    source_dimension, source_scale = UNIT_SCALES[source_unit]
+    target_dimension, target_scale = UNIT_SCALES[target_unit]
+    if source_dimension != target_dimension:
+        return None
+    return source_scale / target_scale
+
+
+def _text(obj: Optional[dict]) -> Optional[str]:
+    if not obj:
+        return None
+    text = obj["#text"] if isinstance(obj, dict) else obj
+    return text.strip() if text else None
+
+
+def elementary_flows(ecospold: dict) -> dict[str, dict]:
+    """Get the attributes used for matching from parsed `ElementaryExchanges.xml` data.
+
+    Returns a dictionary of `{uuid: {"name", "formula", "unit", "cas", "context"}}`."""
+    return {
+        obj["@id"]: {
+            "name": obj["name"]["#text"].strip(),
+            "formula": obj.get("@formula").strip() if obj.get("@formula") else None,
+            "unit": obj["unitName"]["#text"].strip(),
+            "cas": obj.get("@casNumber").strip() if obj.get("@casNumber") else None,
+            "context": (
+                _text(obj.get("compartment", {}).get("compartment")),
+                _text(obj.get("compartment", {}).get("subcompartment")),
+            ),
+        }
+        for obj in ecospold["validElementaryExchanges"]["elementaryExchange"]
+    }
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, remove punctuation and bracketed qualifiers, and collapse whitespace.
+
+    `"Carbon dioxide, fossil (obsolete)"` becomes `"carbon dioxide fossil"`."""
+    name = re.sub(r"\(.*?\)", " ", name.lower())
+    return " ".join(re.sub(r"[^\w+-]", " ", name).split())
+
+
+@dataclass
+class FlowCandidate:
+    uuid: str
+    flow: dict
+    confidence: float
+
+
+class FlowMatcher:
+    """Propose successors for deleted elementary flows among `target_flows`.
+
+    Target flows are indexed on their normalized name, on their CAS number, and on their formula
+    combined with the compartment context; a formula alone is too common to narrow down the
+    candidates. Each deleted flow probes these indices once, so matching is linear in the number
+    of flows instead of comparing all pairs. Candidates are scored with `MATCH_WEIGHTS` on the
+    attributes which agree.
+    """
+
+    def __init__(self, target_flows: dict[str, dict]):
+        self.flows = target_flows
+        self.index = defaultdict(set)
+        for uuid, flow in target_flows.items():
+            for key in self._keys(flow):
+                self.index[key].add(uuid)
+
+    @staticmethod
+    def _keys(flow: dict) -> list[tuple]:
+        keys = [("name", normalize_name(flow["name"]))]
+        if flow.get("cas"):
+            keys.append(("cas", flow["cas"]))
+        if flow.get("formula"):
+            keys.append(("formula", flow["formula"], flow.get("context")))
+        return keys
+
+    @staticmethod
+    def score(flow: dict, candidate: dict) -> float:
+        checks = {
+            "name": normalize_name(flow["name"]) == normalize_name(candidate["name"]),
+            "cas": bool(flow.get("cas")) and flow.get("cas") == candidate.get("cas"),
+            "formula": bool(flow.get("formula"))
+            and flow.get("formula") == candidate.get("formula"),
+            "context": flow.get("context") == candidate.get("context"),
+            "unit": flow["unit"] == candidate["unit"],
+        }
+        return round(sum(MATCH_WEIGHTS[key] for key, value in checks.items() if value), 6)
+
+    def match(self, flow: dict) -> Optional[FlowCandidate]:
+        """Return the best scoring candidate for `flow`, or `None` if there is no candidate or
+        several candidates have the same best score."""
+        uuids = set().union(*(self.index.get(key, set()) for key in self._keys(flow)))
+        if not uuids:
+            return None
+        scored = sorted(
+            ((self.score(flow, self.flows[uuid]), uuid) for uuid in uuids), reverse=True
+        )
+        if len(scored) > 1 and scored[0][0] == scored[1][0]:
+            return None
+        confidence, uuid = scored[0]
+        return FlowCandidate(uuid=uuid, flow=self.flows[uuid], confidence=confidence)
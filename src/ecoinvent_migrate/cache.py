@@ -0,0 +1,157 @@
+"""List and prune the files in the local cache directory.
+
+The cache directory holds the release caches from `data_io.load_release_data`, the release
+listings of `ei_release.CachedRelease`, and the optional SQLite `store.ReleaseStore`. It only
+grows, so old releases can be removed by age, by version, or with LRU eviction down to a disk
+budget:
+
+```python
+>>> from ecoinvent_migrate.cache import cache_entries, prune_cache
+>>> for entry in cache_entries():
+...     print(entry.path.name, entry.size, entry.last_used)
+>>> prune_cache(max_size=500 * 1024**2)
+```
+
+Reading a cache file marks it as used; see `utils.mark_used`. Release downloads and change
+reports are kept in the `ecoinvent_interface` storage, and are not managed here.
+
+"""
+
+import datetime
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from filelock import FileLock, Timeout
+from loguru import logger
+
+from ecoinvent_migrate.data_io import release_lock_filepath
+from ecoinvent_migrate.utils import COMPRESSION_SUFFIXES, cache_dir, lock_filepath
+
+
+@dataclass
+class CacheEntry:
+    """One file in the cache directory.
+
+    `kind` is `release` for release caches, which also have a `version` and `system_model`,
+    `metadata` for the release listings, and `store` for the SQLite release store. `last_used`
+    is a UNIX timestamp."""
+
+    path: Path
+    kind: str
+    size: int
+    last_used: float
+    version: Optional[str] = None
+    system_model: Optional[str] = None
+
+    @property
+    def last_used_datetime(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.last_used, tz=datetime.timezone.utc)
+
+
+def _entry(filepath: Path) -> Optional[CacheEntry]:
+    name, kwargs = filepath.name, {}
+    if name == "release-metadata.json":
+        kind = "metadata"
+    elif name == "releases.sqlite":
+        kind = "store"
+    elif name.startswith("ecoinvent-") and (
+        suffix := next((x for x in COMPRESSION_SUFFIXES.values() if name.endswith(x)), None)
+    ):
+        kind = "release"
+        version, _, system_model = (
+            name.removesuffix(suffix).removeprefix("ecoinvent-").partition("-")
+        )
+        kwargs = {"version": version, "system_model": system_model}
+    else:
+        return None
+    try:
+        stat = filepath.stat()
+    except FileNotFoundError:
+        return None
+    # Writing a file counts as using it
+    return CacheEntry(
+        path=filepath,
+        kind=kind,
+        size=stat.st_size,
+        last_used=max(stat.st_atime, stat.st_mtime),
+        **kwargs,
+    )
+
+
+def cache_entries() -> list[CacheEntry]:
+    """List the cache files, least recently used first.
+
+    Lock files and temporary files of unfinished writes are not included."""
+    entries = [entry for fp in cache_dir().iterdir() if (entry := _entry(fp)) is not None]
+    return sorted(entries, key=lambda entry: (entry.last_used, entry.path.name))
+
+
+def _lock_path(entry: CacheEntry) -> Path:
+    # Release caches are locked by release, whatever their compression
+    if entry.kind == "release":
+        return release_lock_filepath(entry.version, entry.system_model)
+    return lock_filepath(entry.path)
+
+
+def _remove(entry: CacheEntry) -> bool:
+    """Remove the cache file of `entry`, unless another process is creating it right now.
+
+    The empty lock file is kept: deleting it while another process waits for the lock would let
+    that process and a later one each lock a different file for the same cache."""
+    try:
+        with FileLock(_lock_path(entry), timeout=0):
+            entry.path.unlink(missing_ok=True)
+    except Timeout:
+        logger.warning("Not removing {fp}, which is in use", fp=str(entry.path))
+        return False
+    logger.info("Removed cache file {fp}", fp=str(entry.path))
+    return True
+
+
+def prune_cache(
+    max_age: Optional[float] = None,
+    versions: Optional[Iterable[str]] = None,
+    keep_versions: Optional[Iterable[str]] = None,
+    max_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> list[CacheEntry]:
+    """Remove cache files, and return the removed entries.
+
+    * `max_age`: Remove files not used in the last `max_age` days
+    * `versions`: Remove the release caches of these versions
+    * `keep_versions`: Remove the release caches of all other versions
+    * `max_size`: Then remove the least recently used files until the cache directory uses at
+      most `max_size` bytes
+
+    With `dry_run`, nothing is removed; the return value lists what would be removed. Files locked
+    by a running cache creation are skipped."""
+    entries = cache_entries()
+    now = time.time()
+    versions = set(versions) if versions is not None else None
+    keep_versions = set(keep_versions) if keep_versions is not None else None
+
+    def selected(entry: CacheEntry) -> bool:
+        if max_age is not None and now - entry.last_used > max_age * 24 * 60 * 60:
+            return True
+        if entry.kind != "release":
+            return False
+        return (versions is not None and entry.version in versions) or (
+            keep_versions is not None and entry.version not in keep_versions
+        )
+
+    removals = [entry for entry in entries if selected(entry)]
+    if max_size is not None:
+        remaining = [entry for entry in entries if entry not in removals]
+        total = sum(entry.size for entry in remaining)
+        # `remaining` is sorted by last use, so this evicts the least recently used files
+        for entry in remaining:
+            if total <= max_size:
+                break
+            removals.append(entry)
+            total -= entry.size
+
+    if dry_run:
+        return removals
+    return [entry for entry in removals if _remove(entry)]
@@ -0,0 +1,342 @@
+"""Command line interface for maintenance tasks.
+
+Run `ecoinvent-migrate --help` (or `python -m ecoinvent_migrate --help`) for usage."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+
+def validate_patches_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.validation import validate_all_patches
+
+    pairs = [tuple(pair.split(":")) for pair in args.pair] if args.pair else None
+    reports = validate_all_patches(system_model=args.system_model, pairs=pairs)
+    for report in reports:
+        print(report.summary())
+        for label, keys in (
+            ("Dangling source", report.dangling_sources),
+            ("Missing target", report.missing_targets),
+            ("Overlapping patch", report.overlapping),
+        ):
+            for key in keys:
+                print(f"\t{label}: {key}")
+    return int(not all(report.ok for report in reports))
+
+
+def cached_lookup(version: str, system_model: str) -> dict:
+    from ecoinvent_migrate.data_io import load_cached_release_data
+
+    lookup = load_cached_release_data(version, system_model)
+    if lookup is None:
+        raise SystemExit(f"Release data for {version} {system_model} not in local cache")
+    return lookup
+
+
+def validate_migration_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.apply import migration_data
+    from ecoinvent_migrate.validation import validate_migration
+
+    report = validate_migration(
+        migration_data(Path(args.migration)),
+        cached_keys(args.target_version, args.system_model),
+        tolerance=args.tolerance,
+    )
+    print(report.summary())
+    for key in report.missing_targets:
+        print(f"\tMissing target: {key}")
+    for key, total in report.bad_allocations:
+        print(f"\tAllocation total {total}: {key}")
+    return int(not report.ok)
+
+
+def cached_keys(version: Optional[str], system_model: str) -> Optional[set]:
+    if version is None:
+        return None
+    return set(cached_lookup(version, system_model))
+
+
+def coverage_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.migration_coverage import migration_coverage
+
+    reports = migration_coverage(
+        databases={Path(fp).stem: Path(fp) for fp in args.databases},
+        migration=Path(args.migration),
+        source_keys=cached_keys(args.source_version, args.system_model),
+        target_keys=cached_keys(args.target_version, args.system_model),
+        processes=args.processes,
+    )
+    print("database\texchanges\treplaced\tdisaggregated\tdangling")
+    for report in reports.values():
+        print(
+            f"{report.database}\t{report.exchanges}\t{report.replaced}\t"
+            f"{report.disaggregated}\t{report.dangling}"
+        )
+    if args.show_unmatched:
+        for report in reports.values():
+            for key in report.unmatched:
+                print(f"{report.database}\tunmatched\t{key}")
+    return 0
+
+
+def diff_releases_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.release_diff import release_diff
+    from ecoinvent_migrate.wrangling import tuple_key_for_data
+
+    source_lookup = cached_lookup(args.source_version, args.system_model)
+    target_lookup = cached_lookup(args.target_version, args.system_model)
+    pairs = release_diff(source_lookup, target_lookup)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(pairs, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(pairs, sys.stdout, indent=2, ensure_ascii=False)
+
+    changed = set(source_lookup).difference(target_lookup)
+    found = {tuple_key_for_data(obj["source"]) for obj in pairs}
+    print(
+        f"{len(pairs)} candidate migrations; "
+        f"{len(changed - found)} changed datasets without candidates",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def diff_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.migration_diff import diff_migrations
+
+    result = diff_migrations(Path(args.old), Path(args.new), tolerance=args.tolerance)
+    for verb, source in result.added:
+        print(f"Added {verb}: {source}")
+    for verb, source in result.removed:
+        print(f"Removed {verb}: {source}")
+    for change in result.changed:
+        print(f"Changed {change.verb}: {change.source}")
+        for reason in change.reasons:
+            print(f"\t{reason}")
+    print(result.summary())
+    return int(not result.ok)
+
+
+def volume_changes_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.production_volumes import production_volume_changes, write_table
+
+    df = production_volume_changes(
+        cached_lookup(args.source_version, args.system_model),
+        cached_lookup(args.target_version, args.system_model),
+    )
+    if args.min_change is not None:
+        df = df[df["relative_change"].abs() >= args.min_change]
+    if args.output:
+        write_table(df, Path(args.output))
+    else:
+        df.to_csv(sys.stdout, index=False)
+    return 0
+
+
+def parse_size(value: str) -> int:
+    """Parse a size in bytes with an optional `K`, `M`, `G`, or `T` suffix (powers of 1024)."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    value = value.strip().upper().removesuffix("B")
+    try:
+        if value and value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size {value}") from None
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def cache_list_command(_args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.cache import cache_entries
+
+    entries = cache_entries()
+    for entry in entries:
+        release = f"{entry.version} {entry.system_model}" if entry.kind == "release" else ""
+        print(
+            f"{entry.last_used_datetime:%Y-%m-%d %H:%M}\t{format_size(entry.size):>9}\t"
+            f"{entry.kind}\t{release}\t{entry.path.name}"
+        )
+    print(f"{len(entries)} files, {format_size(sum(entry.size for entry in entries))}")
+    return 0
+
+
+def cache_prune_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.cache import prune_cache
+
+    removed = prune_cache(
+        max_age=args.older_than,
+        versions=args.version,
+        keep_versions=args.keep_version,
+        max_size=args.max_size,
+        dry_run=args.dry_run,
+    )
+    for entry in removed:
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {entry.path.name}")
+    print(
+        f"{'Would free' if args.dry_run else 'Freed'} "
+        f"{format_size(sum(entry.size for entry in removed))}"
+    )
+    return 0
+
+
+def extract_command(args: argparse.Namespace) -> int:
+    from ecoinvent_migrate.extraction import load_releases
+
+    lookups = load_releases(
+        [
+            (version, system_model)
+            for version in args.versions
+            for system_model in args.system_model or ["cutoff"]
+        ],
+        from_archive=args.from_archive,
+        processes=args.processes,
+    )
+    for (version, system_model), lookup in lookups.items():
+        print(f"{version} {system_model}: {len(lookup)} datasets")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ecoinvent-migrate", description="Maintenance tools for ecoinvent_migrate"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    validate = subparsers.add_parser(
+        "validate-patches", help="Check patch files against cached release data"
+    )
+    validate.add_argument("--system-model", default="cutoff")
+    validate.add_argument(
+        "--pair",
+        action="append",
+        help="Release pair as `source:target`, e.g. `3.10.1:3.11`. Can be repeated.",
+    )
+    validate.set_defaults(func=validate_patches_command)
+
+    validate_migration = subparsers.add_parser(
+        "validate-migration", help="Check a technosphere migration file against cached release data"
+    )
+    validate_migration.add_argument("migration", help="Migration JSON file")
+    validate_migration.add_argument("target_version")
+    validate_migration.add_argument("--system-model", default="cutoff")
+    validate_migration.add_argument("--tolerance", type=float, default=1e-6)
+    validate_migration.set_defaults(func=validate_migration_command)
+
+    coverage = subparsers.add_parser(
+        "coverage", help="Count foreground exchanges affected by a technosphere migration"
+    )
+    coverage.add_argument("migration", help="Migration JSON file")
+    coverage.add_argument("databases", nargs="+", help="Foreground database JSON files")
+    coverage.add_argument(
+        "--source-version", help="Only count exchanges linking to this cached release"
+    )
+    coverage.add_argument(
+        "--target-version", help="Find dangling exchanges using this cached release"
+    )
+    coverage.add_argument("--system-model", default="cutoff")
+    coverage.add_argument("--processes", type=int)
+    coverage.add_argument("--show-unmatched", action="store_true")
+    coverage.set_defaults(func=coverage_command)
+
+    diff_releases = subparsers.add_parser(
+        "diff-releases",
+        help="Propose technosphere migrations by comparing dataset UUIDs in two cached releases",
+    )
+    diff_releases.add_argument("source_version")
+    diff_releases.add_argument("target_version")
+    diff_releases.add_argument("--system-model", default="cutoff")
+    diff_releases.add_argument("--output", "-o", help="Output JSON file; default is stdout")
+    diff_releases.set_defaults(func=diff_releases_command)
+
+    volume_changes = subparsers.add_parser(
+        "volume-changes",
+        help="Compare production volumes of all datasets in two cached releases",
+    )
+    volume_changes.add_argument("source_version")
+    volume_changes.add_argument("target_version")
+    volume_changes.add_argument("--system-model", default="cutoff")
+    volume_changes.add_argument(
+        "--min-change",
+        type=float,
+        help="Only include datasets in both releases whose relative change is at least this",
+    )
+    volume_changes.add_argument(
+        "--output", "-o", help="Output `.csv` or `.xlsx` file; default is CSV to stdout"
+    )
+    volume_changes.set_defaults(func=volume_changes_command)
+
+    diff = subparsers.add_parser(
+        "diff", help="Compare two migration files; exits with 1 if they relink differently"
+    )
+    diff.add_argument("old", help="Published migration JSON file")
+    diff.add_argument("new", help="Regenerated migration JSON file")
+    diff.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-6,
+        help="Allowed absolute difference in allocation and conversion factors",
+    )
+    diff.set_defaults(func=diff_command)
+
+    extract = subparsers.add_parser(
+        "extract",
+        help="Download and cache the data of several releases, parsing them in one worker pool",
+    )
+    extract.add_argument("versions", nargs="+")
+    extract.add_argument(
+        "--system-model", action="append", help="Default is `cutoff`. Can be repeated."
+    )
+    extract.add_argument("--processes", type=int)
+    extract.add_argument(
+        "--from-archive", action="store_true", help="Read datasets without extracting archives"
+    )
+    extract.set_defaults(func=extract_command)
+
+    cache_list = subparsers.add_parser(
+        "cache-list", help="List cached files with size and last use, least recently used first"
+    )
+    cache_list.set_defaults(func=cache_list_command)
+
+    cache_prune = subparsers.add_parser("cache-prune", help="Remove cached files")
+    cache_prune.add_argument(
+        "--older-than", type=float, metavar="DAYS", help="Remove files not used for DAYS days"
+    )
+    cache_prune.add_argument(
+        "--version", action="append", help="Remove caches of this release. Can be repeated."
+    )
+    cache_prune.add_argument(
+        "--keep-version",
+        action="append",
+        help="Remove caches of all releases except this one. Can be repeated.",
+    )
+    cache_prune.add_argument(
+        "--max-size",
+        type=parse_size,
+        metavar="SIZE",
+        help="Remove least recently used files until the cache uses at most SIZE, e.g. `500M`",
+    )
+    cache_prune.add_argument(
+        "--dry-run", action="store_true", help="Only list the files which would be removed"
+    )
+    cache_prune.set_defaults(func=cache_prune_command)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,26 @@
-import json
+import io
 from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import BinaryIO, Optional, Union
 
 from ecoinvent_interface import EcoinventRelease, ReleaseType
 from loguru import logger
 from lxml import objectify
 from tqdm import tqdm
 
+from ecoinvent_migrate.archive import SPOLD_SUFFIXES, archive_member_names, read_archive_members
 from ecoinvent_migrate.errors import VersionJump
-from ecoinvent_migrate.utils import cache_dir
+from ecoinvent_migrate.utils import (
+    CACHE_READ_ERRORS,
+    COMPRESSION_SUFFIXES,
+    atomic_write_json,
+    cache_compression,
+    cache_dir,
+    cache_lock,
+    compression_available,
+    mark_used,
+    read_json,
+)
 from ecoinvent_migrate.wrangling import tuple_key_for_data
 
 
@@ -17,7 +29,8 @@ class SOUPInfo:
     """
     Single-output unit process
 
-    Has unique combination of activity name, product name, geography, and unit.
+    Has unique combination of activity name, product name, geography, and unit. Also has a
+    unique combination of activity and reference product UUIDs.
     """
 
     activity_name: str
@@ -26,13 +39,21 @@ class SOUPInfo:
     geography: str
     production_volume: float
     filename: str
+    activity_uuid: Optional[str] = None
+    product_uuid: Optional[str] = None
 
     def as_tuple(self) -> tuple[str]:
         return tuple_key_for_data(asdict(self))
 
 
-def soupinfo_for_file(fp: Path) -> SOUPInfo:
-    root = objectify.parse(open(fp)).getroot()
+def soupinfo_for_file(fp: Union[Path, BinaryIO], filename: Optional[str] = None) -> SOUPInfo:
+    """Extract `SOUPInfo` from a spold file path, or from a binary file object with `filename`."""
+    if isinstance(fp, Path):
+        with open(fp, "rb") as f:
+            root = objectify.parse(f).getroot()
+        filename = fp.name
+    else:
+        root = objectify.parse(fp).getroot()
     if hasattr(root, "activityDataset"):
         stem = root.activityDataset
     else:
@@ -50,35 +71,189 @@ def soupinfo_for_file(fp: Path) -> SOUPInfo:
         unit=prod_exc.unitName.text.strip(),
         geography=stem.activityDescription.geography.shortname.text.strip(),
         production_volume=float(prod_exc.get("productionVolumeAmount") or 0),
-        filename=fp.name,
+        filename=filename,
+        activity_uuid=stem.activityDescription.activity.get("id"),
+        product_uuid=prod_exc.get("intermediateExchangeId"),
     )
 
 
-def load_release_data(version: str, system_model: str, release: EcoinventRelease) -> None:
-    cache_filepath = cache_dir() / f"ecoinvent-{version}-{system_model}.json"
-    if cache_filepath.is_file():
-        return {tuple_key_for_data(obj): obj for obj in json.load(open(cache_filepath))}
-    else:
+def add_uuids_from_filename(obj: dict) -> dict:
+    """Fill in missing UUIDs from the `{activity_uuid}_{product_uuid}.spold` filename.
+
+    Cache files written by earlier versions don't have the UUID fields."""
+    if obj.get("activity_uuid") is None or obj.get("product_uuid") is None:
+        activity_uuid, _, product_uuid = Path(obj["filename"]).stem.partition("_")
+        obj["activity_uuid"] = obj.get("activity_uuid") or activity_uuid
+        obj["product_uuid"] = obj.get("product_uuid") or product_uuid or None
+    return obj
+
+
+def soupinfos_from_archive(archive_path: Path) -> list[dict]:
+    """Extract `SOUPInfo` data for each dataset in a `.7z` release archive, without extracting
+    the archive to disk."""
+    names = archive_member_names(archive_path)
+    data = []
+    with tqdm(total=len(names)) as progress:
+
+        def callback(name: str, content: bytes) -> None:
+            data.append(asdict(soupinfo_for_file(io.BytesIO(content), filename=Path(name).name)))
+            progress.update()
+
+        read_archive_members(archive_path, names, callback)
+    return data
+
+
+def read_master_data(
+    version: str, filename: str, release: EcoinventRelease, system_model: str = "cutoff"
+) -> bytes:
+    """Read the `MasterData` file `filename` of a release, e.g. `ElementaryExchanges.xml`.
+
+    Unit process datasets are neither parsed nor extracted. A release which isn't in the local
+    storage yet is downloaded but not extracted, and only this file is read from the archive; an
+    already extracted release is used as is."""
+    path = release.get_release(version, system_model, ReleaseType.ecospold, extract=False)
+    if path.is_dir():
+        return (path / "MasterData" / filename).read_bytes()
+
+    names = [
+        name
+        for name in archive_member_names(path, directory="MasterData")
+        if Path(name).name == filename
+    ]
+    if not names:
+        raise ValueError(f"Can't find `MasterData/{filename}` in release archive {path}")
+    content = {}
+    read_archive_members(path, names[:1], lambda name, data: content.update(data=data))
+    return content["data"]
+
+
+def release_cache_filepath(
+    version: str, system_model: str, compression: Optional[str] = None
+) -> Path:
+    """Path of the release cache file with `compression`; see `utils.cache_compression`."""
+    suffix = COMPRESSION_SUFFIXES[compression or cache_compression()]
+    return cache_dir() / f"ecoinvent-{version}-{system_model}{suffix}"
+
+
+def release_lock_filepath(version: str, system_model: str) -> Path:
+    """Lock file held while the cache of a release is created or removed.
+
+    The name doesn't depend on the compression, so processes with different compression settings
+    don't parse the same release at the same time."""
+    return cache_dir() / f"ecoinvent-{version}-{system_model}.lock"
+
+
+def find_release_cache(version: str, system_model: str) -> Optional[Path]:
+    """Find the cache file of a release in any readable compression, preferring the configured
+    one."""
+    preferred = cache_compression(check_available=False)
+    for compression in sorted(COMPRESSION_SUFFIXES, key=lambda x: x != preferred):
+        if not compression_available(compression):
+            continue
+        filepath = release_cache_filepath(version, system_model, compression)
+        if filepath.is_file():
+            return filepath
+    return None
+
+
+def cached_releases() -> list[tuple[str, str, Path]]:
+    """List the `(version, system_model, filepath)` of each release in the local cache."""
+    releases = set()
+    for filepath in cache_dir().glob("ecoinvent-*"):
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if filepath.name.endswith(suffix):
+                stem = filepath.name.removesuffix(suffix).removeprefix("ecoinvent-")
+                version, _, system_model = stem.partition("-")
+                if version and system_model:
+                    releases.add((version, system_model))
+    return [
+        (version, system_model, find_release_cache(version, system_model))
+        for version, system_model in sorted(releases)
+    ]
+
+
+def load_cached_release_data(version: str, system_model: str) -> Optional[dict]:
+    """Load release data from the local cache only. Returns `None` if not cached.
+
+    Compressed cache files are read transparently."""
+    cache_filepath = find_release_cache(version, system_model)
+    if cache_filepath is None:
+        return None
+    return _read_release_cache(cache_filepath)
+
+
+def _read_release_cache(filepath: Path) -> dict:
+    mark_used(filepath)
+    return {tuple_key_for_data(obj): add_uuids_from_filename(obj) for obj in read_json(filepath)}
+
+
+def load_release_data(
+    version: str, system_model: str, release: EcoinventRelease, from_archive: bool = False
+) -> dict:
+    """Load `SOUPInfo` data for a release, keyed by `tuple_key_for_data`.
+
+    Parses the release datasets and writes a cache file the first time. With `from_archive`,
+    the `.7z` release archive is downloaded but not extracted, and datasets are read directly from
+    the archive; this avoids writing ~20.000 small files to disk. An already extracted release is
+    used as is.
+
+    New cache files are compressed as set by `ECOINVENT_MIGRATE_CACHE_COMPRESSION`; existing
+    cache files in other formats are still used."""
+    if (lookup := load_valid_cache(version, system_model)) is not None:
+        return lookup
+
+    cache_filepath = release_cache_filepath(version, system_model)
+    with cache_lock(cache_filepath, lock_path=release_lock_filepath(version, system_model)):
+        # Another process could have created the cache while we waited for the lock
+        if (lookup := load_valid_cache(version, system_model)) is not None:
+            return lookup
+
         logger.info(
             "Downloading ecoinvent version {version} {system_model}",
             version=version,
             system_model=system_model,
         )
-        release.get_release(version, system_model, ReleaseType.ecospold)
+        path = release.get_release(
+            version, system_model, ReleaseType.ecospold, extract=not from_archive
+        )
 
-        dirpath = release.get_release(version, system_model, ReleaseType.ecospold) / "datasets"
-        assert dirpath.is_dir(), f"Release cache at {dirpath.parent} missing `datasets` directory"
+        if is_release_archive(path):
+            data = soupinfos_from_archive(path)
+        else:
+            data = [asdict(soupinfo_for_file(fp)) for fp in tqdm(dataset_files(path))]
+        return write_release_cache(data, cache_filepath)
+
+
+def is_release_archive(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() == ".7z"
+
+
+def dataset_files(path: Path) -> list[Path]:
+    """List the spold files of an extracted release at `path`."""
+    dirpath = path / "datasets"
+    assert dirpath.is_dir(), f"Release cache at {path} missing `datasets` directory"
+    return [fp for fp in dirpath.iterdir() if fp.suffix.lower() in SPOLD_SUFFIXES]
+
+
+def write_release_cache(data: list[dict], cache_filepath: Path) -> dict:
+    """Write the `SOUPInfo` dictionaries `data` to `cache_filepath`, and return the lookup."""
+    # Indentation only helps people reading uncompressed files
+    indent = 2 if cache_filepath.suffix == ".json" else None
+    atomic_write_json(data, cache_filepath, indent=indent, ensure_ascii=False)
+    return {tuple_key_for_data(obj): obj for obj in data}
 
-        data = [
-            asdict(soupinfo_for_file(fp))
-            for fp in tqdm(
-                filter(lambda x: x.suffix.lower() in {".xml", ".spold"}, dirpath.iterdir())
-            )
-        ]
-        with open(cache_filepath, "w") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
 
-        return {tuple_key_for_data(obj): obj for obj in data}
+def load_valid_cache(version: str, system_model: str) -> Optional[dict]:
+    """Load the cached release data, removing the cache file if it can't be read."""
+    cache_filepath = find_release_cache(version, system_model)
+    if cache_filepath is None:
+        return None
+    try:
+        return _read_release_cache(cache_filepath)
+    except CACHE_READ_ERRORS:
+        logger.warning("Removing unreadable cache file {fp}", fp=str(cache_filepath))
+        cache_filepath.unlink(missing_ok=True)
+        return None
 
 
 def get_change_report(
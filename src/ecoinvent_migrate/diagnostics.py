@@ -0,0 +1,109 @@
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+# Known diagnostic categories, with log level and description. Categories at `WARNING` level
+# indicate problems which could need a manual patch; `DEBUG` categories are expected.
+CATEGORIES = {
+    "geography_corrected": (
+        "DEBUG",
+        "Change report geography corrected to `RoW` or `RoE` from release data",
+    ),
+    "missing_source": (
+        "DEBUG",
+        "Source process given in change report but missing in source release",
+    ),
+    "missing_target": (
+        "WARNING",
+        "Target process given in change report but missing in target release",
+    ),
+    "unmigrated_source": (
+        "WARNING",
+        "Source dataset changed but neither change report nor patches have migrations",
+    ),
+    "missing_disaggregation_target": (
+        "WARNING",
+        "Change report annex dataset missing from database; removed from disaggregation",
+    ),
+    "zero_total_production": (
+        "WARNING",
+        "Total production from disaggregation targets is zero; using equal allocation factors",
+    ),
+    "negative_production_volume": (
+        "WARNING",
+        "Disaggregation target has a negative production volume",
+    ),
+    "negative_total_production": (
+        "WARNING",
+        "Total production from disaggregation targets is less than zero",
+    ),
+    "patch_applied": ("DEBUG", "Change report entry patched with updated values"),
+    "patch_not_found": (
+        "WARNING",
+        "Expected to patch a source or target dict but it's not in the given data",
+    ),
+    "invalid_migration_target": (
+        "WARNING",
+        "Generated migration target is not in the target release",
+    ),
+    "invalid_allocation": (
+        "WARNING",
+        "Allocation factors of a generated disaggregation don't sum to one",
+    ),
+}
+
+
+@dataclass
+class Diagnostics:
+    """Collects diagnostic records during a run instead of logging each item.
+
+    Each record is a dictionary stored under a category from `CATEGORIES`. Use `log_summary` to
+    emit a single summary line, and `write` to save all records as a JSON report.
+    """
+
+    records: dict[str, list[dict]] = field(default_factory=lambda: defaultdict(list))
+
+    def add(self, category: str, **record) -> None:
+        if category not in CATEGORIES:
+            raise KeyError(f"Unknown diagnostic category {category}")
+        self.records[category].append(record)
+
+    @property
+    def counts(self) -> dict[str, int]:
+        return {category: len(self.records[category]) for category in CATEGORIES}
+
+    def summary(self) -> str:
+        counts = {category: count for category, count in self.counts.items() if count}
+        if not counts:
+            return "Diagnostics: nothing to report"
+        return "Diagnostics: " + ", ".join(f"{count} {cat}" for cat, count in counts.items())
+
+    def log_summary(self) -> None:
+        has_warnings = any(
+            self.records[category]
+            for category, (level, _) in CATEGORIES.items()
+            if level == "WARNING"
+        )
+        logger.log("WARNING" if has_warnings else "INFO", self.summary())
+
+    def as_dict(self) -> dict:
+        return {
+            category: {
+                "level": level,
+                "description": description,
+                "count": len(self.records[category]),
+                "records": self.records[category],
+            }
+            for category, (level, description) in CATEGORIES.items()
+            if self.records[category]
+        }
+
+    def write(self, filepath: Path) -> Path:
+        """Write all records as a compact JSON report to `filepath`."""
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        logger.info("Wrote diagnostics report to {fp}", fp=str(filepath))
+        return filepath
@@ -1,13 +1,316 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
 import warnings
 from pathlib import Path
+from typing import Any, Callable, Optional
 
-from ecoinvent_interface import EcoinventRelease, Settings
+import requests
+from ecoinvent_interface import CachedStorage, EcoinventRelease, ReleaseType, Settings
+from ecoinvent_interface import __version__ as ecoinvent_interface_version
+from ecoinvent_interface.core import SYSTEM_MODELS, fresh_login
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from ecoinvent_migrate.errors import OfflineError
+from ecoinvent_migrate.utils import atomic_write_json, cache_dir, cache_lock
+
+# Seconds before cached release listings are fetched again; see `CachedRelease`
+METADATA_TTL = 24 * 60 * 60
+OFFLINE_ENV = "ECOINVENT_MIGRATE_OFFLINE"
+METADATA_TTL_ENV = "ECOINVENT_MIGRATE_METADATA_TTL"
+# Maximum number of pooled connections per host for API requests and downloads
+POOL_SIZE = 8
+
+_RELEASES_LOCK = threading.Lock()
+_RELEASES: dict[tuple, "CachedRelease"] = {}
+
+
+def metadata_cache_filepath() -> Path:
+    return cache_dir() / "release-metadata.json"
+
+
+def offline_from_environment() -> bool:
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+
+class CachedRelease:
+    """`EcoinventRelease` with on-disk caching of the release listings, and an offline mode.
+
+    `list_versions` and `list_extra_files` are served from `release-metadata.json` in the cache
+    directory while younger than `ttl` seconds. If the ecoinvent API can't be reached, older
+    listings are used with a warning.
+
+    With `offline`, nothing is requested from the ecoinvent API: listings come only from the
+    metadata cache, and `get_release` and `get_extra` return the files already in the
+    `ecoinvent_interface` storage. `OfflineError` is raised if something isn't available locally.
+    Extra files like the change reports don't change after publication, so stored extra files
+    are also used when online.
+
+    Other attributes are passed through to the wrapped `release`.
+    """
+
+    def __init__(
+        self,
+        release: Optional[EcoinventRelease] = None,
+        storage: Optional[CachedStorage] = None,
+        ttl: float = METADATA_TTL,
+        offline: bool = False,
+    ):
+        if release is None and not offline:
+            raise ValueError("`release` is required unless `offline`")
+        self.release = release
+        self.storage = storage or (release.storage if release is not None else CachedStorage())
+        self.ttl = ttl
+        self.offline = offline
+
+    def __getattr__(self, name: str) -> Any:
+        if self.__dict__.get("release") is None:
+            raise OfflineError(f"`{name}` needs the ecoinvent API, which isn't used offline")
+        return getattr(self.release, name)
+
+    def close(self) -> None:
+        """Close the HTTP sessions of the wrapped release, if it has any."""
+        if isinstance(self.release, PooledRelease):
+            self.release.close()
+
+    @staticmethod
+    def _load_metadata(filepath: Path) -> dict:
+        try:
+            return json.load(open(filepath, encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _cached(self, key: str, fetch: Callable[[], Any]) -> Any:
+        filepath = metadata_cache_filepath()
+        entry = self._load_metadata(filepath).get(key)
+
+        if self.offline:
+            if entry is None:
+                raise OfflineError(f"Release listing `{key}` not in local metadata cache")
+            return entry["data"]
+        if entry is not None and time.time() - entry["fetched"] < self.ttl:
+            return entry["data"]
+
+        try:
+            data = fetch()
+        except requests.RequestException as exc:
+            if entry is None:
+                raise
+            logger.warning(
+                "Can't reach ecoinvent API ({exc}); using cached listing `{key}`",
+                exc=exc,
+                key=key,
+            )
+            return entry["data"]
+        # Round trip so that fresh and cached data have the same types
+        data = json.loads(json.dumps(data, default=str))
+        # Read again under the lock, so listings written meanwhile by other processes are kept
+        with cache_lock(filepath):
+            cache = self._load_metadata(filepath)
+            cache[key] = {"fetched": time.time(), "data": data}
+            atomic_write_json(cache, filepath, indent=2, ensure_ascii=False)
+        return data
+
+    def list_versions(self) -> list[str]:
+        return self._cached("versions", lambda: self.release.list_versions())
+
+    def list_extra_files(self, version: str) -> dict:
+        return self._cached(
+            f"extra_files/{version}", lambda: self.release.list_extra_files(version)
+        )
+
+    def _stored_path(self, filename: str) -> Optional[Path]:
+        catalogue = self.storage.catalogue
+        if filename in catalogue and Path(catalogue[filename]["path"]).exists():
+            return Path(catalogue[filename]["path"])
+        return None
+
+    def get_extra(self, version: str, filename: str, **kwargs) -> Path:
+        path = self._stored_path(filename)
+        if path is not None and not kwargs.get("force_redownload"):
+            return path
+        if self.offline:
+            raise OfflineError(f"Extra file {filename} for {version} not in local storage")
+        return self.release.get_extra(version, filename, **kwargs)
+
+    def get_release(
+        self, version: str, system_model: str, release_type: ReleaseType, **kwargs
+    ) -> Path:
+        if not self.offline:
+            return self.release.get_release(version, system_model, release_type, **kwargs)
+        filename = release_type.filename(
+            version=version, system_model_abbr=SYSTEM_MODELS.get(system_model, system_model)
+        )
+        if (path := self._stored_path(filename)) is None:
+            raise OfflineError(f"Release {filename} not in local storage")
+        return path
+
+
+def new_http_session() -> requests.Session:
+    """Create a `requests.Session` with a pool of up to `POOL_SIZE` connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class PooledRelease(EcoinventRelease):
+    """`EcoinventRelease` which sends its API requests and downloads through its own
+    `requests.Session`, so connections are reused instead of opened for every request.
+
+    `ecoinvent_interface` calls `requests.get` and `requests.post` directly, so the methods which
+    make these calls are overridden here to use `session`. Nothing outside of the instance is
+    changed; other releases and other users of `ecoinvent_interface` send requests as usual."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+        self._sessions_lock = threading.Lock()
+        self._sessions: list[requests.Session] = []
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session of this release in the current thread.
+
+        `requests.Session` isn't thread-safe, so each thread gets its own session and connection
+        pool. Sessions aren't shared between releases, so cookies stay with their credentials."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = new_http_session()
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self) -> None:
+        """Close the HTTP sessions of all threads."""
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+    def _headers(self, authorized: bool = True) -> dict:
+        headers = {
+            "ecoinvent-api-client-library": "ecoinvent_interface",
+            "ecoinvent-api-client-library-version": ecoinvent_interface_version,
+        }
+        if authorized:
+            headers["Authorization"] = f"Bearer {self.access_token}"
+        headers.update(self.custom_headers)
+        return headers
+
+    def _get_credentials(self, post_data: dict) -> None:
+        response = self.session.post(
+            self.urls["sso"], post_data, headers=self._headers(authorized=False), timeout=20
+        )
+        if not response.ok:
+            try:
+                errors = [msg for key, msg in response.json().items() if "error" in key.lower()]
+            except (ValueError, AttributeError):
+                errors = []
+            if "Account is not fully set up" in errors:
+                warnings.warn("Action required: please login to ecoquery to update your account.")
+            else:
+                warnings.warn(f"Can't log in: error {response.status_code} {errors}")
+            response.raise_for_status()
+        tokens = response.json()
+        self.last_refresh = time.time()
+        self.access_token = tokens["access_token"]
+        self.refresh_token = tokens["refresh_token"]
+
+    @fresh_login
+    def _get_all_reports(self) -> dict:
+        response = self.session.get(
+            self.urls["api"] + "files/reports", headers=self._headers(), timeout=20
+        )
+        if response.status_code == 401:
+            raise PermissionError("Your license doesn't permit report access")
+        return response.json()
+
+    @fresh_login
+    def _get_all_files(self) -> dict:
+        response = self.session.get(self.urls["api"] + "files", headers=self._headers(), timeout=20)
+        if response.status_code == 404:
+            raise PermissionError("Your license doesn't permit file access")
+        return response.json()
+
+    def _streaming_download(
+        self,
+        url: str,
+        params: dict,
+        directory: Path,
+        filename: str,
+        headers: Optional[dict] = None,
+        zipped: Optional[bool] = False,
+    ) -> None:
+        if zipped:
+            # Only used for single process datasets, which this package doesn't download
+            return super()._streaming_download(
+                url, params, directory, filename, headers or {}, True
+            )
+        with (
+            self.session.get(
+                url, stream=True, headers=headers or {}, params=params, timeout=60
+            ) as response,
+            open(directory / filename, "wb") as out_file,
+        ):
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"URL '{url}' returns status code {response.status_code}."
+                )
+            shutil.copyfileobj(response.raw, out_file, 128 * 1024)
+
+    @fresh_login
+    def _download_s3(self, uuid: str, filename: str, url_namespace: str, directory: Path) -> Path:
+        url = self.urls["api"] + f"files/{url_namespace}/{uuid}"
+        s3_link = self.session.get(url, headers=self._headers(), timeout=20).json()["download_url"]
+        self._streaming_download(url=s3_link, params={}, directory=directory, filename=filename)
+        return directory / filename
+
+
+def _release_key(settings: Settings, offline: bool, metadata_ttl: float) -> tuple:
+    # Only a digest of the password is kept, so it isn't held in memory as a dictionary key
+    password = hashlib.sha256((settings.password or "").encode("utf-8")).hexdigest()
+    return (settings.username, password, settings.output_path, offline, metadata_ttl)
+
+
+def clear_release_sessions() -> None:
+    """Forget the cached releases from `get_ei_release` and close their HTTP sessions, e.g. after
+    changing credentials."""
+    with _RELEASES_LOCK:
+        releases = list(_RELEASES.values())
+        _RELEASES.clear()
+    for release in releases:
+        release.close()
 
 
 def get_ei_release(
     ecoinvent_username: str | None = None,
     ecoinvent_password: str | None = None,
-) -> Path:
+    offline: Optional[bool] = None,
+    metadata_ttl: Optional[float] = None,
+    reuse: bool = True,
+) -> CachedRelease:
+    """Get an `EcoinventRelease` with cached release listings; see `CachedRelease`.
+
+    The release is a session: it logs in once and refreshes its tokens as needed, and its
+    requests use pooled connections; see `PooledRelease`. With `reuse`, the same release
+    is returned for the same credentials and options, so repeated generator calls don't log in
+    again. It can also be created once and passed as `release` to the generators and data loading
+    functions.
+
+    `offline` defaults to the `ECOINVENT_MIGRATE_OFFLINE` environment variable, and
+    `metadata_ttl` to `ECOINVENT_MIGRATE_METADATA_TTL` or one day."""
+    if offline is None:
+        offline = offline_from_environment()
+    if metadata_ttl is None:
+        metadata_ttl = float(os.environ.get(METADATA_TTL_ENV, METADATA_TTL))
+
     if ecoinvent_username is not None or ecoinvent_password is not None:
         warnings.warn(
             """
@@ -19,4 +322,20 @@ https://github.com/brightway-lca/ecoinvent_interface?tab=readme-ov-file#authenti
         settings = Settings(username=ecoinvent_username, password=ecoinvent_password)
     else:
         settings = Settings()
-    return EcoinventRelease(settings)
+
+    key = _release_key(settings, offline, metadata_ttl)
+    with _RELEASES_LOCK:
+        if reuse and key in _RELEASES:
+            return _RELEASES[key]
+
+    if offline:
+        release = CachedRelease(
+            storage=CachedStorage(settings.output_path), ttl=metadata_ttl, offline=True
+        )
+    else:
+        release = CachedRelease(PooledRelease(settings), ttl=metadata_ttl)
+
+    with _RELEASES_LOCK:
+        if reuse:
+            release = _RELEASES.setdefault(key, release)
+    return release
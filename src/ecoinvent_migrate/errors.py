@@ -8,3 +8,11 @@ class Mismatch(Exception):
 
 class VersionJump(Exception):
     pass
+
+
+class InvalidMigration(Exception):
+    pass
+
+
+class OfflineError(Exception):
+    pass
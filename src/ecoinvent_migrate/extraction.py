@@ -0,0 +1,200 @@
+"""Parse several uncached releases at once with one shared pool of worker processes.
+
+`load_release_data` parses one release at a time, so on a new machine the parallelism is bounded
+by the release being parsed. `load_releases` puts the dataset files of all requested releases
+into a single work queue:
+
+```python
+>>> from ecoinvent_migrate.extraction import load_releases
+>>> lookups = load_releases([("3.9.1", "cutoff"), ("3.10", "cutoff"), ("3.10", "apos")])
+```
+
+Releases are queued in the given order, so the first release finishes first. The cache file of
+each release is written as soon as all its files are parsed, while the workers go on with the
+files of the next releases.
+
+"""
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from ecoinvent_interface import EcoinventRelease, ReleaseType
+from filelock import FileLock, Timeout
+from loguru import logger
+from tqdm import tqdm
+
+from ecoinvent_migrate.data_io import (
+    dataset_files,
+    is_release_archive,
+    load_release_data,
+    load_valid_cache,
+    release_cache_filepath,
+    release_lock_filepath,
+    soupinfo_for_file,
+    soupinfos_from_archive,
+    write_release_cache,
+)
+from ecoinvent_migrate.ei_release import get_ei_release
+
+# Number of dataset files in one work item
+CHUNK_SIZE = 250
+
+
+def _parse(unit: Union[Path, list[Path]]) -> list[dict]:
+    """Parse one work item: a release archive, or a list of dataset files."""
+    if isinstance(unit, Path):
+        return soupinfos_from_archive(unit)
+    return [asdict(soupinfo_for_file(fp)) for fp in unit]
+
+
+@dataclass
+class _PendingRelease:
+    version: str
+    system_model: str
+    cache_filepath: Path
+    lock: FileLock
+    # Results of each work item in queue order, so the cache has the usual dataset order
+    chunks: list[Optional[list[dict]]] = field(default_factory=list)
+    remaining: int = 0
+
+
+def _lock_uncached(
+    releases: list[tuple[str, str]], lookups: dict
+) -> tuple[list[_PendingRelease], list[tuple[str, str]]]:
+    """Lock the cache files of releases which aren't cached yet.
+
+    Returns the locked releases, and the releases whose cache another process is creating."""
+    pending, busy = [], []
+    for version, system_model in releases:
+        if (lookup := load_valid_cache(version, system_model)) is not None:
+            lookups[(version, system_model)] = lookup
+            continue
+        lock = FileLock(release_lock_filepath(version, system_model))
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            busy.append((version, system_model))
+            continue
+        # Another process could have finished the cache before we got the lock
+        if (lookup := load_valid_cache(version, system_model)) is not None:
+            lock.release()
+            lookups[(version, system_model)] = lookup
+            continue
+        cache_filepath = release_cache_filepath(version, system_model)
+        pending.append(_PendingRelease(version, system_model, cache_filepath, lock))
+    return pending, busy
+
+
+def load_releases(
+    releases: Iterable[tuple[str, str]],
+    release: Optional[EcoinventRelease] = None,
+    from_archive: bool = False,
+    processes: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict[tuple[str, str], dict]:
+    """Load the `SOUPInfo` lookups of many `(version, system_model)` releases, parsing all
+    uncached releases in one pool of `processes` worker processes.
+
+    Returns the same lookups as `load_release_data`, keyed by `(version, system_model)`. Cached
+    releases are loaded directly. Uncached releases are downloaded, and their dataset files are
+    parsed in work items of `chunk_size` files. With `from_archive`, each release archive is one
+    work item, as the datasets of a `.7z` archive can only be read in order.
+
+    Each cache file is locked while it is created, like in `load_release_data`. Releases which
+    another process is already parsing are read from its cache file when it is finished.
+    `processes` defaults to the number of CPUs; with `processes=1` everything runs in this
+    process."""
+    releases = list(dict.fromkeys(releases))
+    lookups = {}
+    pending, busy = _lock_uncached(releases, lookups)
+
+    if (pending or busy) and release is None:
+        release = get_ei_release()
+    try:
+        if pending:
+            _parse_releases(pending, release, from_archive, processes, chunk_size, lookups)
+    finally:
+        for item in pending:
+            item.lock.release()
+
+    for version, system_model in busy:
+        lookups[(version, system_model)] = load_release_data(
+            version, system_model, release, from_archive=from_archive
+        )
+    return {key: lookups[key] for key in releases}
+
+
+def _work_items(
+    item: _PendingRelease, release: EcoinventRelease, from_archive: bool, chunk_size: int
+) -> list[Union[Path, list[Path]]]:
+    """Download the release of `item`, and split it into work items for `_parse`."""
+    logger.info(
+        "Downloading ecoinvent version {version} {system_model}",
+        version=item.version,
+        system_model=item.system_model,
+    )
+    path = release.get_release(
+        item.version, item.system_model, ReleaseType.ecospold, extract=not from_archive
+    )
+    if is_release_archive(path):
+        work = [path]
+    else:
+        files = dataset_files(path)
+        # An empty release still gets one (empty) work item, so its cache is written
+        work = [
+            files[start : start + chunk_size] for start in range(0, len(files), chunk_size)
+        ] or [[]]
+    item.chunks, item.remaining = [None] * len(work), len(work)
+    return work
+
+
+def _complete(item: _PendingRelease, index: int, data: list[dict], lookups: dict) -> None:
+    """Store the result of one work item, and write the cache once the release is complete."""
+    item.chunks[index] = data
+    item.remaining -= 1
+    if item.remaining <= 0:
+        logger.info(
+            "Writing release cache for {version} {system_model}",
+            version=item.version,
+            system_model=item.system_model,
+        )
+        data = [obj for chunk in item.chunks for obj in chunk]
+        item.chunks = []
+        lookups[(item.version, item.system_model)] = write_release_cache(data, item.cache_filepath)
+
+
+def _parse_releases(
+    pending: list[_PendingRelease],
+    release: EcoinventRelease,
+    from_archive: bool,
+    processes: Optional[int],
+    chunk_size: int,
+    lookups: dict,
+) -> None:
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for item in pending:
+            work = _work_items(item, release, from_archive, chunk_size)
+            for index, unit in enumerate(tqdm(work)):
+                _complete(item, index, _parse(unit), lookups)
+        return
+
+    futures: dict[Future, tuple[_PendingRelease, int]] = {}
+
+    def collect(block: bool) -> None:
+        done = as_completed(list(futures)) if block else [f for f in futures if f.done()]
+        for future in done:
+            item, index = futures.pop(future)
+            _complete(item, index, future.result(), lookups)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # The workers parse the first releases while the next ones are downloaded
+        for item in pending:
+            work = _work_items(item, release, from_archive, chunk_size)
+            for index, unit in enumerate(work):
+                futures[executor.submit(_parse, unit)] = (item, index)
+            collect(block=False)
+        collect(block=True)
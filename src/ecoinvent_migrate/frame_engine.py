@@ -0,0 +1,154 @@
+"""DataFrame engine for geography resolution and the replace/disaggregate split.
+
+The functions here give the same results and diagnostics as the default Python engine in
+`wrangling`, but do the per-item work as pandas operations: lookup probes and `GLO`/`RoW`
+fallbacks are merges against a table of the lookup keys, and grouping by source dataset is a
+`groupby` on the source key. Only the mappings which need a change or a diagnostic record are
+visited in Python.
+
+This engine is not a general speedup. With the usual in-memory lookups, the default engine is a
+single dictionary probe per key, and is faster; `benchmarks/bench_frame_engine.py` measures
+about 0.4x for the geography resolution and 0.7x for the split at 100,000 mappings. This engine
+reads each lookup only once, so it pays off where every probe is costly: geography resolution
+against SQLite `store.ReleaseLookup`s is about 4x faster.
+
+Select this engine with `engine="pandas"` in `resolve_glo_row_rer_roe` and
+`split_replace_disaggregate`. A warning is given if it's used with other lookups than
+`store.ReleaseLookup`s.
+
+"""
+
+from copy import copy
+from typing import List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.wrangling import (
+    DatasetKey,
+    _update_key,
+    allocation_factors,
+    pair_key,
+    without_keys,
+)
+
+# Geography used when a dataset with the given geography isn't in the lookup
+FALLBACK_GEOGRAPHIES = {"GLO": "RoW", "RER": "RoE"}
+
+
+def key_frame(data: List[dict], kind: str) -> pd.DataFrame:
+    """Dataframe with the `DatasetKey` of `kind` for each mapping dictionary in `data`, in order.
+
+    Keys are kept as one column of tuples; merging and grouping on one hashed column is faster
+    than on the four string columns."""
+    return pd.DataFrame(
+        {"key": np.fromiter((pair_key(obj, kind) for obj in data), dtype=object, count=len(data))}
+    )
+
+
+def lookup_key_frame(lookup: Mapping) -> pd.DataFrame:
+    """Dataframe with one row per lookup key and the constant column `found`."""
+    keys = np.fromiter(iter(lookup), dtype=object, count=len(lookup))
+    return pd.DataFrame({"key": keys, "found": True})
+
+
+def _found(keys: pd.DataFrame, table: pd.DataFrame) -> np.ndarray:
+    # A left merge keeps the row order of `keys`, and lookup keys are unique
+    return keys.merge(table, on="key", how="left")["found"].notna().to_numpy()
+
+
+def _fallback(key: DatasetKey) -> Optional[DatasetKey]:
+    if key.geography in FALLBACK_GEOGRAPHIES:
+        return key._replace(geography=FALLBACK_GEOGRAPHIES[key.geography])
+    return None
+
+
+def _probe(keys: pd.DataFrame, table: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Get masks of keys in the lookup, and of missing keys whose fallback is in the lookup."""
+    found = _found(keys, table)
+    missing = np.flatnonzero(~found)
+    fallbacks = [_fallback(key) for key in keys["key"].to_numpy()[missing].tolist()]
+    with_fallback = np.array([key is not None for key in fallbacks], dtype=bool)
+    corrected = np.zeros(len(keys), dtype=bool)
+    if with_fallback.any():
+        candidates = pd.DataFrame(
+            {"key": np.fromiter(filter(None, fallbacks), dtype=object, count=with_fallback.sum())}
+        )
+        corrected[missing[with_fallback]] = _found(candidates, table)
+    return found, corrected
+
+
+def resolve_glo_row_rer_roe(
+    data: List[dict],
+    source_db_name: str,
+    target_db_name: str,
+    source_lookup: Mapping,
+    target_lookup: Mapping,
+    diagnostics: Diagnostics,
+) -> List[dict]:
+    """DataFrame version of `wrangling.resolve_glo_row_rer_roe`."""
+    if not data:
+        return data
+    source_table = lookup_key_frame(source_lookup)
+    target_table = (
+        source_table if target_lookup is source_lookup else lookup_key_frame(target_lookup)
+    )
+    source_keys, target_keys = key_frame(data, "source"), key_frame(data, "target")
+    source_found, source_corrected = _probe(source_keys, source_table)
+    target_found, target_corrected = _probe(target_keys, target_table)
+    source_missing = ~(source_found | source_corrected)
+    target_missing = ~(target_found | target_corrected)
+
+    for index in np.flatnonzero(source_corrected | target_corrected).tolist():
+        obj = data[index]
+        for kind, corrected in (("source", source_corrected), ("target", target_corrected)):
+            if corrected[index]:
+                key = _fallback(pair_key(obj, kind))
+                obj[kind]["geography"] = key.geography
+                _update_key(obj, kind, key)
+                diagnostics.add("geography_corrected", kind=kind, dataset=copy(obj[kind]))
+
+    # Datasets missing in both source and target for this system model aren't reported
+    only_target = target_missing & ~source_missing
+    only_target[only_target] = ~target_keys["key"][only_target].duplicated().to_numpy()
+    for index in np.flatnonzero(only_target).tolist():
+        diagnostics.add(
+            "missing_target", database=target_db_name, dataset=copy(data[index]["target"])
+        )
+    for index in np.flatnonzero(source_missing & ~target_missing).tolist():
+        diagnostics.add(
+            "missing_source", database=source_db_name, dataset=copy(data[index]["source"])
+        )
+    return data
+
+
+def split_replace_disaggregate(
+    data: List[dict], target_lookup: Mapping, diagnostics: Diagnostics
+) -> dict:
+    """DataFrame version of `wrangling.split_replace_disaggregate`."""
+    result = {"replace": [], "disaggregate": []}
+    if not data:
+        return result
+    source_keys, target_keys = key_frame(data, "source"), key_frame(data, "target")
+    # Group ids are numbered in order of first appearance, like insertion into a `dict`
+    group_ids = source_keys.groupby("key", sort=False).ngroup().to_numpy()
+    sizes = np.bincount(group_ids)
+    single = sizes[group_ids] == 1
+
+    # Different keys mean different datasets; equal keys still need the full comparison
+    same_key = (source_keys["key"] == target_keys["key"]).to_numpy()
+    for index in np.flatnonzero(single).tolist():
+        obj = data[index]
+        if not same_key[index] or obj["source"] != obj["target"]:
+            result["replace"].append(without_keys(obj))
+
+    order = np.flatnonzero(~single)
+    order = order[np.argsort(group_ids[order], kind="stable")]
+    if len(order):
+        boundaries = np.flatnonzero(np.diff(group_ids[order])) + 1
+        groups = [
+            [data[index] for index in chunk.tolist()] for chunk in np.split(order, boundaries)
+        ]
+        result["disaggregate"] = allocation_factors(groups, target_lookup, diagnostics)
+    return result
@@ -1,62 +1,87 @@
+import contextvars
 import itertools
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Union
 
 import pandas as pd
 import xmltodict
-from ecoinvent_interface import CachedStorage, ReleaseType
+from ecoinvent_interface import EcoinventRelease
 from loguru import logger
 from randonneur import Datapackage, MappingConstants
 
 from ecoinvent_migrate import __version__
-from ecoinvent_migrate.data_io import get_change_report, load_release_data
+from ecoinvent_migrate.biosphere import FlowMatcher, elementary_flows, unit_conversion_factor
+from ecoinvent_migrate.data_io import get_change_report, load_release_data, read_master_data
+from ecoinvent_migrate.diagnostics import Diagnostics
 from ecoinvent_migrate.ei_release import get_ei_release
-from ecoinvent_migrate.patches import (
-    TECHNOSPHERE_PATCHES_MISSING_DATA,
-    TECHNOSPHERE_PATCHES_REPLACEMENT_DATA,
-)
-from ecoinvent_migrate.utils import configure_logs, setup_output_directory
+from ecoinvent_migrate.errors import InvalidMigration
+from ecoinvent_migrate.patches import load_patches
+from ecoinvent_migrate.release_diff import release_diff
+from ecoinvent_migrate.utils import log_run, setup_output_directory
+from ecoinvent_migrate.validation import validate_migration
 from ecoinvent_migrate.wrangling import (
+    KEY_FIELDS,
+    add_keys,
     apply_missing_patches,
     apply_replacement_patches,
+    iter_split_replace_disaggregate,
+    pair_key,
     relabel,
     resolve_glo_row_rer_roe,
     source_target_biosphere_pair,
     source_target_pair_as_dict,
     split_replace_disaggregate,
-    tuple_key_for_data,
 )
 
+# Elementary flow attributes compared between releases to find changes not in the change report
+COMPARED_ATTRIBUTES = ("name", "formula", "unit")
 
-def generate_technosphere_mapping(
+
+def _technosphere_pairs(
     source_version: str,
     target_version: str,
-    project_name: str = "ecoinvent-migration",
-    system_model: str = "cutoff",
+    system_model: str,
+    diagnostics: Diagnostics,
     ecoinvent_username: Optional[str] = None,
     ecoinvent_password: Optional[str] = None,
-    write_logs: bool = True,
-    write_file: bool = True,
-    licenses: Optional[List[dict]] = None,
-    output_directory: Optional[Path] = None,
-    output_version: str = "2.0.0",
-    description: Optional[str] = None,
-) -> Union[Path, Datapackage]:
-    """Generate a Randonneur mapping file for technosphere edge attributes from source to target."""
-    configure_logs(write_logs=write_logs)
-
-    release = get_ei_release(
-        ecoinvent_username=ecoinvent_username,
-        ecoinvent_password=ecoinvent_password,
-    )
-    source_lookup = load_release_data(
-        version=source_version, system_model=system_model, release=release
-    )
-    target_lookup = load_release_data(
-        version=target_version, system_model=system_model, release=release
-    )
-    excel_filepath = get_change_report(
+    from_archive: bool = False,
+    release_comparison: bool = False,
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+    source_lookup: Optional[dict] = None,
+    target_lookup: Optional[dict] = None,
+    engine: str = "python",
+) -> tuple[list[dict], dict]:
+    """Read, patch, and resolve the change report data for `generate_technosphere_mapping`.
+
+    Returns the relabeled source and target pairs, and the target release lookup. The dataset
+    keys of each pair are computed once when the change report is read, and carried through
+    patching, geography resolution, and splitting; see `add_keys`."""
+    if release is None:
+        release = get_ei_release(
+            ecoinvent_username=ecoinvent_username,
+            ecoinvent_password=ecoinvent_password,
+        )
+    if source_lookup is None:
+        source_lookup = load_release_data(
+            version=source_version,
+            system_model=system_model,
+            release=release,
+            from_archive=from_archive,
+        )
+    if target_lookup is None:
+        target_lookup = load_release_data(
+            version=target_version,
+            system_model=system_model,
+            release=release,
+            from_archive=from_archive,
+        )
+    excel_filepath = change_report or get_change_report(
         source_version=source_version,
         target_version=target_version,
         release=release,
@@ -77,34 +102,28 @@ def generate_technosphere_mapping(
             )
         )
 
-    data = [
-        pair
-        for index, row in enumerate(
-            pd.read_excel(io=excel_filepath, sheet_name=candidates[0]).to_dict(orient="records")
-        )
-        for pair in source_target_pair_as_dict(
-            row, index + 2, excel_filepath.name, source_version, target_version
-        )
-    ]
+    data = add_keys(
+        [
+            pair
+            for index, row in enumerate(
+                pd.read_excel(io=excel_filepath, sheet_name=candidates[0]).to_dict(orient="records")
+            )
+            for pair in source_target_pair_as_dict(
+                row, index + 2, excel_filepath.name, source_version, target_version
+            )
+        ]
+    )
 
     source_db_name = f"ecoinvent-{source_version}-{system_model}"
     target_db_name = f"ecoinvent-{target_version}-{system_model}"
 
-    if not description:
-        description = f"Data migration file from {source_db_name} to {target_db_name} generated with `ecoinvent_migrate` version {__version__}"
-
-    try:
+    patches = load_patches(source_version=source_version, target_version=target_version)
+    if patches.replacement:
         data = apply_replacement_patches(
-            data, TECHNOSPHERE_PATCHES_REPLACEMENT_DATA[(source_version, target_version)]
+            data, patches.replacement, index=patches.replacement_index, diagnostics=diagnostics
         )
-    except KeyError:
-        pass
-    try:
-        data = apply_missing_patches(
-            data, TECHNOSPHERE_PATCHES_MISSING_DATA[(source_version, target_version)]
-        )
-    except KeyError:
-        pass
+    if patches.missing:
+        data = add_keys(apply_missing_patches(data, patches.missing))
 
     data = resolve_glo_row_rer_roe(
         data=data,
@@ -112,97 +131,249 @@ def generate_technosphere_mapping(
         target_db_name=target_db_name,
         source_lookup=source_lookup,
         target_lookup=target_lookup,
+        diagnostics=diagnostics,
+        engine=engine,
     )
 
     changed_sources = (
         set(source_lookup)
         .difference(target_lookup)
-        .difference({tuple_key_for_data(line["source"]) for line in data})
+        .difference({pair_key(line, "source") for line in data})
     )
+    if release_comparison:
+        found = add_keys(release_diff(source_lookup, target_lookup, keys=changed_sources))
+        data.extend(found)
+        changed_sources.difference_update(pair_key(obj, "source") for obj in found)
     for item in changed_sources:
-        logger.warning(
-            "Source dataset changed but neither change report nor patches have migrations: {s}",
-            s=source_lookup[item],
-        )
+        diagnostics.add("unmigrated_source", dataset=source_lookup[item])
 
-    data = [{"source": relabel(obj["source"]), "target": relabel(obj["target"])} for obj in data]
-    data = split_replace_disaggregate(data=data, target_lookup=target_lookup)
+    # Relabeling doesn't change the key values, so the stored keys stay valid
+    data = [
+        {"source": relabel(obj["source"]), "target": relabel(obj["target"])}
+        | {field: obj[field] for field in KEY_FIELDS.values()}
+        for obj in data
+    ]
+    return data, target_lookup
 
-    if not data["replace"] and not data["disaggregate"]:
-        logger.info(
-            "It seems like there are no technosphere changes for this release. Doing nothing."
-        )
+
+def _validate(data: dict, target_lookup: dict, validation: str, diagnostics: Diagnostics) -> None:
+    if validation == "off":
         return
-    if not data["replace"]:
-        del data["replace"]
-    if not data["disaggregate"]:
-        del data["disaggregate"]
-
-    dp = Datapackage(
-        name=f"{source_db_name}-{target_db_name}",
-        description=description,
-        contributors=[
-            {
-                "title": "ecoinvent association",
-                "path": "https://ecoinvent.org/",
-                "roles": ["author"],
-            },
-            {"title": "Chris Mutel", "path": "https://chris.mutel.org/", "roles": ["wrangler"]},
-        ],
-        mapping_source=MappingConstants.ECOSPOLD2,
-        mapping_target=MappingConstants.ECOSPOLD2,
-        homepage="https://github.com/brightway-lca/ecoinvent_migrate",
-        version="2.0.0",
-        source_id=source_db_name,
-        target_id=target_db_name,
-        licenses=licenses,
-    )
+    report = validate_migration(data, target_lookup)
+    if not report.ok and validation == "raise":
+        raise InvalidMigration(f"Generated migration is invalid: {report.summary()}")
+    report.annotate(diagnostics)
 
-    for key, value in data.items():
-        dp.add_data(key, value)
 
-    if write_file:
-        filename = f"{source_db_name}-{target_db_name}.json"
-        output_directory = setup_output_directory(output_directory)
-        fp = output_directory / filename
-        logger.info("Writing output file {fp}", fp=str(fp))
-        return dp.to_json(fp)
-    else:
-        return dp
+def _check_validation_mode(validation: str) -> None:
+    if validation not in ("annotate", "raise", "off"):
+        raise ValueError(f"Unknown validation mode {validation}")
 
 
-def generate_biosphere_mapping(
+def generate_technosphere_mapping(
     source_version: str,
     target_version: str,
-    keep_deletions: bool = False,
     project_name: str = "ecoinvent-migration",
+    system_model: str = "cutoff",
     ecoinvent_username: Optional[str] = None,
     ecoinvent_password: Optional[str] = None,
     write_logs: bool = True,
     write_file: bool = True,
     licenses: Optional[List[dict]] = None,
     output_directory: Optional[Path] = None,
-    output_version: str = "3.0.0",
+    output_version: str = "2.0.0",
     description: Optional[str] = None,
-) -> Optional[Path]:
-    """Generate a Randonneur mapping file for biosphere edge attributes from source to target."""
-    configure_logs(write_logs=write_logs)
+    from_archive: bool = False,
+    release_comparison: bool = False,
+    validation: str = "annotate",
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+    source_lookup: Optional[dict] = None,
+    target_lookup: Optional[dict] = None,
+    engine: str = "python",
+) -> Union[Path, Datapackage]:
+    """Generate a Randonneur mapping file for technosphere edge attributes from source to target.
+
+    With `release_comparison`, changed source datasets which aren't covered by the change report
+    or patches are matched to target datasets using their activity and product UUIDs.
+
+    The generated migration is checked against the target release before it is written. With
+    `validation="annotate"`, problems are recorded in the diagnostics; with `"raise"`, an
+    `InvalidMigration` error is raised instead; `"off"` skips the check.
+
+    `release`, `change_report`, `source_lookup`, and `target_lookup` can be given to reuse inputs
+    which were already fetched, e.g. by `generate_mappings`.
+
+    `engine` selects how geography resolution and the replace/disaggregate split are computed:
+    `"python"` loops over the mappings, and `"pandas"` uses dataframe joins and a `groupby`. Both
+    give the same results; see `frame_engine`. The pandas engine is only faster with
+    `store.ReleaseLookup`s as `source_lookup` and `target_lookup`, and warns otherwise."""
+    _check_validation_mode(validation)
+    with log_run(write_logs=write_logs) as run:
+        diagnostics = Diagnostics()
+        data, target_lookup = _technosphere_pairs(
+            source_version=source_version,
+            target_version=target_version,
+            system_model=system_model,
+            diagnostics=diagnostics,
+            ecoinvent_username=ecoinvent_username,
+            ecoinvent_password=ecoinvent_password,
+            from_archive=from_archive,
+            release_comparison=release_comparison,
+            release=release,
+            change_report=change_report,
+            source_lookup=source_lookup,
+            target_lookup=target_lookup,
+            engine=engine,
+        )
+        data = split_replace_disaggregate(
+            data=data, target_lookup=target_lookup, diagnostics=diagnostics, engine=engine
+        )
 
-    release = get_ei_release(
-        ecoinvent_username=ecoinvent_username,
-        ecoinvent_password=ecoinvent_password,
-    )
-    load_release_data(version=source_version, system_model="cutoff", release=release)
-    load_release_data(version=target_version, system_model="cutoff", release=release)
-    excel_filepath = get_change_report(
+        _validate(data, target_lookup, validation, diagnostics)
+
+        diagnostics.log_summary()
+        if run.logs_dir:
+            diagnostics.write(run.logs_dir / "diagnostics.json")
+
+        source_db_name = f"ecoinvent-{source_version}-{system_model}"
+        target_db_name = f"ecoinvent-{target_version}-{system_model}"
+        if not description:
+            description = f"Data migration file from {source_db_name} to {target_db_name} generated with `ecoinvent_migrate` version {__version__}"
+
+        if not data["replace"] and not data["disaggregate"]:
+            logger.info(
+                "It seems like there are no technosphere changes for this release. Doing nothing."
+            )
+            return
+        if not data["replace"]:
+            del data["replace"]
+        if not data["disaggregate"]:
+            del data["disaggregate"]
+
+        dp = Datapackage(
+            name=f"{source_db_name}-{target_db_name}",
+            description=description,
+            contributors=[
+                {
+                    "title": "ecoinvent association",
+                    "path": "https://ecoinvent.org/",
+                    "roles": ["author"],
+                },
+                {"title": "Chris Mutel", "path": "https://chris.mutel.org/", "roles": ["wrangler"]},
+            ],
+            mapping_source=MappingConstants.ECOSPOLD2,
+            mapping_target=MappingConstants.ECOSPOLD2,
+            homepage="https://github.com/brightway-lca/ecoinvent_migrate",
+            version="2.0.0",
+            source_id=source_db_name,
+            target_id=target_db_name,
+            licenses=licenses,
+        )
+
+        for key, value in data.items():
+            dp.add_data(key, value)
+
+        if write_file:
+            filename = f"{source_db_name}-{target_db_name}.json"
+            output_directory = setup_output_directory(output_directory)
+            fp = output_directory / filename
+            logger.info("Writing output file {fp}", fp=str(fp))
+            return dp.to_json(fp)
+        else:
+            return dp
+
+
+def iter_technosphere_mapping(
+    source_version: str,
+    target_version: str,
+    system_model: str = "cutoff",
+    ecoinvent_username: Optional[str] = None,
+    ecoinvent_password: Optional[str] = None,
+    write_logs: bool = True,
+    from_archive: bool = False,
+    release_comparison: bool = False,
+    validation: str = "annotate",
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+    source_lookup: Optional[dict] = None,
+    target_lookup: Optional[dict] = None,
+    batch_size: int = 1000,
+    engine: str = "python",
+) -> Iterator[tuple[str, dict]]:
+    """Yield the `(verb, entry)` tuples of a technosphere migration as they are produced.
+
+    Takes the same arguments as `generate_technosphere_mapping`, but nothing is collected or
+    written; consumers can start processing the first `replace` entries right away.
+    `disaggregate` entries are calculated in batches of `batch_size` source datasets. With
+    validation, each entry is checked as it is produced. The diagnostics summary is logged when
+    the iterator is exhausted.
+
+    Geography resolution needs all pairs of the change report, so the report is read, patched,
+    and resolved completely before the first entry is yielded; only the split into entries is
+    incremental. `engine` therefore only applies to geography resolution.
+
+    The run's `run_id` is only bound to log messages while the iterator is working, not in the
+    consumer's code between entries."""
+    _check_validation_mode(validation)
+    with log_run(write_logs=write_logs, contextualize=False) as run:
+        with run.context():
+            diagnostics = Diagnostics()
+            data, target_lookup = _technosphere_pairs(
+                source_version=source_version,
+                target_version=target_version,
+                system_model=system_model,
+                diagnostics=diagnostics,
+                ecoinvent_username=ecoinvent_username,
+                ecoinvent_password=ecoinvent_password,
+                from_archive=from_archive,
+                release_comparison=release_comparison,
+                release=release,
+                change_report=change_report,
+                source_lookup=source_lookup,
+                target_lookup=target_lookup,
+                engine=engine,
+            )
+            entries = iter_split_replace_disaggregate(
+                data, target_lookup, diagnostics, batch_size=batch_size
+            )
+        while True:
+            with run.context():
+                try:
+                    verb, entry = next(entries)
+                except StopIteration:
+                    diagnostics.log_summary()
+                    if run.logs_dir:
+                        diagnostics.write(run.logs_dir / "diagnostics.json")
+                    return
+                _validate({verb: [entry]}, target_lookup, validation, diagnostics)
+            yield verb, entry
+
+
+def _biosphere_data(
+    source_version: str,
+    target_version: str,
+    keep_deletions: bool = False,
+    match_deletions: bool = False,
+    ecoinvent_username: Optional[str] = None,
+    ecoinvent_password: Optional[str] = None,
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+) -> dict:
+    """Read the change report and compare elementary flow lists for `generate_biosphere_mapping`.
+
+    Returns the non-empty `delete` and `replace` sections."""
+    if release is None:
+        release = get_ei_release(
+            ecoinvent_username=ecoinvent_username,
+            ecoinvent_password=ecoinvent_password,
+        )
+    excel_filepath = change_report or get_change_report(
         source_version=source_version,
         target_version=target_version,
         release=release,
     )
 
-    source_db_name = f"ecoinvent-{source_version}-biosphere"
-    target_db_name = f"ecoinvent-{target_version}-biosphere"
-
     logger.info(
         """The `EE Deletions` format is not consistent across versions.
 Please check the outputs carefully before applying them."""
@@ -225,9 +396,6 @@ Please check the outputs carefully before applying them."""
     else:
         missing_sheet = False
 
-    if not description:
-        description = f"Data migration file from {source_db_name} to {target_db_name} generated with `ecoinvent_migrate` version {__version__}"
-
     if not missing_sheet:
         # Try reading the sheet
         df = pd.read_excel(io=excel_filepath, sheet_name=candidates[0])
@@ -274,6 +442,8 @@ Please check the outputs carefully before applying them."""
                 affected_uuids=affected_uuids,
                 source_version=source_version,
                 target_version=target_version,
+                match_deletions=match_deletions,
+                release=release,
             )
     else:
         data = supplement_biosphere_changes_with_real_data_comparison(
@@ -281,105 +451,289 @@ Please check the outputs carefully before applying them."""
             affected_uuids=set(),
             source_version=source_version,
             target_version=target_version,
+            match_deletions=match_deletions,
+            release=release,
         )
 
-    # Ensure we have non-empty data before creating Datapackage
-    has_data = False
-    cleaned_data = {}
-    for key in ["delete", "replace"]:
-        if data.get(key) and len(data[key]) > 0:
-            cleaned_data[key] = data[key]
-            has_data = True
-
-    if not has_data:
-        logger.info("No valid biosphere changes found after processing. Doing nothing.")
-        return None
-
-    dp = Datapackage(
-        name=f"{source_db_name}-{target_db_name}",
-        description=description,
-        contributors=[
-            {
-                "title": "ecoinvent association",
-                "path": "https://ecoinvent.org/",
-                "roles": ["author"],
-            },
-            {"title": "Chris Mutel", "path": "https://chris.mutel.org/", "roles": ["wrangler"]},
-        ],
-        mapping_source=MappingConstants.ECOSPOLD2_BIO,
-        mapping_target=MappingConstants.ECOSPOLD2_BIO,
-        homepage="https://github.com/brightway-lca/ecoinvent_migrate",
-        version="2.0.0",
-        source_id=source_db_name,
-        target_id=target_db_name,
-        licenses=licenses,
-    )
+    return {key: data[key] for key in ("delete", "replace") if data.get(key)}
 
-    # Only add non-empty data sections
-    for key, value in cleaned_data.items():
-        dp.add_data(key, value)
 
-    if write_file:
-        filename = f"{source_db_name}-{target_db_name}.json"
-        output_directory = setup_output_directory(output_directory)
-        fp = output_directory / filename
-        logger.info("Writing output file {fp}", fp=str(fp))
-        return dp.to_json(fp)
-    else:
-        return dp
+def generate_biosphere_mapping(
+    source_version: str,
+    target_version: str,
+    keep_deletions: bool = False,
+    match_deletions: bool = False,
+    project_name: str = "ecoinvent-migration",
+    ecoinvent_username: Optional[str] = None,
+    ecoinvent_password: Optional[str] = None,
+    write_logs: bool = True,
+    write_file: bool = True,
+    licenses: Optional[List[dict]] = None,
+    output_directory: Optional[Path] = None,
+    output_version: str = "3.0.0",
+    description: Optional[str] = None,
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+) -> Optional[Path]:
+    """Generate a Randonneur mapping file for biosphere edge attributes from source to target.
+
+    Only the change report and the elementary flow lists in the release `MasterData` are read; the
+    unit process datasets aren't needed. `release` and `change_report` can be given to reuse
+    inputs which were already fetched."""
+    with log_run(write_logs=write_logs):
+        cleaned_data = _biosphere_data(
+            source_version=source_version,
+            target_version=target_version,
+            keep_deletions=keep_deletions,
+            match_deletions=match_deletions,
+            ecoinvent_username=ecoinvent_username,
+            ecoinvent_password=ecoinvent_password,
+            release=release,
+            change_report=change_report,
+        )
 
+        source_db_name = f"ecoinvent-{source_version}-biosphere"
+        target_db_name = f"ecoinvent-{target_version}-biosphere"
+        if not description:
+            description = f"Data migration file from {source_db_name} to {target_db_name} generated with `ecoinvent_migrate` version {__version__}"
 
-def supplement_biosphere_changes_with_real_data_comparison(
-    data: dict, affected_uuids: set, source_version: str, target_version: str
-) -> dict:
-    cs = CachedStorage()
-
-    def format(ecospold: dict) -> dict:
-        return {
-            obj["@id"]: {
-                "name": obj["name"]["#text"].strip(),
-                "formula": obj.get("@formula").strip() if obj.get("@formula") else None,
-                "unit": obj["unitName"]["#text"].strip(),
+        if not cleaned_data:
+            logger.info("No valid biosphere changes found after processing. Doing nothing.")
+            return None
+
+        dp = Datapackage(
+            name=f"{source_db_name}-{target_db_name}",
+            description=description,
+            contributors=[
+                {
+                    "title": "ecoinvent association",
+                    "path": "https://ecoinvent.org/",
+                    "roles": ["author"],
+                },
+                {"title": "Chris Mutel", "path": "https://chris.mutel.org/", "roles": ["wrangler"]},
+            ],
+            mapping_source=MappingConstants.ECOSPOLD2_BIO,
+            mapping_target=MappingConstants.ECOSPOLD2_BIO,
+            homepage="https://github.com/brightway-lca/ecoinvent_migrate",
+            version="2.0.0",
+            source_id=source_db_name,
+            target_id=target_db_name,
+            licenses=licenses,
+        )
+
+        # Only add non-empty data sections
+        for key, value in cleaned_data.items():
+            dp.add_data(key, value)
+
+        if write_file:
+            filename = f"{source_db_name}-{target_db_name}.json"
+            output_directory = setup_output_directory(output_directory)
+            fp = output_directory / filename
+            logger.info("Writing output file {fp}", fp=str(fp))
+            return dp.to_json(fp)
+        else:
+            return dp
+
+
+def iter_biosphere_mapping(
+    source_version: str,
+    target_version: str,
+    keep_deletions: bool = False,
+    match_deletions: bool = False,
+    ecoinvent_username: Optional[str] = None,
+    ecoinvent_password: Optional[str] = None,
+    write_logs: bool = True,
+    release: Optional[EcoinventRelease] = None,
+    change_report: Optional[Path] = None,
+) -> Iterator[tuple[str, dict]]:
+    """Yield the `(verb, entry)` tuples of a biosphere migration.
+
+    Takes the same arguments as `generate_biosphere_mapping`, but nothing is collected or
+    written. The change report and flow lists are compared completely before the first entry is
+    yielded."""
+    with log_run(write_logs=write_logs, contextualize=False) as run, run.context():
+        data = _biosphere_data(
+            source_version=source_version,
+            target_version=target_version,
+            keep_deletions=keep_deletions,
+            match_deletions=match_deletions,
+            ecoinvent_username=ecoinvent_username,
+            ecoinvent_password=ecoinvent_password,
+            release=release,
+            change_report=change_report,
+        )
+    for verb, entries in data.items():
+        for entry in entries:
+            yield verb, entry
+
+
+@dataclass
+class MappingResults:
+    """Outputs of `generate_mappings`, with the wall clock seconds spent in each stage."""
+
+    technosphere: Union[Path, Datapackage, None]
+    biosphere: Union[Path, Datapackage, None]
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def timing_report(self) -> str:
+        return "Timings: " + ", ".join(f"{key} {value:.2f}s" for key, value in self.timings.items())
+
+
+@contextmanager
+def _timed(timings: dict, label: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[label] = time.perf_counter() - start
+
+
+def generate_mappings(
+    source_version: str,
+    target_version: str,
+    system_model: str = "cutoff",
+    ecoinvent_username: Optional[str] = None,
+    ecoinvent_password: Optional[str] = None,
+    write_logs: bool = True,
+    write_file: bool = True,
+    output_directory: Optional[Path] = None,
+    from_archive: bool = False,
+    technosphere_kwargs: Optional[dict] = None,
+    biosphere_kwargs: Optional[dict] = None,
+    release: Optional[EcoinventRelease] = None,
+) -> MappingResults:
+    """Generate the technosphere and biosphere mapping files for one release pair.
+
+    The release, release data, and change report are fetched once and shared, and then the two
+    generators run concurrently in threads. Other arguments for the generators can be given in
+    `technosphere_kwargs` and `biosphere_kwargs`. Logs a single timing report.
+
+    Pass a `release` from `get_ei_release` to reuse one session across many release pairs."""
+    timings = {}
+    with log_run(write_logs=False), _timed(timings, "total"):
+        with _timed(timings, "release"):
+            if release is None:
+                release = get_ei_release(
+                    ecoinvent_username=ecoinvent_username,
+                    ecoinvent_password=ecoinvent_password,
+                )
+        with _timed(timings, "change report"):
+            change_report = get_change_report(
+                source_version=source_version,
+                target_version=target_version,
+                release=release,
+            )
+        with _timed(timings, "release data"):
+            lookups = {
+                version: load_release_data(
+                    version=version,
+                    system_model=system_model,
+                    release=release,
+                    from_archive=from_archive,
+                )
+                for version in (source_version, target_version)
             }
-            for obj in ecospold["validElementaryExchanges"]["elementaryExchange"]
+
+        shared = {
+            "write_logs": write_logs,
+            "write_file": write_file,
+            "output_directory": output_directory,
+            "release": release,
+            "change_report": change_report,
         }
 
-    source_ee = format(
-        xmltodict.parse(
-            open(
-                Path(
-                    cs.catalogue[
-                        ReleaseType.ecospold.filename(
-                            version=source_version, system_model_abbr="cutoff"
-                        )
-                    ]["path"]
+        def technosphere() -> Union[Path, Datapackage, None]:
+            with _timed(timings, "technosphere"):
+                return generate_technosphere_mapping(
+                    source_version=source_version,
+                    target_version=target_version,
+                    system_model=system_model,
+                    source_lookup=lookups[source_version],
+                    target_lookup=lookups[target_version],
+                    **shared,
+                    **(technosphere_kwargs or {}),
                 )
-                / "MasterData"
-                / "ElementaryExchanges.xml",
-                "rb",
-            )
-        )
-    )
-    target_ee = format(
-        xmltodict.parse(
-            open(
-                Path(
-                    cs.catalogue[
-                        ReleaseType.ecospold.filename(
-                            version=target_version, system_model_abbr="cutoff"
-                        )
-                    ]["path"]
+
+        def biosphere() -> Union[Path, Datapackage, None]:
+            with _timed(timings, "biosphere"):
+                return generate_biosphere_mapping(
+                    source_version=source_version,
+                    target_version=target_version,
+                    **shared,
+                    **(biosphere_kwargs or {}),
                 )
-                / "MasterData"
-                / "ElementaryExchanges.xml",
-                "rb",
-            )
-        )
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, func)
+                for func in (technosphere, biosphere)
+            ]
+            technosphere_result, biosphere_result = [future.result() for future in futures]
+
+    results = MappingResults(
+        technosphere=technosphere_result, biosphere=biosphere_result, timings=timings
     )
+    logger.info(results.timing_report())
+    return results
+
+
+def supplement_biosphere_changes_with_real_data_comparison(
+    data: dict,
+    affected_uuids: set,
+    source_version: str,
+    target_version: str,
+    match_deletions: bool = False,
+    min_confidence: float = 0.6,
+    release: Optional[EcoinventRelease] = None,
+) -> dict:
+    """Add biosphere changes found by comparing the source and target elementary flow lists.
+
+    Flows missing from the target are added to `delete`. With `match_deletions`, a `FlowMatcher`
+    first looks for a new target flow with a matching name, CAS number, formula, compartment and
+    unit; candidates with at least `min_confidence` are added to `replace` instead. A successor
+    with a different unit gets a `conversion_factor`, and is only used if the units can be
+    converted; see `biosphere.unit_conversion_factor`.
+
+    The elementary flow lists are read from the release `MasterData` with `read_master_data`."""
+    if release is None:
+        release = get_ei_release()
+
+    def read(version: str) -> dict:
+        return elementary_flows(
+            xmltodict.parse(read_master_data(version, "ElementaryExchanges.xml", release))
+        )
+
+    source_ee = read(source_version)
+    target_ee = read(target_version)
+
+    if match_deletions:
+        matcher = FlowMatcher(
+            {key: value for key, value in target_ee.items() if key not in source_ee}
+        )
 
     # Patch changes which aren't included in the change report
     for key_source, value_source in source_ee.items():
         if key_source not in target_ee and key_source not in affected_uuids:
+            candidate = matcher.match(value_source) if match_deletions else None
+            factor = (
+                unit_conversion_factor(value_source["unit"], candidate.flow["unit"])
+                if candidate and candidate.confidence >= min_confidence
+                else None
+            )
+            if factor is not None:
+                entry = {
+                    "source": {"uuid": key_source, "name": value_source["name"]},
+                    "target": {"uuid": candidate.uuid, "name": candidate.flow["name"]},
+                    "confidence": candidate.confidence,
+                    "comment": "Deleted flow not listed in change report; "
+                    + f"matched to new flow with confidence {candidate.confidence:.2f}",
+                }
+                if candidate.flow["unit"] != value_source["unit"]:
+                    entry["source"]["unit"] = value_source["unit"]
+                    entry["target"]["unit"] = candidate.flow["unit"]
+                    entry["conversion_factor"] = factor
+                data["replace"].append(entry)
+                continue
             if "delete" not in data:
                 data["delete"] = []
             data["delete"].append(
@@ -396,12 +750,15 @@ def supplement_biosphere_changes_with_real_data_comparison(
         diff = {
             key: value
             for key, value in target_ee[key_source].items()
-            if value and value != value_source[key]
+            if key in COMPARED_ATTRIBUTES and value and value != value_source[key]
         }
         if diff:
             data["replace"].append(
                 {
-                    "source": {k: v for k, v in value_source.items() if v} | {"uuid": key_source},
+                    "source": {
+                        k: v for k, v in value_source.items() if k in COMPARED_ATTRIBUTES and v
+                    }
+                    | {"uuid": key_source},
                     "target": diff | {"uuid": key_source},
                     "comment": "Flow attribute change not listed in change report",
                 }
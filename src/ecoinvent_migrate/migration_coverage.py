@@ -0,0 +1,135 @@
+"""Estimate how a migration would affect exported foreground databases before applying it.
+
+Foreground databases are lists of dataset dictionaries with an `exchanges` list, either already
+loaded or as JSON files. Exchanges use the `name`, `location`, `reference product`, and `unit`
+labels; see `apply.py`.
+
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from randonneur import Datapackage
+
+from ecoinvent_migrate.apply import CompiledMigration, compile_migration
+
+# Set in each worker process by `_init_worker`, so the index is only sent once per process
+_WORKER_STATE = {}
+
+
+@dataclass
+class CoverageReport:
+    """Counts of exchanges in one foreground database affected by a migration.
+
+    * `replaced`: Exchanges relinked by a `replace` entry
+    * `disaggregated`: Exchanges split by a `disaggregate` entry
+    * `dangling`: Exchanges not in the migration and not in `target_keys`; these would be left
+      linking to datasets which don't exist in the target release
+    * `unmatched`: The unique keys of the dangling exchanges
+
+    If `source_keys` was given, only exchanges linking to the source release are counted in
+    `exchanges`; other exchanges are assumed to be internal foreground links.
+
+    """
+
+    database: str
+    exchanges: int = 0
+    replaced: int = 0
+    disaggregated: int = 0
+    dangling: int = 0
+    unmatched: list[tuple] = field(default_factory=list)
+
+    @property
+    def unchanged(self) -> int:
+        return self.exchanges - self.replaced - self.disaggregated - self.dangling
+
+
+def database_coverage(
+    name: str,
+    datasets: Union[list[dict], Path],
+    migration: CompiledMigration,
+    source_keys: Optional[set] = None,
+    target_keys: Optional[set] = None,
+) -> CoverageReport:
+    """Count the exchanges in `datasets` affected by `migration`.
+
+    Dangling exchanges can only be found if `target_keys` is given."""
+    if isinstance(datasets, (str, Path)):
+        datasets = json.load(open(datasets, encoding="utf-8"))
+
+    replace, disaggregate = migration.replace, migration.disaggregate
+    report = CoverageReport(database=name)
+    unmatched = set()
+
+    for dataset in datasets:
+        for exchange in dataset.get("exchanges", []):
+            get = exchange.get
+            key = (get("name"), get("location"), get("reference product"), get("unit"))
+            if source_keys is not None and key not in source_keys:
+                continue
+            report.exchanges += 1
+            if key in replace:
+                report.replaced += 1
+            elif key in disaggregate:
+                report.disaggregated += 1
+            elif target_keys is not None and key not in target_keys:
+                report.dangling += 1
+                unmatched.add(key)
+
+    report.unmatched = sorted(unmatched, key=lambda x: tuple(str(o) for o in x))
+    return report
+
+
+def _init_worker(
+    migration: CompiledMigration, source_keys: Optional[set], target_keys: Optional[set]
+) -> None:
+    _WORKER_STATE.update(migration=migration, source_keys=source_keys, target_keys=target_keys)
+
+
+def _worker_coverage(name: str, datasets: Union[list[dict], Path]) -> CoverageReport:
+    return database_coverage(name=name, datasets=datasets, **_WORKER_STATE)
+
+
+def migration_coverage(
+    databases: dict[str, Union[list[dict], Path]],
+    migration: Union[CompiledMigration, Datapackage, dict, Path],
+    source_keys: Optional[set] = None,
+    target_keys: Optional[set] = None,
+    processes: Optional[int] = None,
+) -> dict[str, CoverageReport]:
+    """Analyze the coverage of `migration` for many foreground `databases` in parallel.
+
+    `databases` maps database names to lists of datasets or JSON filepaths; passing filepaths
+    avoids sending the data to the worker processes. The migration index and the optional
+    `source_keys` and `target_keys` sets (e.g. the keys of the release lookups from
+    `load_release_data`) are built once and sent once to each worker process.
+
+    `processes` defaults to the number of CPUs; with `processes=1` everything runs in this
+    process.
+    """
+    if not isinstance(migration, CompiledMigration):
+        migration = compile_migration(migration)
+    source_keys = set(source_keys) if source_keys is not None else None
+    target_keys = set(target_keys) if target_keys is not None else None
+    processes = min(processes or os.cpu_count() or 1, len(databases) or 1)
+
+    if processes == 1:
+        return {
+            name: database_coverage(name, datasets, migration, source_keys, target_keys)
+            for name, datasets in databases.items()
+        }
+
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_worker,
+        initargs=(migration, source_keys, target_keys),
+    ) as executor:
+        futures = {
+            name: executor.submit(_worker_coverage, name, datasets)
+            for name, datasets in databases.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,115 @@
+"""Semantic comparison of two migration files, e.g. regenerated and published `outputs/`.
+
+Both migrations are indexed on `(verb, source)`, so the comparison is linear in the number of
+entries. Metadata like `created` and entry `comment` values are ignored; only changes which would
+relink exchanges differently are reported.
+
+"""
+
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Union
+
+from randonneur import Datapackage
+
+from ecoinvent_migrate.apply import migration_data
+
+VERBS = ("replace", "disaggregate", "delete")
+
+
+def _frozen(obj: dict, exclude: tuple[str, ...] = ()) -> tuple:
+    return tuple(sorted((key, value) for key, value in obj.items() if key not in exclude))
+
+
+def index_migration(migration: Union[Datapackage, dict, Path]) -> dict[tuple, dict]:
+    """Index the entries of each verb section on `(verb, source attributes)`."""
+    data = migration_data(migration)
+    return {(verb, _frozen(obj["source"])): obj for verb in VERBS for obj in data.get(verb) or []}
+
+
+@dataclass
+class MigrationChange:
+    verb: str
+    source: dict
+    reasons: list[str]
+
+
+@dataclass
+class MigrationDiff:
+    """Differences between an `old` and a `new` migration.
+
+    * `added`: `(verb, source)` for entries only in the new migration
+    * `removed`: `(verb, source)` for entries only in the old migration
+    * `changed`: Entries in both whose target, conversion factor, or allocation changed
+
+    """
+
+    added: list[tuple[str, dict]] = field(default_factory=list)
+    removed: list[tuple[str, dict]] = field(default_factory=list)
+    changed: list[MigrationChange] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.removed)} removed, "
+            f"{len(self.changed)} changed mappings"
+        )
+
+
+def _order(entry: tuple[str, dict]) -> tuple:
+    verb, source = entry
+    return (verb, sorted((key, str(value)) for key, value in source.items()))
+
+
+def _entry_changes(verb: str, old: dict, new: dict, tolerance: float) -> list[str]:
+    reasons = []
+    if verb == "replace":
+        if old["target"] != new["target"]:
+            reasons.append(f"target changed from {old['target']} to {new['target']}")
+        old_cf, new_cf = old.get("conversion_factor", 1.0), new.get("conversion_factor", 1.0)
+        if not math.isclose(old_cf, new_cf, rel_tol=0, abs_tol=tolerance):
+            reasons.append(f"conversion factor changed from {old_cf} to {new_cf}")
+    elif verb == "disaggregate":
+        old_targets = {_frozen(obj, ("allocation",)): obj for obj in old["targets"]}
+        new_targets = {_frozen(obj, ("allocation",)): obj for obj in new["targets"]}
+        for key in new_targets.keys() - old_targets.keys():
+            reasons.append(f"target added: {dict(key)}")
+        for key in old_targets.keys() - new_targets.keys():
+            reasons.append(f"target removed: {dict(key)}")
+        for key in old_targets.keys() & new_targets.keys():
+            old_allocation = old_targets[key]["allocation"]
+            new_allocation = new_targets[key]["allocation"]
+            if not math.isclose(old_allocation, new_allocation, rel_tol=0, abs_tol=tolerance):
+                reasons.append(
+                    f"allocation for {dict(key)} changed from {old_allocation} to {new_allocation}"
+                )
+    return reasons
+
+
+def diff_migrations(
+    old: Union[Datapackage, dict, Path],
+    new: Union[Datapackage, dict, Path],
+    tolerance: float = 1e-6,
+) -> MigrationDiff:
+    """Compare two migrations entry by entry.
+
+    Allocation factors and conversion factors which differ by less than `tolerance` are
+    considered equal."""
+    old_index, new_index = index_migration(old), index_migration(new)
+    result = MigrationDiff(
+        added=[(verb, dict(source)) for verb, source in new_index.keys() - old_index.keys()],
+        removed=[(verb, dict(source)) for verb, source in old_index.keys() - new_index.keys()],
+    )
+    for key in old_index.keys() & new_index.keys():
+        verb, source = key
+        if reasons := _entry_changes(verb, old_index[key], new_index[key], tolerance):
+            result.changed.append(MigrationChange(verb=verb, source=dict(source), reasons=reasons))
+
+    result.added.sort(key=_order)
+    result.removed.sort(key=_order)
+    result.changed.sort(key=lambda x: _order((x.verb, x.source)))
+    return result
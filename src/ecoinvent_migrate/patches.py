@@ -1,472 +1,92 @@
-from functools import partial
+"""Manual fixes for errors and omissions in the ecoinvent change reports.
 
-SYNCOAL_PRODUCTS = [
-    "1-propanol",
-    "acetone, liquid",
-    "ammonia, anhydrous, liquid",
-    "butyl acrylate",
-    "chemical, organic",
-    "diesel, low-sulfur",
-    "ethanol, without water, in 99.7% solution state, from ethylene",
-    "ethylene",
-    "heavy fuel oil",
-    "isobutanol",
-    "liquefied petroleum gas",
-    "methanol",
-    "methyl ethyl ketone",
-    "natural gas, high pressure",
-    "pitch",
-    "propylene",
-    "sulfur",
-]
+Patches are stored as one JSON data file per release pair in `data/patches`, named
+`{source_version}-{target_version}.json`. Each file has two sections:
 
-ACETIC_ACID_BYPRODUCTS = [
-    "acetone, liquid",
-    "ethyl acetate",
-    "formic acid",
-    "methyl acetate",
-    "methyl ethyl ketone",
-    "propionic acid",
-]
+* `missing`: Transformations missing from the change report; see `apply_missing_patches`.
+* `replacement`: Corrections to entries in the change report; see `apply_replacement_patches`.
 
+Files are only read when a release pair is requested, and all dataset dictionaries are
+normalized to the `activity_name`, `geography`, `product_name`, `unit` labels used in the
+change report wrangling.
 
-def byproduct(
-    old_name: str,
-    new_name: str,
-    product: str,
-    geography: str,
-    unit: str,
-    comment: str = "By-product production missed in change report during name change",
-) -> dict:
-    return {
-        "source": {
-            "activity_name": old_name,
-            "product_name": product,
-            "unit": unit,
-            "geography": geography,
-        },
-        "target": {
-            "activity_name": new_name,
-        },
-        "comment": comment,
-    }
+"""
 
+import json
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from pathlib import Path
 
-acetic_acid_production_311 = partial(
-    byproduct,
-    old_name="acetic acid production, butane oxidation",
-    new_name="acetic acid production, from n-butane oxidation",
-    comment="3.11 change report section 7.7.3. Change report is missing by-products of new model",
-    unit="kg",
-)
+from ecoinvent_migrate.wrangling import compile_replacement_patches
 
-scrap_tin_sanitary_311 = partial(
-    byproduct,
-    old_name="treatment of scrap tin sheet, sanitary landfill",
-    new_name="treatment of waste tin sheet, sanitary landfill",
-)
+PATCHES_DIR = Path(__file__).parent / "data" / "patches"
 
-# Synthetic fuel production, from coal, high temperature Fisher-Tropsch operations in South Africa
-# Completed changed but not well-documented in change report
-syncoal_311 = partial(
-    byproduct,
-    old_name="synthetic fuel production, from coal, high temperature Fisher-Tropsch operations",
-    unit="kg",
-    geography="ZA",
-    new_name="synthetic fuel production, from coal, high temperature Fischer-Tropsch operations",
-)
+LABELS = {
+    "name": "activity_name",
+    "location": "geography",
+    "reference product": "product_name",
+}
 
 
-TECHNOSPHERE_PATCHES_MISSING_DATA = {
-    ("3.9.1", "3.10"): [
-        {
-            "source": {
-                "name": "modified Solvay process, Hou's process",
-                "location": "GLO",
-                "reference product": "ammonium chloride",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "soda ash production, dense, Hou's process",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "Mannheim process",
-                "location": "RER",
-                "reference product": "sodium sulfate, anhydrite",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "hydrochloric acid production, Mannheim process",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "Mannheim process",
-                "location": "RoW",
-                "reference product": "sodium sulfate, anhydrite",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "hydrochloric acid production, Mannheim process",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "wheat production, Swiss integrated production, intensive",
-                "location": "CH",
-                "reference product": "straw",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "wheat grain production, Swiss integrated production, intensive",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "wheat production, Swiss integrated production, extensive",
-                "location": "CH",
-                "reference product": "straw",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "wheat grain production, Swiss integrated production, extensive",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "air separation, cryogenic",
-                "reference product": "nitrogen, liquid",
-                "location": "RER",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "industrial gases production, cryogenic air separation",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "air separation, cryogenic",
-                "reference product": "nitrogen, liquid",
-                "location": "RoW",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "industrial gases production, cryogenic air separation",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "air separation, cryogenic",
-                "reference product": "argon, crude, liquid",
-                "location": "RER",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "industrial gases production, cryogenic air separation",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-        {
-            "source": {
-                "name": "air separation, cryogenic",
-                "reference product": "argon, crude, liquid",
-                "location": "RoW",
-                "unit": "kg",
-            },
-            "target": {
-                "name": "industrial gases production, cryogenic air separation",
-            },
-            "comment": "By-product production missed in change report during name change",
-        },
-    ],
-    ("3.10.1", "3.11"): (
-        [syncoal_311(product=product) for product in SYNCOAL_PRODUCTS]
-        + [
-            {
-                "source": {
-                    "activity_name": "synthetic fuel production, from coal, high temperature Fisher-Tropsch operations",
-                    "product_name": "1-butanol",
-                    "unit": "kg",
-                    "geography": "ZA",
-                },
-                "target": {
-                    "activity_name": "synthetic fuel production, from coal, high temperature Fischer-Tropsch operations",
-                    "product_name": "n-butanol",
-                },
-                "comment": "By-product production missed in change report during name change.",
-            },
-        ]
-        + [
-            scrap_tin_sanitary_311(product="electricity, medium voltage", unit="kWh", geography=geo)
-            for geo in ("EC", "PE", "RoW")
-        ]
-        + [
-            scrap_tin_sanitary_311(
-                product="heat, district or industrial, other than natural gas",
-                unit="MJ",
-                geography=geo,
-            )
-            for geo in ("EC", "PE", "RoW")
-        ]
-        + [
-            acetic_acid_production_311(geography=geo, product=product)
-            for geo in ("RER", "RoW")
-            for product in ACETIC_ACID_BYPRODUCTS
-        ]
-        + [
-            # Natural gas transport modelling changed
-            {
-                "source": {
-                    "activity_name": "natural gas, high pressure, import from NL",
-                    "product_name": "natural gas, high pressure",
-                    "unit": "m3",
-                    "geography": "IT",
-                },
-                "target": {
-                    "activity_name": "natural gas, high pressure, import from BE",
-                },
-                "comment": "3.11 change report section 5.3.3.4, Table 30. Hard to understand text above table 30; best-effort replacement activity.",
-            },
-            {
-                "source": {
-                    "activity_name": "natural gas, high pressure, import from NL",
-                    "product_name": "natural gas, high pressure",
-                    "unit": "m3",
-                    "geography": "FR",
-                },
-                "target": {
-                    "activity_name": "natural gas, high pressure, import from BE",
-                },
-                "comment": "3.11 change report section 5.3.3.4, Table 30. Hard to understand text above table 30; best-effort replacement activity.",
-            },
-            {
-                "source": {
-                    "activity_name": "natural gas, high pressure, import from NL",
-                    "product_name": "natural gas, high pressure",
-                    "unit": "m3",
-                    "geography": "GB",
-                },
-                "target": {
-                    "activity_name": "natural gas, high pressure, import from NO",
-                },
-                "comment": "3.11 change report section 5.3.3.4, Table 30. Hard to understand text above table 30; best-effort replacement activity.",
-            },
-            {
-                "source": {
-                    "activity_name": "natural gas, high pressure, import from FR",
-                    "product_name": "natural gas, high pressure",
-                    "unit": "m3",
-                    "geography": "NL",
-                },
-                "target": {
-                    "activity_name": "natural gas, high pressure, import from BE",
-                },
-                "comment": "3.11 change report section 5.3.3.4, Table 30. Hard to understand text above table 30; best-effort replacement activity.",
-            },
-            # Kraft paper update removed some by-products
-            {
-                "source": {
-                    "activity_name": "kraft paper production",
-                    "product_name": "electricity, high voltage",
-                    "unit": "kWh",
-                    "geography": "RER",
-                },
-                "target": {
-                    "activity_name": "sulfate pulp production, from softwood, unbleached",
-                },
-                "comment": "By-product production removed and not documented in 3.11 change report (see section 14.2); Technology switch as best-effort replacement",
-            },
-            # Swiss crop production disaggregated by space and time missing by-products
-            {
-                "source": {
-                    "activity_name": "wheat grain production, organic",
-                    "product_name": "straw, organic",
-                    "unit": "kg",
-                    "geography": "CH",
-                },
-                "targets": [
-                    {
-                        f"activity_name": f"wheat grain production, {season}, organic, {region} region",
-                    }
-                    for season in ("spring", "winter")
-                    for region in ("hill", "mountain", "plain")
-                ]
-                + [
-                    {"activity_name": f"wheat grain, feed production, organic, {region} region"}
-                    for region in ("hill", "mountain", "plain")
-                ],
-                "comment": "By-product production missed in change report during name change (see section 12.2)",
-            },
-            {
-                "source": {
-                    "activity_name": "barley grain production, organic",
-                    "product_name": "straw, organic",
-                    "unit": "kg",
-                    "geography": "CH",
-                },
-                "targets": [
-                    {
-                        "activity_name": f"barley grain production, winter, organic, {region} region",
-                    }
-                    for region in ("hill", "mountain", "plain")
-                ],
-                "comment": "By-product production missed in change report during name change (see section 12.2)",
-            },
-            {
-                "source": {
-                    "activity_name": "rye production, organic",
-                    "product_name": "straw, organic",
-                    "unit": "kg",
-                    "geography": "CH",
-                },
-                "targets": [
-                    {
-                        "activity_name": f"rye grain production, winter, organic, {region} region",
-                    }
-                    for region in ("hill", "mountain", "plain")
-                ],
-                "comment": "By-product production missed in change report during name change (see section 12.2)",
-            },
-            # This needs a more specialized approach as global average is 25 years out of date...
-            # ] + [
-            #     # Some natural gas transport datasets deleted
-            #     {
-            #         "source": {
-            #             "activity_name": 'transport, pipeline, onshore, long distance, natural gas',
-            #             "product_name": "transport, pipeline, onshore, long distance, natural gas",
-            #             "unit": "metric ton*km",
-            #             "geography": geo,
-            #         },
-            #         "target": {
-            #             "activity_name": 'transport, pipeline, onshore, long distance, natural gas',
-            #             "product_name": "transport, pipeline, onshore, long distance, natural gas",
-            #             "unit": "metric ton*km",
-            #             "geography": geo,
-            #         }
-            #         "comment": "By-product production missed in change report during name change (see section 12.2)",
-            #     } for geo in ("AE","BR","CN","CO","DE","EC","GB","IQ","KW","MY","NG","QA","RO","SA","VE")
-        ]
-    ),
-}
+def normalize_labels(obj: dict) -> dict:
+    """Change from Randonneur constants.ECOSPOLD2 labels to ecospold2-ish labels.
 
+    The inverse of `wrangling.relabel`, but also works on partial dictionaries."""
+    return {LABELS.get(key, key): value for key, value in obj.items()}
 
-TECHNOSPHERE_PATCHES_REPLACEMENT_DATA = {
-    # This is for cases where there is an entry in the change report, but that entry is incorrect.
-    ("3.10.1", "3.11"): [
-        # Misc. errors in change report or source data
-        {
-            "source": {
-                "activity_name": "market for straw",
-                "geography": "RER",
-                "product_name": "straw",
-                "unit": "kg",
-            },
-            "target": {
-                "geography": "Europe without Switzerland",
-            },
-            "context": "target",
-            "comment": "Data error in change report geography.",
-        },
-        {
-            "source": {
-                "activity_name": "treatment of used refrigerant R134a, reclamation",
-                "product_name": "used refrigerant R134a",
-                "unit": "kg",
-                "geography": "GLO",
-            },
-            "target": {"product_name": "refrigerant R134a"},
-            "comment": "Data error in original dataset; should have treated used refrigerant. Change report assumes correct product.",
-            "context": "source",
-        },
-        # Both change report and change documentation think product is `flakes`, but it's actually
-        # `pellets`
-        {
-            "source": {
-                "activity_name": "pelletising of polyethylene, high density",
-                "geography": "RER",
-                "product_name": "polyethylene, high density, flakes, recycled",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "polyethylene, high density, pellets, recycled",
-            },
-            "context": "target",
-            "comment": "Data error in change report product name.",
-        },
-        {
-            "source": {
-                "activity_name": "pelletising of polyethylene terephthalate",
-                "geography": "RER",
-                "product_name": "polyethylene terephthalate, flakes, recycled",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "polyethylene terephthalate, pellets, recycled",
-            },
-            "context": "target",
-            "comment": "Data error in change report product name.",
-        },
-        {
-            "source": {
-                "activity_name": "pelletising of polyethylene terephthalate, food grade",
-                "geography": "RER",
-                "product_name": "polyethylene terephthalate, flakes, food grade, recycled",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "polyethylene terephthalate, pellets, food grade, recycled",
-            },
-            "context": "target",
-            "comment": "Data error in change report product name.",
-        },
-        # Change report uses unsorted reference product
-        {
-            "source": {
-                "activity_name": "treatment of waste polyethylene terephthalate, for recycling, unsorted, sorting",
-                "geography": "CH",
-                "product_name": "waste polyethylene terephthalate, for recycling, unsorted",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "waste polyethylene terephthalate, for recycling, sorted",
-            },
-            "context": "source",
-            "comment": "Change report has unsorted reference product, should be sorted.",
-        },
-        {
-            "source": {
-                "activity_name": "treatment of waste polyethylene terephthalate, for recycling, unsorted, sorting",
-                "geography": "Europe without Switzerland",
-                "product_name": "waste polyethylene terephthalate, for recycling, unsorted",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "waste polyethylene terephthalate, for recycling, sorted",
-            },
-            "context": "source",
-            "comment": "Change report has unsorted reference product, should be sorted.",
-        },
-        {
-            "source": {
-                "activity_name": "treatment of waste polyethylene terephthalate, for recycling, unsorted, sorting",
-                "geography": "GLO",
-                "product_name": "waste polyethylene terephthalate, for recycling, unsorted",
-                "unit": "kg",
-            },
-            "target": {
-                "product_name": "waste polyethylene terephthalate, for recycling, sorted",
-            },
-            "context": "target",
-            "comment": "Change report has unsorted reference product, should be sorted.",
-        },
-    ]
-}
+
+def normalize_patch(patch: dict) -> dict:
+    patch = dict(patch)
+    for kind in ("source", "target"):
+        if kind in patch:
+            patch[kind] = normalize_labels(patch[kind])
+    if "targets" in patch:
+        patch["targets"] = [normalize_labels(target) for target in patch["targets"]]
+    return patch
+
+
+@dataclass(frozen=True)
+class PatchSet:
+    """Patches for one source/target release pair."""
+
+    source_version: str
+    target_version: str
+    missing: list[dict] = field(default_factory=list)
+    replacement: list[dict] = field(default_factory=list)
+
+    @cached_property
+    def replacement_index(self) -> dict:
+        return compile_replacement_patches(self.replacement)
+
+
+def patch_filepath(source_version: str, target_version: str) -> Path:
+    return PATCHES_DIR / f"{source_version}-{target_version}.json"
+
+
+def available_patch_pairs() -> list[tuple[str, str]]:
+    """List the `(source_version, target_version)` pairs which have patch data files."""
+    pairs = []
+    for fp in sorted(PATCHES_DIR.glob("*.json")):
+        data = json.load(open(fp, encoding="utf-8"))
+        pairs.append((data["source_version"], data["target_version"]))
+    return pairs
+
+
+@lru_cache(maxsize=None)
+def load_patches(source_version: str, target_version: str) -> PatchSet:
+    """Load the patches for a release pair. Returns an empty `PatchSet` if there are none."""
+    fp = patch_filepath(source_version, target_version)
+    if not fp.is_file():
+        return PatchSet(source_version=source_version, target_version=target_version)
+
+    data = json.load(open(fp, encoding="utf-8"))
+    if (data["source_version"], data["target_version"]) != (source_version, target_version):
+        raise ValueError(
+            f"Patch file {fp.name} is for {data['source_version']} to {data['target_version']}"
+        )
+    return PatchSet(
+        source_version=source_version,
+        target_version=target_version,
+        missing=[normalize_patch(patch) for patch in data.get("missing", [])],
+        replacement=[normalize_patch(patch) for patch in data.get("replacement", [])],
+    )
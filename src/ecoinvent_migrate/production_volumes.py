@@ -0,0 +1,76 @@
+"""Compare the production volumes of all datasets in two releases.
+
+Production volumes determine the allocation factors of `disaggregate` entries, so large shifts
+between releases are worth checking when reviewing a migration.
+
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ["activity_name", "geography", "product_name", "unit"]
+
+
+def lookup_frame(lookup: dict) -> pd.DataFrame:
+    """Turn a release lookup from `load_release_data` into a dataframe with the key columns and
+    `production_volume`."""
+    return pd.DataFrame.from_records(
+        list(lookup.values()), columns=KEY_COLUMNS + ["production_volume"]
+    )
+
+
+def production_volume_changes(source_lookup: dict, target_lookup: dict) -> pd.DataFrame:
+    """Join two release lookups on the dataset key and compare production volumes.
+
+    Returns one row per dataset in either release, with the columns:
+
+    * The key columns `activity_name`, `geography`, `product_name`, `unit`
+    * `source_volume` and `target_volume`; missing if the dataset isn't in that release
+    * `absolute_change`: `target_volume - source_volume`
+    * `relative_change`: `absolute_change / source_volume`; infinite if the source volume is zero
+      and the target volume isn't
+    * `status`: One of `both`, `source only`, or `target only`
+
+    All changes are calculated in one vectorized operation. Rows are sorted by the absolute value
+    of the relative change, largest first.
+
+    """
+    df = pd.merge(
+        lookup_frame(source_lookup).rename(columns={"production_volume": "source_volume"}),
+        lookup_frame(target_lookup).rename(columns={"production_volume": "target_volume"}),
+        on=KEY_COLUMNS,
+        how="outer",
+        indicator="status",
+    )
+    df["status"] = (
+        df["status"]
+        .map({"both": "both", "left_only": "source only", "right_only": "target only"})
+        .astype(str)
+    )
+    source, target = df["source_volume"].to_numpy(), df["target_volume"].to_numpy()
+    df["absolute_change"] = target - source
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["relative_change"] = np.where(
+            (source == 0) & (target == 0), 0.0, (target - source) / source
+        )
+    return (
+        df.sort_values("relative_change", key=np.abs, ascending=False, na_position="last")
+        .reset_index(drop=True)
+        .loc[
+            :,
+            KEY_COLUMNS
+            + ["source_volume", "target_volume", "absolute_change", "relative_change", "status"],
+        ]
+    )
+
+
+def write_table(df: pd.DataFrame, filepath: Path) -> Path:
+    """Write `df` as Excel if `filepath` ends with `.xlsx`, otherwise as CSV."""
+    filepath = Path(filepath)
+    if filepath.suffix.lower() == ".xlsx":
+        df.to_excel(filepath, index=False)
+    else:
+        df.to_csv(filepath, index=False)
+    return filepath
@@ -0,0 +1,79 @@
+"""Find technosphere changes between two releases directly from the release data.
+
+Every unit process dataset has a unique combination of activity and reference product UUIDs.
+When the change report or the patches miss a change, we can often find it by joining the source
+and target release data on these UUIDs:
+
+* Same activity and product UUIDs, but a different name, product, unit, or geography: Rename
+* Source UUIDs missing from the target, but one new target dataset with the same product UUID and
+  geography: Replacement by a new activity
+* As above, but several new target datasets: Split into multiple activities
+
+The release data are the lookups from `data_io.load_release_data`, whose values include the
+`activity_uuid` and `product_uuid` fields.
+
+"""
+
+from collections import defaultdict
+from typing import Iterable, Optional
+
+LABELS = ("activity_name", "geography", "product_name", "unit")
+
+
+def _dataset(obj: dict) -> dict:
+    return {label: obj[label] for label in LABELS}
+
+
+def _uuids(obj: dict) -> tuple[str, str]:
+    return (obj["activity_uuid"], obj["product_uuid"])
+
+
+def release_diff(
+    source_lookup: dict, target_lookup: dict, keys: Optional[Iterable[tuple]] = None
+) -> list[dict]:
+    """Propose migrations for source datasets whose key isn't in the target release.
+
+    Only the source datasets with the given `keys` are checked, if provided. Returns a list of
+    `{"source": ..., "target": ..., "comment": ...}` pairs in the same format as the change report
+    data, with several pairs for the same source when a dataset was split; these can be passed
+    to `wrangling.split_replace_disaggregate`.
+
+    All lookups are hash joins, so the whole release is processed in a single pass."""
+    source_uuids = {_uuids(obj) for obj in source_lookup.values()}
+    target_by_uuids = {_uuids(obj): obj for obj in target_lookup.values()}
+    new_by_product = defaultdict(list)
+    for uuids, obj in target_by_uuids.items():
+        if uuids not in source_uuids:
+            new_by_product[(obj["product_uuid"], obj["geography"])].append(obj)
+
+    if keys is None:
+        keys = set(source_lookup).difference(target_lookup)
+
+    pairs = []
+    for key in sorted(keys):
+        source = source_lookup[key]
+        if _uuids(source) in target_by_uuids:
+            target = target_by_uuids[_uuids(source)]
+            changed = [
+                label.replace("_", " ") for label in LABELS if source[label] != target[label]
+            ]
+            pairs.append(
+                {
+                    "source": _dataset(source),
+                    "target": _dataset(target),
+                    "comment": "Release data comparison: same UUIDs, changed " + ", ".join(changed),
+                }
+            )
+            continue
+
+        candidates = new_by_product.get((source["product_uuid"], source["geography"]), [])
+        comment = (
+            "Release data comparison: replaced by new activity with same product"
+            if len(candidates) == 1
+            else "Release data comparison: split into new activities with same product"
+        )
+        pairs.extend(
+            {"source": _dataset(source), "target": _dataset(target), "comment": comment}
+            for target in sorted(candidates, key=lambda x: x["activity_name"])
+        )
+    return pairs
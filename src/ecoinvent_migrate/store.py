@@ -0,0 +1,204 @@
+"""Optional SQLite store for the `SOUPInfo` data of many releases.
+
+The JSON release caches from `data_io.load_release_data` are loaded into memory completely. The
+store holds the rows for all cached versions and system models in one SQLite file, indexed on the
+dataset key and on the filename, so questions across releases only need point queries:
+
+```python
+>>> store = ReleaseStore()
+>>> store.add_cached_releases()
+>>> lookup = store.lookup("3.10", "cutoff")
+>>> lookup[("baling", "GLO", "baling", "unit")]["production_volume"]
+```
+
+`ReleaseLookup` is a read-only `Mapping` with the same keys and values as the dictionaries from
+`load_release_data`, so it can be passed to `resolve_glo_row_rer_roe` and `disaggregated`.
+
+"""
+
+import sqlite3
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from loguru import logger
+
+from ecoinvent_migrate.data_io import cached_releases, load_cached_release_data
+from ecoinvent_migrate.utils import cache_dir, mark_used
+
+KEY_COLUMNS = ("activity_name", "geography", "product_name", "unit")
+COLUMNS = KEY_COLUMNS + (
+    "production_volume",
+    "filename",
+    "activity_uuid",
+    "product_uuid",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    version TEXT NOT NULL,
+    system_model TEXT NOT NULL,
+    PRIMARY KEY (version, system_model)
+);
+CREATE TABLE IF NOT EXISTS soupinfo (
+    version TEXT NOT NULL,
+    system_model TEXT NOT NULL,
+    activity_name TEXT NOT NULL,
+    geography TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    production_volume REAL,
+    filename TEXT,
+    activity_uuid TEXT,
+    product_uuid TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS soupinfo_key ON soupinfo
+    (version, system_model, activity_name, geography, product_name, unit);
+CREATE INDEX IF NOT EXISTS soupinfo_filename ON soupinfo (version, system_model, filename);
+"""
+
+
+def store_filepath() -> Path:
+    return cache_dir() / "releases.sqlite"
+
+
+class ReleaseStore:
+    """SQLite database of `SOUPInfo` rows for many releases and system models.
+
+    Each thread gets its own connection, so a store can be shared by concurrent runs."""
+
+    def __init__(self, filepath: Optional[Path] = None):
+        self.filepath = Path(filepath) if filepath else store_filepath()
+        self._local = threading.local()
+        with self.connection as conn:
+            conn.executescript(SCHEMA)
+        mark_used(self.filepath)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if getattr(self._local, "connection", None) is None:
+            conn = sqlite3.connect(self.filepath, timeout=60)
+            conn.row_factory = sqlite3.Row
+            self._local.connection = conn
+        return self._local.connection
+
+    def close(self) -> None:
+        if getattr(self._local, "connection", None) is not None:
+            self._local.connection.close()
+            self._local.connection = None
+
+    def releases(self) -> list[tuple[str, str]]:
+        """List the `(version, system_model)` pairs in the store."""
+        return [
+            tuple(row)
+            for row in self.connection.execute(
+                "SELECT version, system_model FROM releases ORDER BY version, system_model"
+            )
+        ]
+
+    def __contains__(self, release: tuple[str, str]) -> bool:
+        return tuple(release) in self.releases()
+
+    def add_release(
+        self, version: str, system_model: str, data: Union[dict, Iterable[dict]]
+    ) -> None:
+        """Add release data, replacing any existing rows for this version and system model.
+
+        `data` is a lookup from `load_release_data` or a list of `SOUPInfo` dictionaries."""
+        if isinstance(data, Mapping):
+            data = data.values()
+        rows = (
+            (version, system_model) + tuple(obj.get(column) for column in COLUMNS) for obj in data
+        )
+        with self.connection as conn:
+            conn.execute(
+                "DELETE FROM soupinfo WHERE version = ? AND system_model = ?",
+                (version, system_model),
+            )
+            conn.executemany(
+                f"INSERT INTO soupinfo (version, system_model, {', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                rows,
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO releases (version, system_model) VALUES (?, ?)",
+                (version, system_model),
+            )
+
+    def add_cached_releases(self, overwrite: bool = False) -> list[tuple[str, str]]:
+        """Add each release from the local JSON cache which isn't in the store yet.
+
+        Returns the added `(version, system_model)` pairs."""
+        existing = set(self.releases())
+        added = []
+        for version, system_model, _ in cached_releases():
+            if (version, system_model) in existing and not overwrite:
+                continue
+            logger.info(
+                "Adding ecoinvent {version} {system_model} to release store",
+                version=version,
+                system_model=system_model,
+            )
+            self.add_release(version, system_model, load_cached_release_data(version, system_model))
+            added.append((version, system_model))
+        return added
+
+    def lookup(self, version: str, system_model: str) -> "ReleaseLookup":
+        if (version, system_model) not in self:
+            raise KeyError(f"Release {version} {system_model} not in store {self.filepath}")
+        return ReleaseLookup(self, version, system_model)
+
+
+class ReleaseLookup(Mapping):
+    """Read-only mapping from dataset key tuples to `SOUPInfo` dictionaries for one release.
+
+    Keys are `(activity_name, geography, product_name, unit)`, as in `tuple_key_for_data`. Each
+    access is an indexed query; nothing is loaded into memory."""
+
+    def __init__(self, store: ReleaseStore, version: str, system_model: str):
+        self.store = store
+        self.version = version
+        self.system_model = system_model
+
+    def _query(self, where: str = "", params: tuple = ()) -> sqlite3.Cursor:
+        return self.store.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM soupinfo "
+            f"WHERE version = ? AND system_model = ?{where}",
+            (self.version, self.system_model) + params,
+        )
+
+    def __getitem__(self, key: tuple) -> dict:
+        if not isinstance(key, tuple) or len(key) != len(KEY_COLUMNS):
+            raise KeyError(key)
+        row = self._query(
+            "".join(f" AND {column} = ?" for column in KEY_COLUMNS), tuple(key)
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return dict(row)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[tuple]:
+        for row in self.store.connection.execute(
+            f"SELECT {', '.join(KEY_COLUMNS)} FROM soupinfo "
+            "WHERE version = ? AND system_model = ?",
+            (self.version, self.system_model),
+        ):
+            yield tuple(row)
+
+    def __len__(self) -> int:
+        return self.store.connection.execute(
+            "SELECT COUNT(*) FROM soupinfo WHERE version = ? AND system_model = ?",
+            (self.version, self.system_model),
+        ).fetchone()[0]
+
+    def by_filename(self, filename: str) -> Optional[dict]:
+        row = self._query(" AND filename = ?", (filename,)).fetchone()
+        return dict(row) if row is not None else None
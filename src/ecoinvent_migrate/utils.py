@@ -1,24 +1,142 @@
 import datetime
+import gzip
+import io
+import json
 import os
 import sys
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import IO, ContextManager, Iterator, Optional
 
+from filelock import FileLock, Timeout
 from loguru import logger
 from platformdirs import user_data_dir, user_log_dir
 
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+CACHE_COMPRESSION_ENV = "ECOINVENT_MIGRATE_CACHE_COMPRESSION"
+# Suffix of JSON cache files for each compression
+COMPRESSION_SUFFIXES = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+# Errors from reading a truncated or otherwise broken cache file
+CACHE_READ_ERRORS = (ValueError, EOFError, gzip.BadGzipFile) + (
+    (zstd.ZstdError,) if zstd is not None else ()
+)
+
+_STDERR_LOCK = threading.Lock()
+_STDERR_CONFIGURED = False
+
+
+@dataclass
+class LogRun:
+    """Logging context for one generator run; see `log_run`."""
+
+    run_id: str
+    logs_dir: Optional[Path] = None
+    sink_ids: list[int] = field(default_factory=list)
+
+    def context(self) -> ContextManager:
+        """Bind the `run_id` to the log messages in this context."""
+        return logger.contextualize(run_id=self.run_id)
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def configure_stderr_logs() -> None:
+    """Replace the default `loguru` handler with an `INFO` level `sys.stderr` sink.
+
+    Only happens once per process, so concurrent runs don't remove each others sinks."""
+    global _STDERR_CONFIGURED
+    with _STDERR_LOCK:
+        if _STDERR_CONFIGURED:
+            return
+        logger.remove()
+        logger.add(sys.stderr, level="INFO", enqueue=True)
+        _STDERR_CONFIGURED = True
+
 
 def configure_logs(write_logs: bool = True) -> None:
-    logger.remove()
-    logger.add(sys.stderr, level="INFO")
+    """Deprecated; use the `log_run` context manager.
+
+    Adds `debug.log` and `info.log` file sinks which stay active for the rest of the process, and
+    receive the messages of all runs."""
+    warnings.warn(
+        "`configure_logs` is deprecated; use the `log_run` context manager instead",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+    configure_stderr_logs()
     if write_logs:
-        logs_dir = Path(
-            user_log_dir("ecoinvent_migrate", "pylca")
-        ) / datetime.datetime.now().isoformat()[:19].replace(":", "-")
+        timestamp = datetime.datetime.now().isoformat()[:19].replace(":", "-")
+        logs_dir = Path(user_log_dir("ecoinvent_migrate", "pylca")) / f"{timestamp}-{new_run_id()}"
         logger.info("Writing logs to {path}", path=logs_dir)
-        logs_dir.mkdir(parents=True, exist_ok=True)
-        logger.add(logs_dir / "debug.log", level="DEBUG")
-        logger.add(logs_dir / "info.log", level="INFO")
+        logs_dir.mkdir(parents=True)
+        logger.add(logs_dir / "debug.log", level="DEBUG", enqueue=True)
+        logger.add(logs_dir / "info.log", level="INFO", enqueue=True)
+
+
+@contextmanager
+def log_run(
+    write_logs: bool = True, run_id: Optional[str] = None, contextualize: bool = True
+) -> Iterator[LogRun]:
+    """Context manager which adds per-run log file sinks, and removes them afterwards.
+
+    Each run gets a unique `run_id`, which is bound to all log messages in this context with
+    `logger.contextualize`. The `debug.log` and `info.log` file sinks only accept messages from
+    their own run, so generators can run concurrently in threads without mixing logs. Sinks are
+    enqueued, so they don't block and are safe to use from worker processes which receive the
+    `logger` object.
+
+    Code running in new threads needs to be started with `contextvars.copy_context().run` to
+    keep the `run_id`.
+
+    Generators should pass `contextualize=False` and wrap their own work in `run.context()`
+    between yields; otherwise the `run_id` stays bound in the consumer's context while the
+    generator is suspended.
+    """
+    configure_stderr_logs()
+    run = LogRun(run_id=run_id or new_run_id())
+
+    if write_logs:
+        timestamp = datetime.datetime.now().isoformat()[:19].replace(":", "-")
+        run.logs_dir = Path(user_log_dir("ecoinvent_migrate", "pylca")) / (
+            f"{timestamp}-{run.run_id}"
+        )
+        run.logs_dir.mkdir(parents=True)
+
+        def run_filter(record: dict) -> bool:
+            return record["extra"].get("run_id") == run.run_id
+
+        for filename, level in (("debug.log", "DEBUG"), ("info.log", "INFO")):
+            run.sink_ids.append(
+                logger.add(run.logs_dir / filename, level=level, enqueue=True, filter=run_filter)
+            )
+
+    try:
+        with run.context():
+            if run.logs_dir:
+                logger.info("Writing logs to {path}", path=run.logs_dir)
+        if contextualize:
+            with run.context():
+                yield run
+        else:
+            yield run
+    finally:
+        for sink_id in run.sink_ids:
+            logger.remove(sink_id)
 
 
 def setup_output_directory(output_directory: Optional[Path]) -> Path:
@@ -38,6 +156,111 @@ def setup_output_directory(output_directory: Optional[Path]) -> Path:
 
 def cache_dir() -> Path:
     cache_directory = Path(user_data_dir("ecoinvent_migrate", "pylca")) / "cache"
-    if not cache_directory.exists():
-        cache_directory.mkdir(parents=True)
+    cache_directory.mkdir(parents=True, exist_ok=True)
     return cache_directory
+
+
+def lock_filepath(filepath: Path) -> Path:
+    return filepath.parent / f"{filepath.name}.lock"
+
+
+def mark_used(filepath: Path) -> None:
+    """Set the access time of a cache file to now, keeping its modification time.
+
+    Many filesystems don't update access times on reads (`noatime`, `relatime`), so cache readers
+    call this to record the last use for `cache.prune_cache`."""
+    try:
+        os.utime(filepath, (time.time(), filepath.stat().st_mtime))
+    except OSError:
+        pass
+
+
+@contextmanager
+def cache_lock(
+    filepath: Path, timeout: float = -1, lock_path: Optional[Path] = None
+) -> Iterator[None]:
+    """Hold an inter-process lock for creating the cache file `filepath`.
+
+    Waits up to `timeout` seconds (forever if negative) for another process holding the lock. The
+    lock file is `lock_path`, or `lock_filepath(filepath)` by default."""
+    lock = FileLock(lock_path or lock_filepath(filepath), timeout=timeout)
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        logger.info("Waiting for another process to create {fp}", fp=str(filepath))
+        lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def compression_available(compression: str) -> bool:
+    """Check whether files with `compression` can be read and written here."""
+    return compression != "zstd" or zstd is not None
+
+
+def cache_compression(check_available: bool = True) -> str:
+    """Get the compression for new cache files from `ECOINVENT_MIGRATE_CACHE_COMPRESSION`.
+
+    One of `none` (the default), `gzip`, or `zstd`. `zstd` needs Python 3.14 or the
+    `backports.zstd` package; without it, `ImportError` is raised unless `check_available` is
+    false."""
+    compression = os.environ.get(CACHE_COMPRESSION_ENV, "none").lower() or "none"
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(
+            f"{CACHE_COMPRESSION_ENV} must be one of {tuple(COMPRESSION_SUFFIXES)}; "
+            f"got {compression}"
+        )
+    if check_available and not compression_available(compression):
+        raise ImportError("zstd cache compression needs Python 3.14 or `backports.zstd`")
+    return compression
+
+
+def compression_for(filepath: Path) -> str:
+    """Get the compression of a JSON cache file from its suffix."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if compression != "none" and filepath.name.endswith(suffix):
+            return compression
+    return "none"
+
+
+def _compressed(fileobj: IO[bytes], compression: str, mode: str) -> IO[bytes]:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode=mode, compresslevel=6)
+    elif compression == "zstd":
+        if zstd is None:
+            raise ImportError("Reading zstd cache files needs Python 3.14 or `backports.zstd`")
+        return zstd.ZstdFile(fileobj, mode=mode)
+    return fileobj
+
+
+def read_json(filepath: Path):
+    """Read a JSON file, decompressing it according to its suffix; see `compression_for`."""
+    with open(filepath, "rb") as raw, _compressed(raw, compression_for(filepath), "rb") as f:
+        return json.load(f)
+
+
+def atomic_write_json(data, filepath: Path, **kwargs) -> Path:
+    """Write `data` as JSON to a temporary file in the same directory, and then rename it to
+    `filepath`. Readers see either no file or the complete file, never a truncated one.
+
+    The data is compressed if `filepath` ends with `.json.gz` or `.json.zst`."""
+    fd, tmp_path = tempfile.mkstemp(dir=filepath.parent, prefix=f".{filepath.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw:
+            stream = _compressed(raw, compression_for(filepath), "wb")
+            text = io.TextIOWrapper(stream, encoding="utf-8")
+            json.dump(data, text, **kwargs)
+            text.flush()
+            text.detach()
+            if stream is not raw:
+                # Writes the compression trailer, but leaves `raw` open
+                stream.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return filepath
@@ -0,0 +1,177 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from ecoinvent_migrate.data_io import load_cached_release_data
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.patches import PatchSet, available_patch_pairs, load_patches
+from ecoinvent_migrate.wrangling import tuple_key_for_data
+
+
+@dataclass
+class PatchReport:
+    """Problems found when checking the patches for one release pair against release data.
+
+    * `dangling_sources`: Patched source datasets which don't exist in the source release
+    * `missing_targets`: Patched target datasets which don't exist in the target release
+    * `overlapping`: `(context, source key)` pairs which are patched more than once. The context
+      is `missing` for missing patches.
+
+    """
+
+    source_version: str
+    target_version: str
+    system_model: str
+    dangling_sources: list[tuple] = field(default_factory=list)
+    missing_targets: list[tuple] = field(default_factory=list)
+    overlapping: list[tuple] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.dangling_sources or self.missing_targets or self.overlapping)
+
+    def summary(self) -> str:
+        return (
+            f"{self.source_version} -> {self.target_version} ({self.system_model}): "
+            f"{len(self.dangling_sources)} dangling sources, "
+            f"{len(self.missing_targets)} missing targets, "
+            f"{len(self.overlapping)} overlapping patches"
+        )
+
+
+def validate_patches(
+    patches: PatchSet, source_lookup: dict, target_lookup: dict, system_model: str = "cutoff"
+) -> PatchReport:
+    """Check all `patches` against the given release lookups using set operations.
+
+    Missing patches must have a `source` in the source release, and all their (completed)
+    targets in the target release. Replacement patches in the `source` context must produce a
+    dataset in the source release, and in the `target` context a dataset in the target release.
+    """
+    sources, targets, patched_keys = [], [], []
+    for patch in patches.missing:
+        key = tuple_key_for_data(patch["source"])
+        sources.append(key)
+        patched_keys.append(("missing", key))
+        if "targets" in patch:
+            targets.extend(tuple_key_for_data(patch["source"] | t) for t in patch["targets"])
+        else:
+            targets.append(tuple_key_for_data(patch["source"] | patch["target"]))
+
+    for patch in patches.replacement:
+        patched = tuple_key_for_data(patch["source"] | patch["target"])
+        if patch["context"] == "source":
+            sources.append(patched)
+        else:
+            targets.append(patched)
+        patched_keys.append((patch["context"], tuple_key_for_data(patch["source"])))
+
+    overlapping = [key for key, count in Counter(patched_keys).items() if count > 1]
+
+    return PatchReport(
+        source_version=patches.source_version,
+        target_version=patches.target_version,
+        system_model=system_model,
+        dangling_sources=sorted(set(sources).difference(source_lookup)),
+        missing_targets=sorted(set(targets).difference(target_lookup)),
+        overlapping=overlapping,
+    )
+
+
+def validate_all_patches(
+    system_model: str = "cutoff", pairs: Optional[list[tuple[str, str]]] = None
+) -> list[PatchReport]:
+    """Validate patches for every release pair with a patch file against the cached release
+    data. Pairs where either release isn't in the local cache are skipped with a warning; nothing
+    is downloaded."""
+    reports = []
+    lookups = {}
+
+    def lookup(version: str) -> Optional[dict]:
+        if version not in lookups:
+            lookups[version] = load_cached_release_data(version, system_model)
+        return lookups[version]
+
+    for source_version, target_version in pairs or available_patch_pairs():
+        source_lookup, target_lookup = lookup(source_version), lookup(target_version)
+        if source_lookup is None or target_lookup is None:
+            logger.warning(
+                "Skipping patches for {s} -> {t}; release data not in local cache",
+                s=source_version,
+                t=target_version,
+            )
+            continue
+        report = validate_patches(
+            patches=load_patches(source_version, target_version),
+            source_lookup=source_lookup,
+            target_lookup=target_lookup,
+            system_model=system_model,
+        )
+        logger.info(report.summary())
+        reports.append(report)
+    return reports
+
+
+@dataclass
+class MigrationReport:
+    """Problems found when checking a generated technosphere migration against the target release.
+
+    * `missing_targets`: `replace` and `disaggregate` targets which aren't in the target release
+    * `bad_allocations`: `(source key, total)` for disaggregations whose allocation factors don't
+      sum to one
+
+    """
+
+    missing_targets: list[tuple] = field(default_factory=list)
+    bad_allocations: list[tuple[tuple, float]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing_targets or self.bad_allocations)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.missing_targets)} missing targets, "
+            f"{len(self.bad_allocations)} disaggregations with allocations not summing to one"
+        )
+
+    def annotate(self, diagnostics: Diagnostics) -> None:
+        for key in self.missing_targets:
+            diagnostics.add("invalid_migration_target", dataset=list(key))
+        for key, total in self.bad_allocations:
+            diagnostics.add("invalid_allocation", source=list(key), total=total)
+
+
+def validate_migration(data: dict, target_lookup: dict, tolerance: float = 1e-6) -> MigrationReport:
+    """Check the `replace` and `disaggregate` sections of a generated migration.
+
+    Every target must be in `target_lookup`, and the allocation factors of each disaggregation
+    must sum to one within `tolerance`. All targets are checked with one set difference, and all
+    allocation sums are calculated at once with NumPy."""
+    replace = data.get("replace") or []
+    disaggregate = data.get("disaggregate") or []
+
+    targets = {tuple_key_for_data(obj["target"]) for obj in replace}
+    targets.update(tuple_key_for_data(target) for obj in disaggregate for target in obj["targets"])
+
+    sizes = np.array([len(obj["targets"]) for obj in disaggregate], dtype=np.int64)
+    allocations = np.array(
+        [target["allocation"] for obj in disaggregate for target in obj["targets"]],
+        dtype=np.float64,
+    )
+    totals = np.bincount(
+        np.repeat(np.arange(len(disaggregate)), sizes),
+        weights=allocations,
+        minlength=len(disaggregate),
+    )
+
+    return MigrationReport(
+        missing_targets=sorted(targets.difference(target_lookup)),
+        bad_allocations=[
+            (tuple_key_for_data(disaggregate[index]["source"]), float(totals[index]))
+            for index in np.flatnonzero(np.abs(totals - 1) > tolerance).tolist()
+        ],
+    )
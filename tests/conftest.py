@@ -1,3 +1,171 @@
 """Fixtures for ecoinvent_migrate"""
 
-# import pytest
+from pathlib import Path
+
+import py7zr
+import pytest
+
+SPOLD_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<ecoSpold xmlns="http://www.EcoInvent.org/EcoSpold02">
+  <activityDataset>
+    <activityDescription>
+      <activity id="{activity_id}">
+        <activityName>{activity_name}</activityName>
+      </activity>
+      <geography>
+        <shortname xml:lang="en">{geography}</shortname>
+      </geography>
+    </activityDescription>
+    <flowData>
+      <intermediateExchange id="x" intermediateExchangeId="{product_id}" amount="1" productionVolumeAmount="{production_volume}">
+        <name xml:lang="en">{product_name}</name>
+        <unitName xml:lang="en">{unit}</unitName>
+        <outputGroup>0</outputGroup>
+      </intermediateExchange>
+    </flowData>
+  </activityDataset>
+</ecoSpold>
+"""
+
+DATASETS = [
+    {
+        "activity_id": "a1",
+        "product_id": "p1",
+        "activity_name": "baling",
+        "product_name": "baling",
+        "unit": "unit",
+        "geography": "GLO",
+        "production_volume": 10,
+    },
+    {
+        "activity_id": "a2",
+        "product_id": "p2",
+        "activity_name": "market for straw",
+        "product_name": "straw",
+        "unit": "kg",
+        "geography": "RER",
+        "production_volume": 2.5,
+    },
+]
+
+
+ELEMENTARY_EXCHANGES = """<?xml version="1.0" encoding="UTF-8"?>
+<validElementaryExchanges xmlns="http://www.EcoInvent.org/EcoSpold02">
+  <elementaryExchange id="e1" casNumber="000124-38-9" formula="CO2">
+    <name xml:lang="en">Carbon dioxide, fossil</name>
+    <unitName xml:lang="en">kg</unitName>
+    <compartment subcompartmentId="s1">
+      <compartment xml:lang="en">air</compartment>
+      <subcompartment xml:lang="en">urban air close to ground</subcompartment>
+    </compartment>
+  </elementaryExchange>
+  <elementaryExchange id="e2">
+    <name xml:lang="en">Water</name>
+    <unitName xml:lang="en">m3</unitName>
+    <compartment subcompartmentId="s2">
+      <compartment xml:lang="en">water</compartment>
+      <subcompartment xml:lang="en">surface water</subcompartment>
+    </compartment>
+  </elementaryExchange>
+</validElementaryExchanges>
+"""
+
+
+@pytest.fixture
+def release_directory(tmp_path) -> Path:
+    """Minimal extracted ecospold2 release with a `datasets` directory"""
+    dirpath = tmp_path / "release"
+    (dirpath / "datasets").mkdir(parents=True)
+    for ds in DATASETS:
+        with open(dirpath / "datasets" / f"{ds['activity_id']}_{ds['product_id']}.spold", "w") as f:
+            f.write(SPOLD_TEMPLATE.format(**ds))
+    (dirpath / "datasets" / "README.txt").write_text("Not a dataset")
+    (dirpath / "MasterData").mkdir()
+    (dirpath / "MasterData" / "ElementaryExchanges.xml").write_text(ELEMENTARY_EXCHANGES)
+    return dirpath
+
+
+@pytest.fixture
+def release_archive(tmp_path, release_directory) -> Path:
+    """`release_directory` as a `.7z` archive"""
+    archive_path = tmp_path / "release.7z"
+    with py7zr.SevenZipFile(archive_path, "w") as archive:
+        archive.writeall(release_directory / "datasets", arcname="datasets")
+        archive.writeall(release_directory / "MasterData", arcname="MasterData")
+    return archive_path
+
+
+@pytest.fixture
+def cache_directory(monkeypatch, tmp_path) -> Path:
+    """Use a temporary directory for `utils.cache_dir`"""
+    monkeypatch.setattr("ecoinvent_migrate.utils.user_data_dir", lambda *args: str(tmp_path))
+    return tmp_path / "cache"
+
+
+class FakeRelease:
+    """Stand-in for `EcoinventRelease` which returns local test data"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.calls = []
+
+    def get_release(self, version, system_model, release_type, extract=True, **kwargs) -> Path:
+        self.calls.append((version, system_model, extract))
+        return self.path
+
+
+@pytest.fixture
+def fake_release(release_directory) -> FakeRelease:
+    return FakeRelease(release_directory)
+
+
+def change_report_row(source: tuple, target: tuple) -> dict:
+    row = {}
+    for version, (name, geography, product, unit) in (("1", source), ("2", target)):
+        row[f"Activity Name - {version}"] = name
+        row[f"Geography - {version}"] = geography
+        row[f"Reference Product - {version}"] = product
+        row[f"Reference Product Unit - {version}"] = unit
+    return row
+
+
+@pytest.fixture
+def technosphere_inputs(tmp_path) -> dict:
+    """Change report and release lookups for a technosphere migration from version 1 to 2"""
+    import pandas as pd
+
+    baling = ("baling", "GLO", "baling", "unit")
+    straw = ("old straw", "RER", "straw", "kg")
+    new_baling = ("baling, new", "GLO", "baling", "unit")
+    straw_a = ("straw a", "RER", "straw", "kg")
+    straw_b = ("straw b", "RER", "straw", "kg")
+
+    filepath = tmp_path / "Change Report Annex v1 - v2.xlsx"
+    pd.DataFrame(
+        [
+            change_report_row(baling, new_baling),
+            change_report_row(straw, straw_a),
+            change_report_row(straw, straw_b),
+        ]
+    ).to_excel(filepath, sheet_name="Qualitative Changes", index=False)
+
+    def lookup(*keys_and_volumes) -> dict:
+        return {
+            key: {
+                "activity_name": key[0],
+                "geography": key[1],
+                "product_name": key[2],
+                "unit": key[3],
+                "production_volume": volume,
+            }
+            for key, volume in keys_and_volumes
+        }
+
+    return {
+        "source_version": "1",
+        "target_version": "2",
+        "change_report": filepath,
+        "source_lookup": lookup((baling, 1), (straw, 1)),
+        "target_lookup": lookup((new_baling, 1), (straw_a, 3), (straw_b, 1)),
+        "release": object(),
+    }
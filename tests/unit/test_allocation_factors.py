@@ -0,0 +1,69 @@
+import pytest
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.wrangling import allocation_factors, disaggregated
+
+
+def ds(name: str) -> dict:
+    return {"name": name, "location": "GLO", "reference product": "p", "unit": "kg"}
+
+
+def key(name: str) -> tuple:
+    return (name, "GLO", "p", "kg")
+
+
+def group(source: str, *targets: str) -> list[dict]:
+    return [{"source": ds(source), "target": ds(target)} for target in targets]
+
+
+def test_disaggregated_production_volumes():
+    lookup = {key("b"): {"production_volume": 3}, key("c"): {"production_volume": 1}}
+    expected = {
+        "source": ds("a"),
+        "targets": [ds("b") | {"allocation": 0.75}, ds("c") | {"allocation": 0.25}],
+    }
+    assert disaggregated(group("a", "b", "c"), lookup) == expected
+
+
+def test_disaggregated_missing_target_removed():
+    lookup = {key("b"): {"production_volume": 2}}
+    diagnostics = Diagnostics()
+    result = disaggregated(group("a", "b", "c"), lookup, diagnostics)
+    assert result["targets"] == [ds("b") | {"allocation": 1.0}]
+    assert diagnostics.records["missing_disaggregation_target"] == [{"dataset": ds("c")}]
+
+
+def test_disaggregated_zero_total_equal_split():
+    lookup = {key("b"): {"production_volume": 0}, key("c"): {"production_volume": 0}}
+    diagnostics = Diagnostics()
+    result = disaggregated(group("a", "b", "c"), lookup, diagnostics)
+    assert result["targets"] == [
+        ds("b") | {"allocation": 0.5},
+        ds("c") | {"allocation": 0.5},
+    ]
+    assert diagnostics.counts["zero_total_production"] == 1
+
+
+def test_allocation_factors_negative_volumes():
+    lookup = {key("b"): {"production_volume": -1}, key("c"): {"production_volume": 3}}
+    diagnostics = Diagnostics()
+    result = allocation_factors([group("a", "b", "c")], lookup, diagnostics)
+    assert [t["allocation"] for t in result[0]["targets"]] == [-0.5, 1.5]
+    assert diagnostics.counts["negative_production_volume"] == 1
+    assert diagnostics.counts["negative_total_production"] == 0
+
+
+def test_allocation_factors_many_groups():
+    lookup = {
+        key("b"): {"production_volume": 1},
+        key("c"): {"production_volume": 4},
+        key("e"): {"production_volume": 0},
+        key("f"): {"production_volume": 0},
+    }
+    groups = [group("a", "b", "c"), group("d", "e", "f"), group("g", "b", "c", "e")]
+    result = allocation_factors(groups, lookup)
+    assert [obj["source"] for obj in result] == [ds("a"), ds("d"), ds("g")]
+    assert [t["allocation"] for t in result[0]["targets"]] == pytest.approx([0.2, 0.8])
+    assert [t["allocation"] for t in result[1]["targets"]] == [0.5, 0.5]
+    assert [t["name"] for t in result[2]["targets"]] == ["b", "c"]
+    assert allocation_factors([], lookup) == []
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from ecoinvent_migrate.apply import (
+    apply_migration,
+    apply_migration_to_datasets,
+    compile_migration,
+    ecospold2_key,
+)
+
+
+def ds(name: str, location: str = "GLO") -> dict:
+    return {"name": name, "location": location, "reference product": "p", "unit": "kg"}
+
+
+MIGRATION = {
+    "replace": [
+        {"source": ds("a"), "target": ds("b")},
+        {"source": ds("c"), "target": ds("c", "RoW"), "conversion_factor": 2.0},
+    ],
+    "disaggregate": [
+        {
+            "source": ds("d"),
+            "targets": [
+                ds("d", "CH") | {"allocation": 0.25},
+                ds("d", "RoW") | {"allocation": 0.75},
+            ],
+        }
+    ],
+}
+
+
+def test_compile_migration():
+    compiled = compile_migration(MIGRATION)
+    assert len(compiled) == 3
+    assert ecospold2_key(ds("a")) in compiled
+    assert compiled.disaggregate[ecospold2_key(ds("d"))][0] == (ds("d", "CH"), 0.25)
+
+
+def test_compile_migration_from_file(tmp_path):
+    fp = tmp_path / "migration.json"
+    json.dump(MIGRATION, open(fp, "w"))
+    assert len(compile_migration(fp)) == 3
+
+
+def test_apply_migration():
+    unchanged = ds("x") | {"amount": 1}
+    exchanges = [
+        ds("a") | {"amount": 4, "type": "technosphere"},
+        ds("c") | {"amount": 4},
+        ds("d") | {"amount": 4},
+        unchanged,
+    ]
+    result = apply_migration(exchanges, MIGRATION)
+    assert result == [
+        ds("b") | {"amount": 4, "type": "technosphere"},
+        ds("c", "RoW") | {"amount": 8.0},
+        ds("d", "CH") | {"amount": 1.0},
+        ds("d", "RoW") | {"amount": 3.0},
+        unchanged,
+    ]
+    assert result[-1] is unchanged
+    # Input not modified
+    assert exchanges[0]["name"] == "a"
+
+
+def test_apply_migration_to_datasets():
+    datasets = [{"name": "foreground", "exchanges": [ds("d") | {"amount": 2, "loc": 2}]}]
+    result = apply_migration_to_datasets(datasets, MIGRATION, scale_fields=("amount", "loc"))
+    assert [exc["amount"] for exc in result[0]["exchanges"]] == pytest.approx([0.5, 1.5])
+    assert [exc["loc"] for exc in result[0]["exchanges"]] == pytest.approx([0.5, 1.5])
@@ -1,3 +1,4 @@
+from ecoinvent_migrate.diagnostics import Diagnostics
 from ecoinvent_migrate.wrangling import apply_replacement_patches
 
 
@@ -105,6 +106,7 @@ def test_apply_replacement_patches_target():
 
 
 def test_apply_replacement_patches_missing(caplog):
+    diagnostics = Diagnostics()
     patches = [
         {
             "source": {
@@ -120,8 +122,12 @@ def test_apply_replacement_patches_missing(caplog):
             "comment": "Data error in change report geography",
         },
     ]
+    apply_replacement_patches([], patches, diagnostics=diagnostics)
+    assert diagnostics.records["patch_not_found"] == [
+        {"kind": "target", "dataset": patches[0]["source"]}
+    ]
     apply_replacement_patches([], patches)
-    assert "Expected to patch the following" in caplog.text
+    assert "1 patch_not_found" in caplog.text
 
 
 def test_apply_replacement_patches_target_twice():
@@ -0,0 +1,129 @@
+from ecoinvent_migrate import main
+from ecoinvent_migrate.biosphere import (
+    FlowMatcher,
+    elementary_flows,
+    normalize_name,
+    unit_conversion_factor,
+)
+from ecoinvent_migrate.main import supplement_biosphere_changes_with_real_data_comparison
+
+
+def flow(name, unit="kg", cas=None, formula=None, context=("air", "urban air close to ground")):
+    return {"name": name, "unit": unit, "cas": cas, "formula": formula, "context": context}
+
+
+def test_normalize_name():
+    assert normalize_name("Carbon dioxide, fossil (obsolete)") == "carbon dioxide fossil"
+    assert normalize_name("  2,4-D  amines") == "2 4-d amines"
+
+
+def test_elementary_flows():
+    given = {
+        "validElementaryExchanges": {
+            "elementaryExchange": [
+                {
+                    "@id": "u1",
+                    "@casNumber": "000124-38-9",
+                    "@formula": "CO2",
+                    "name": {"#text": "Carbon dioxide, fossil "},
+                    "unitName": {"#text": "kg"},
+                    "compartment": {
+                        "compartment": {"#text": "air"},
+                        "subcompartment": {"#text": "urban air close to ground"},
+                    },
+                }
+            ]
+        }
+    }
+    assert elementary_flows(given) == {
+        "u1": flow("Carbon dioxide, fossil", cas="000124-38-9", formula="CO2")
+    }
+
+
+def test_flow_matcher_name_change_same_cas():
+    matcher = FlowMatcher(
+        {
+            "new": flow("Dinitrogen monoxide", cas="010024-97-2", formula="N2O"),
+            "other": flow("Nitrogen dioxide", cas="010102-44-0", formula="NO2"),
+        }
+    )
+    candidate = matcher.match(flow("Nitrous oxide", cas="010024-97-2", formula="N2O"))
+    assert candidate.uuid == "new"
+    assert candidate.confidence == 0.6
+
+
+def test_flow_matcher_name_match():
+    matcher = FlowMatcher({"new": flow("Carbon dioxide, fossil")})
+    candidate = matcher.match(flow("Carbon dioxide, fossil (obsolete)", unit="t"))
+    assert candidate.uuid == "new"
+    assert candidate.confidence == 0.55
+
+
+def test_flow_matcher_no_candidate():
+    matcher = FlowMatcher({"new": flow("Water")})
+    assert matcher.match(flow("Salt water")) is None
+
+
+def test_flow_matcher_ambiguous():
+    matcher = FlowMatcher(
+        {
+            "a": flow("Water", context=("water", "lake")),
+            "b": flow("Water", context=("water", "river")),
+        }
+    )
+    assert matcher.match(flow("Water", context=("air", None))) is None
+    assert matcher.match(flow("Water", context=("water", "lake"))).uuid == "a"
+
+
+def test_unit_conversion_factor():
+    assert unit_conversion_factor("kg", "kg") == 1.0
+    assert unit_conversion_factor("kg", "t") == 1e-3
+    assert unit_conversion_factor("kWh", "MJ") == 3.6
+    assert unit_conversion_factor("kg", "m3") is None
+    assert unit_conversion_factor("kg", "unknown") is None
+
+
+FLOW_XML = """<elementaryExchange id="{id}">
+    <name xml:lang="en">{name}</name>
+    <unitName xml:lang="en">{unit}</unitName>
+  </elementaryExchange>"""
+
+
+def master_data(*flows) -> bytes:
+    body = "".join(FLOW_XML.format(id=id, name=name, unit=unit) for id, name, unit in flows)
+    return (
+        '<validElementaryExchanges xmlns="http://www.EcoInvent.org/EcoSpold02">'
+        + body
+        + "</validElementaryExchanges>"
+    ).encode("utf-8")
+
+
+def test_supplement_unit_changed_successor(monkeypatch):
+    versions = {
+        "3.9.1": master_data(
+            ("old", "Carbon dioxide, fossil (obsolete)", "kg"), ("w", "Water (obsolete)", "kg")
+        ),
+        "3.10": master_data(("new", "Carbon dioxide, fossil", "t"), ("w2", "Water", "m3")),
+    }
+    monkeypatch.setattr(main, "read_master_data", lambda version, *args: versions[version])
+    data = supplement_biosphere_changes_with_real_data_comparison(
+        {"replace": []},
+        set(),
+        "3.9.1",
+        "3.10",
+        match_deletions=True,
+        min_confidence=0.5,
+        release=object(),
+    )
+    assert data["replace"] == [
+        {
+            "source": {"uuid": "old", "name": "Carbon dioxide, fossil (obsolete)", "unit": "kg"},
+            "target": {"uuid": "new", "name": "Carbon dioxide, fossil", "unit": "t"},
+            "confidence": 0.55,
+            "comment": "Deleted flow not listed in change report; "
+            "matched to new flow with confidence 0.55",
+            "conversion_factor": 1e-3,
+        }
+    ]
+    # kg can't be converted to m3
+    assert [obj["source"]["uuid"] for obj in data["delete"]] == ["w"]
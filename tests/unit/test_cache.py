@@ -0,0 +1,113 @@
+import os
+import time
+
+import pytest
+from filelock import FileLock
+
+from ecoinvent_migrate.cache import cache_entries, prune_cache
+from ecoinvent_migrate.cli import main, parse_size
+from ecoinvent_migrate.data_io import load_cached_release_data, release_lock_filepath
+from ecoinvent_migrate.utils import atomic_write_json
+
+DAY = 24 * 60 * 60
+SOUPINFO = {
+    "activity_name": "baling",
+    "geography": "GLO",
+    "product_name": "baling",
+    "unit": "unit",
+    "production_volume": 1.0,
+    "filename": "a1_p1.spold",
+}
+
+
+@pytest.fixture
+def cached_files(cache_directory):
+    cache_directory.mkdir(parents=True)
+    now = time.time()
+    files = {
+        "ecoinvent-3.9.1-cutoff.json": 40 * DAY,
+        "ecoinvent-3.10-cutoff.json.gz": 20 * DAY,
+        "ecoinvent-3.10-apos.json": 10 * DAY,
+        "release-metadata.json": 1 * DAY,
+    }
+    for name, age in files.items():
+        atomic_write_json([SOUPINFO], cache_directory / name)
+        os.utime(cache_directory / name, (now - age, now - age))
+    (cache_directory / "ecoinvent-3.10-apos.lock").touch()
+    return cache_directory
+
+
+def names(entries) -> list[str]:
+    return [entry.path.name for entry in entries]
+
+
+def test_cache_entries(cached_files):
+    entries = cache_entries()
+    assert names(entries) == [
+        "ecoinvent-3.9.1-cutoff.json",
+        "ecoinvent-3.10-cutoff.json.gz",
+        "ecoinvent-3.10-apos.json",
+        "release-metadata.json",
+    ]
+    assert [(entry.kind, entry.version, entry.system_model) for entry in entries][1:] == [
+        ("release", "3.10", "cutoff"),
+        ("release", "3.10", "apos"),
+        ("metadata", None, None),
+    ]
+    assert all(entry.size > 0 for entry in entries)
+
+
+def test_reading_marks_used(cached_files):
+    load_cached_release_data("3.9.1", "cutoff")
+    assert names(cache_entries())[-1] == "ecoinvent-3.9.1-cutoff.json"
+
+
+def test_prune_by_age_and_version(cached_files):
+    assert names(prune_cache(max_age=30, dry_run=True)) == ["ecoinvent-3.9.1-cutoff.json"]
+    assert len(cache_entries()) == 4
+    assert names(prune_cache(keep_versions=["3.10"])) == ["ecoinvent-3.9.1-cutoff.json"]
+    assert names(prune_cache(versions=["3.10"])) == [
+        "ecoinvent-3.10-cutoff.json.gz",
+        "ecoinvent-3.10-apos.json",
+    ]
+    assert names(cache_entries()) == ["release-metadata.json"]
+
+
+def test_prune_lru_budget(cached_files):
+    sizes = {entry.path.name: entry.size for entry in cache_entries()}
+    budget = sizes["ecoinvent-3.10-apos.json"] + sizes["release-metadata.json"]
+    assert names(prune_cache(max_size=budget)) == [
+        "ecoinvent-3.9.1-cutoff.json",
+        "ecoinvent-3.10-cutoff.json.gz",
+    ]
+    assert sum(entry.size for entry in cache_entries()) <= budget
+
+
+def test_prune_skips_locked(cached_files):
+    with FileLock(release_lock_filepath("3.9.1", "cutoff")):
+        assert prune_cache(versions=["3.9.1"]) == []
+    assert (cached_files / "ecoinvent-3.9.1-cutoff.json").is_file()
+
+
+def test_prune_keeps_lock_files(cached_files):
+    lock_path = release_lock_filepath("3.10", "cutoff")
+    with FileLock(lock_path):
+        assert names(prune_cache(versions=["3.10"])) == ["ecoinvent-3.10-apos.json"]
+    assert names(prune_cache(versions=["3.10"])) == ["ecoinvent-3.10-cutoff.json.gz"]
+    assert lock_path.exists()
+    assert (cached_files / "ecoinvent-3.10-apos.lock").exists()
+    assert names(cache_entries()) == ["ecoinvent-3.9.1-cutoff.json", "release-metadata.json"]
+
+
+def test_cache_cli(cached_files, capsys):
+    assert main(["cache-prune", "--older-than", "15", "--dry-run"]) == 0
+    output = capsys.readouterr().out
+    assert "Would remove ecoinvent-3.9.1-cutoff.json" in output
+    assert main(["cache-list"]) == 0
+    assert "4 files" in capsys.readouterr().out
+
+
+def test_parse_size():
+    assert parse_size("512") == 512
+    assert parse_size("1.5K") == 1536
+    assert parse_size("2GB") == 2 * 1024**3
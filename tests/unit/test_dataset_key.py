@@ -0,0 +1,46 @@
+from ecoinvent_migrate.wrangling import (
+    DatasetKey,
+    add_keys,
+    apply_replacement_patches,
+    pair_key,
+    resolve_glo_row_rer_roe,
+    split_replace_disaggregate,
+)
+
+
+def ds(name: str, geography: str = "GLO") -> dict:
+    return {"activity_name": name, "geography": geography, "product_name": "p", "unit": "kg"}
+
+
+def test_dataset_key_labels():
+    key = DatasetKey.from_data(ds("a"))
+    assert key == ("a", "GLO", "p", "kg")
+    assert hash(key) == hash(("a", "GLO", "p", "kg"))
+    relabeled = {"name": "a", "location": "GLO", "reference product": "p", "unit": "kg"}
+    assert DatasetKey.from_data(relabeled) == key
+    assert key.geography == "GLO"
+
+
+def test_add_keys_and_pair_key():
+    data = add_keys([{"source": ds("a"), "target": ds("b")}])
+    assert data[0]["source_key"] == ("a", "GLO", "p", "kg")
+    assert pair_key(data[0], "target") is data[0]["target_key"]
+    assert pair_key({"source": ds("c"), "target": ds("d")}, "source") == ("c", "GLO", "p", "kg")
+
+
+def test_stored_keys_follow_changes():
+    data = add_keys([{"source": ds("a"), "target": ds("b")}])
+    patches = [{"context": "target", "source": ds("b"), "target": {"activity_name": "c"}}]
+    apply_replacement_patches(data, patches)
+    assert data[0]["target_key"] == ("c", "GLO", "p", "kg")
+
+    lookup = {("a", "GLO", "p", "kg"): {}, ("c", "RoW", "p", "kg"): {}}
+    resolve_glo_row_rer_roe(data, "s", "t", lookup, lookup)
+    assert data[0]["target"]["geography"] == "RoW"
+    assert data[0]["target_key"] == ("c", "RoW", "p", "kg")
+
+
+def test_split_removes_stored_keys():
+    data = add_keys([{"source": ds("a"), "target": ds("b")}])
+    result = split_replace_disaggregate(data, {})
+    assert result["replace"] == [{"source": ds("a"), "target": ds("b")}]
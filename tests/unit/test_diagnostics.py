@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.wrangling import resolve_glo_row_rer_roe
+
+
+def test_diagnostics_unknown_category():
+    with pytest.raises(KeyError):
+        Diagnostics().add("foo", a=1)
+
+
+def test_diagnostics_summary_and_write(tmp_path):
+    diagnostics = Diagnostics()
+    assert diagnostics.summary() == "Diagnostics: nothing to report"
+    diagnostics.add("geography_corrected", kind="source", dataset={"a": 1})
+    diagnostics.add("geography_corrected", kind="target", dataset={"a": 2})
+    diagnostics.add("missing_target", database="db", dataset={"a": 3})
+    assert diagnostics.counts["geography_corrected"] == 2
+    assert diagnostics.summary() == "Diagnostics: 2 geography_corrected, 1 missing_target"
+
+    fp = diagnostics.write(tmp_path / "diagnostics.json")
+    report = json.load(open(fp))
+    assert set(report) == {"geography_corrected", "missing_target"}
+    assert report["missing_target"]["level"] == "WARNING"
+    assert report["missing_target"]["records"] == [{"database": "db", "dataset": {"a": 3}}]
+
+
+def test_resolve_glo_row_rer_roe_diagnostics():
+    def ds(geography):
+        return {"activity_name": "a", "geography": geography, "product_name": "p", "unit": "kg"}
+
+    data = [
+        {"source": ds("GLO"), "target": ds("RER")},
+        {"source": ds("GLO"), "target": ds("CH")},
+        {"source": ds("GLO"), "target": ds("CH")},
+    ]
+    source_lookup = {("a", "RoW", "p", "kg"): {}}
+    target_lookup = {("a", "RoE", "p", "kg"): {}}
+    diagnostics = Diagnostics()
+    result = resolve_glo_row_rer_roe(data, "s", "t", source_lookup, target_lookup, diagnostics)
+    assert result[0]["source"]["geography"] == "RoW"
+    assert result[0]["target"]["geography"] == "RoE"
+    assert diagnostics.counts["geography_corrected"] == 4
+    # Only reported once per missing target dataset
+    assert diagnostics.counts["missing_target"] == 1
@@ -0,0 +1,139 @@
+import threading
+
+import ecoinvent_interface.core
+import pytest
+import requests
+from ecoinvent_interface import CachedStorage, ReleaseType, Settings
+
+from ecoinvent_migrate import ei_release
+from ecoinvent_migrate.ei_release import (
+    CachedRelease,
+    PooledRelease,
+    clear_release_sessions,
+    get_ei_release,
+)
+from ecoinvent_migrate.errors import OfflineError
+
+
+class ListingRelease:
+    def __init__(self, storage):
+        self.storage = storage
+        self.calls = 0
+        self.fail = False
+
+    def list_versions(self):
+        self.calls += 1
+        if self.fail:
+            raise requests.ConnectionError("No network")
+        return ["3.9.1", "3.10"]
+
+    def list_extra_files(self, version):
+        return {f"Change Report {version}.xlsx": {}}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return CachedStorage(tmp_path / "storage")
+
+
+def test_cached_release_ttl(cache_directory, storage):
+    release = ListingRelease(storage)
+    cached = CachedRelease(release)
+    assert cached.list_versions() == ["3.9.1", "3.10"]
+    assert CachedRelease(release).list_versions() == ["3.9.1", "3.10"]
+    assert release.calls == 1
+
+    CachedRelease(release, ttl=0).list_versions()
+    assert release.calls == 2
+
+    release.fail = True
+    assert CachedRelease(release, ttl=0).list_versions() == ["3.9.1", "3.10"]
+    assert release.calls == 3
+
+
+def test_cached_release_concurrent_listings(cache_directory, storage):
+    versions = [f"3.{minor}" for minor in range(8)]
+    threads = [
+        threading.Thread(target=CachedRelease(ListingRelease(storage)).list_extra_files, args=(v,))
+        for v in versions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    offline = CachedRelease(storage=storage, offline=True)
+    for version in versions:
+        assert f"Change Report {version}.xlsx" in offline.list_extra_files(version)
+
+
+def test_cached_release_offline(cache_directory, storage, release_directory):
+    offline = CachedRelease(storage=storage, offline=True)
+    with pytest.raises(OfflineError):
+        offline.list_versions()
+    with pytest.raises(OfflineError):
+        offline.get_release("3.10", "cutoff", ReleaseType.ecospold)
+
+    CachedRelease(ListingRelease(storage)).list_versions()
+    assert offline.list_versions() == ["3.9.1", "3.10"]
+
+    storage.catalogue["ecoinvent 3.10_cutoff_ecoSpold02.7z"] = {"path": str(release_directory)}
+    assert offline.get_release("3.10", "cutoff", ReleaseType.ecospold) == release_directory
+    with pytest.raises(OfflineError):
+        offline.login()
+
+
+def test_get_ei_release_reuse(monkeypatch, tmp_path):
+    monkeypatch.setenv("EI_USERNAME", "user")
+    monkeypatch.setenv("EI_PASSWORD", "secret")
+    monkeypatch.setenv("EI_OUTPUT_PATH", str(tmp_path))
+    monkeypatch.delenv("ECOINVENT_MIGRATE_OFFLINE", raising=False)
+    clear_release_sessions()
+
+    release = get_ei_release()
+    assert get_ei_release() is release
+    assert get_ei_release(reuse=False) is not release
+    assert get_ei_release(offline=True) is not release
+    assert not any("secret" in key for key in ei_release._RELEASES)
+    monkeypatch.setenv("EI_PASSWORD", "other")
+    assert get_ei_release() is not release
+    clear_release_sessions()
+    assert get_ei_release() is not release
+
+
+class FakeResponse:
+    ok = True
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+def test_pooled_release_sessions(monkeypatch, tmp_path):
+    settings = Settings(username="user", password="secret", output_path=str(tmp_path))
+    first, second = PooledRelease(settings), PooledRelease(settings)
+    assert first.session is first.session
+    assert first.session is not second.session
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(first.session))
+    thread.start()
+    thread.join()
+    assert sessions[0] is not first.session
+
+    tokens = {"access_token": "access", "refresh_token": "refresh"}
+    monkeypatch.setattr(first.session, "post", lambda *args, **kwargs: FakeResponse(tokens))
+    monkeypatch.setattr(
+        first.session,
+        "get",
+        lambda url, headers, timeout: FakeResponse([{"version_name": "3.10"}]),
+    )
+    assert first.list_versions() == ["3.10"]
+    assert first.access_token == "access"
+    assert ecoinvent_interface.core.requests is requests
+
+    cached = CachedRelease(first)
+    cached.close()
+    assert first.session is not sessions[0]
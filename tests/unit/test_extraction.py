@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+from filelock import FileLock
+
+from ecoinvent_migrate import extraction
+from ecoinvent_migrate.cli import main
+from ecoinvent_migrate.data_io import load_release_data, release_lock_filepath
+from ecoinvent_migrate.extraction import load_releases
+
+RELEASES = [("3.9.1", "cutoff"), ("3.10", "cutoff"), ("3.10", "apos")]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_load_releases(cache_directory, fake_release, processes):
+    lookups = load_releases(RELEASES, release=fake_release, processes=processes, chunk_size=1)
+    assert list(lookups) == RELEASES
+    assert len(fake_release.calls) == 3
+    for version, system_model in RELEASES:
+        assert (cache_directory / f"ecoinvent-{version}-{system_model}.json").is_file()
+
+    # Cached releases are loaded without parsing
+    expected = load_release_data("3.10", "apos", release=fake_release)
+    assert lookups[("3.10", "apos")] == expected
+    assert ("baling", "GLO", "baling", "unit") in expected
+    assert load_releases(RELEASES, release=fake_release) == lookups
+    assert len(fake_release.calls) == 3
+
+
+def test_load_releases_from_archive(cache_directory, fake_release, release_archive):
+    fake_release.path = release_archive
+    lookups = load_releases(RELEASES[:2], release=fake_release, from_archive=True, processes=2)
+    assert [len(lookup) for lookup in lookups.values()] == [2, 2]
+    assert fake_release.calls[0] == ("3.9.1", "cutoff", False)
+
+
+def test_load_releases_busy(cache_directory, fake_release, release_archive, monkeypatch):
+    fake_release.path = release_archive
+    locked, done = threading.Event(), threading.Event()
+
+    def other_process():
+        with FileLock(release_lock_filepath("3.10", "cutoff")):
+            locked.set()
+            done.wait(timeout=10)
+
+    def load_busy(*args, **kwargs):
+        # Only called for busy releases; the other process finishes while we wait for the lock
+        done.set()
+        return load_release_data(*args, **kwargs)
+
+    monkeypatch.setattr(extraction, "load_release_data", load_busy)
+    thread = threading.Thread(target=other_process)
+    thread.start()
+    locked.wait(timeout=10)
+    lookups = load_releases([("3.10", "cutoff")], release=fake_release, from_archive=True)
+    thread.join()
+
+    assert done.is_set()
+    assert len(lookups[("3.10", "cutoff")]) == 2
+    assert fake_release.calls == [("3.10", "cutoff", False)]
+
+
+def test_extract_cli(cache_directory, fake_release, monkeypatch, capsys):
+    monkeypatch.setattr("ecoinvent_migrate.extraction.get_ei_release", lambda: fake_release)
+    assert main(["extract", "3.9.1", "3.10", "--processes", "1"]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        "3.9.1 cutoff: 2 datasets",
+        "3.10 cutoff: 2 datasets",
+    ]
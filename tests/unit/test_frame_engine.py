@@ -0,0 +1,84 @@
+import random
+from contextlib import nullcontext
+from copy import deepcopy
+
+import pytest
+
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.wrangling import (
+    add_keys,
+    resolve_glo_row_rer_roe,
+    split_replace_disaggregate,
+)
+
+
+def ds(name: str, geography: str) -> dict:
+    return {"activity_name": name, "geography": geography, "product_name": "p", "unit": "kg"}
+
+
+def synthetic_data(n: int = 300, seed: int = 7) -> tuple[list[dict], dict, dict]:
+    rng = random.Random(seed)
+    geographies = ["GLO", "RER", "CH", "RoW", "RoE"]
+    source_lookup, target_lookup, data = {}, {}, []
+    for index in range(n):
+        source = ds(f"s{rng.randint(0, n // 3)}", rng.choice(geographies))
+        target = ds(f"t{rng.randint(0, n // 2)}", rng.choice(geographies))
+        if rng.random() < 0.1:
+            target = dict(source)
+        for obj, lookup in ((source, source_lookup), (target, target_lookup)):
+            choice = rng.random()
+            geography = obj["geography"]
+            if choice < 0.6:
+                pass
+            elif choice < 0.8:
+                geography = {"GLO": "RoW", "RER": "RoE"}.get(geography, geography)
+            else:
+                continue
+            key = (obj["activity_name"], geography, "p", "kg")
+            lookup[key] = {"production_volume": rng.choice([0, -1, rng.random() * 100])}
+        data.append({"source": source, "target": target})
+    return data, source_lookup, target_lookup
+
+
+def test_resolve_engines_identical():
+    data, source_lookup, target_lookup = synthetic_data()
+    results, records = [], []
+    for engine in ("python", "pandas"):
+        diagnostics = Diagnostics()
+        given = add_keys(deepcopy(data))
+        with pytest.warns(UserWarning) if engine == "pandas" else nullcontext():
+            results.append(
+                resolve_glo_row_rer_roe(
+                    given, "s", "t", source_lookup, target_lookup, diagnostics, engine=engine
+                )
+            )
+        records.append(dict(diagnostics.records))
+    assert results[0] == results[1]
+    assert records[0] == records[1]
+    assert records[0]["geography_corrected"]
+    assert records[0]["missing_target"]
+
+
+@pytest.mark.parametrize("keys", [True, False])
+def test_split_engines_identical(keys):
+    data, _, target_lookup = synthetic_data()
+    if keys:
+        data = add_keys(data)
+    results, records = [], []
+    for engine in ("python", "pandas"):
+        diagnostics = Diagnostics()
+        with pytest.warns(UserWarning) if engine == "pandas" else nullcontext():
+            results.append(
+                split_replace_disaggregate(
+                    deepcopy(data), target_lookup, diagnostics, engine=engine
+                )
+            )
+        records.append(dict(diagnostics.records))
+    assert results[0] == results[1]
+    assert records[0] == records[1]
+    assert results[0]["replace"] and results[0]["disaggregate"]
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        split_replace_disaggregate([], {}, engine="polars")
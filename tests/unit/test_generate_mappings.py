@@ -0,0 +1,41 @@
+import threading
+
+from ecoinvent_migrate import main
+
+
+def test_generate_mappings(monkeypatch, fake_release):
+    calls = {}
+
+    def fake(kind):
+        def generator(**kwargs):
+            calls[kind] = kwargs | {"thread": threading.current_thread().name}
+            return kind
+
+        return generator
+
+    monkeypatch.setattr(main, "get_ei_release", lambda **kwargs: fake_release)
+    monkeypatch.setattr(main, "get_change_report", lambda **kwargs: "report.xlsx")
+    monkeypatch.setattr(main, "load_release_data", lambda version, **kwargs: {"version": version})
+    monkeypatch.setattr(main, "generate_technosphere_mapping", fake("technosphere"))
+    monkeypatch.setattr(main, "generate_biosphere_mapping", fake("biosphere"))
+
+    results = main.generate_mappings(
+        "3.9.1", "3.10", write_logs=False, biosphere_kwargs={"keep_deletions": True}
+    )
+
+    assert (results.technosphere, results.biosphere) == ("technosphere", "biosphere")
+    assert calls["technosphere"]["release"] is calls["biosphere"]["release"] is fake_release
+    assert calls["technosphere"]["change_report"] == "report.xlsx"
+    assert calls["technosphere"]["source_lookup"] == {"version": "3.9.1"}
+    assert calls["technosphere"]["target_lookup"] == {"version": "3.10"}
+    assert calls["biosphere"]["keep_deletions"]
+    assert calls["technosphere"]["thread"] != threading.current_thread().name
+    assert set(results.timings) == {
+        "release",
+        "change report",
+        "release data",
+        "technosphere",
+        "biosphere",
+        "total",
+    }
+    assert results.timing_report().startswith("Timings: ")
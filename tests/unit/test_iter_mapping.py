@@ -0,0 +1,54 @@
+from loguru import logger
+
+from ecoinvent_migrate import generate_technosphere_mapping, iter_technosphere_mapping
+from ecoinvent_migrate.wrangling import iter_split_replace_disaggregate, split_replace_disaggregate
+
+
+def ds(name: str) -> dict:
+    return {"name": name, "location": "GLO", "reference product": "p", "unit": "kg"}
+
+
+def pair(source: str, target: str) -> dict:
+    return {"source": ds(source), "target": ds(target)}
+
+
+def test_iter_split_replace_disaggregate_batches():
+    data = [pair("a", "b")] + [pair(str(i), str(i) + t) for i in range(5) for t in "xy"]
+    lookup = {}
+    result = list(iter_split_replace_disaggregate(data, lookup, batch_size=2))
+    assert [verb for verb, _ in result] == ["replace"] + ["disaggregate"] * 5
+    expected = split_replace_disaggregate(data, lookup)
+    assert [obj for verb, obj in result if verb == "disaggregate"] == expected["disaggregate"]
+
+
+def test_iter_technosphere_mapping(technosphere_inputs):
+    entries = list(iter_technosphere_mapping(write_logs=False, **technosphere_inputs))
+    assert [verb for verb, _ in entries] == ["replace", "disaggregate"]
+    replace, disaggregate = entries[0][1], entries[1][1]
+    assert replace["target"]["name"] == "baling, new"
+    assert [(t["name"], t["allocation"]) for t in disaggregate["targets"]] == [
+        ("straw a", 0.75),
+        ("straw b", 0.25),
+    ]
+
+    dp = generate_technosphere_mapping(write_logs=False, write_file=False, **technosphere_inputs)
+    assert dp.data == {"replace": [replace], "disaggregate": [disaggregate]}
+
+
+def test_iter_technosphere_mapping_run_context(technosphere_inputs):
+    records = []
+    sink_id = logger.add(lambda message: records.append(message.record), level="DEBUG")
+    try:
+        first = iter_technosphere_mapping(write_logs=False, **technosphere_inputs)
+        second = iter_technosphere_mapping(write_logs=False, **technosphere_inputs)
+        for iterator in (first, second, first, second):
+            next(iterator)
+            logger.info("consumer")
+        assert list(first) == list(second) == []
+        logger.info("consumer")
+    finally:
+        logger.remove(sink_id)
+
+    assert [r["extra"] for r in records if r["message"] == "consumer"] == [{}] * 5
+    run_ids = {r["extra"].get("run_id") for r in records if r["message"] != "consumer"}
+    assert None not in run_ids and len(run_ids) == 2
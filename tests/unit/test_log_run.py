@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+from loguru import logger
+
+from ecoinvent_migrate import utils
+from ecoinvent_migrate.utils import log_run
+
+
+def test_log_run_concurrent(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_STDERR_CONFIGURED", True)
+    monkeypatch.setattr(utils, "user_log_dir", lambda *args: str(tmp_path))
+    runs = {}
+
+    def work(label: str) -> None:
+        with log_run(write_logs=True) as run:
+            runs[label] = run
+            for index in range(20):
+                logger.debug("{label} message {index}", label=label, index=index)
+
+    threads = [threading.Thread(target=work, args=(label,)) for label in ("alpha", "beta")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert runs["alpha"].run_id != runs["beta"].run_id
+    assert runs["alpha"].logs_dir != runs["beta"].logs_dir
+    for label, other in (("alpha", "beta"), ("beta", "alpha")):
+        text = (runs[label].logs_dir / "debug.log").read_text()
+        assert text.count(f"{label} message") == 20
+        assert other not in text
+
+
+def test_log_run_removes_sinks(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "_STDERR_CONFIGURED", True)
+    monkeypatch.setattr(utils, "user_log_dir", lambda *args: str(tmp_path))
+    with log_run(write_logs=True) as run:
+        pass
+    logger.info("after the run")
+    assert "after the run" not in (run.logs_dir / "info.log").read_text()
+
+
+def test_log_run_no_files(monkeypatch):
+    monkeypatch.setattr(utils, "_STDERR_CONFIGURED", True)
+    with log_run(write_logs=False) as run:
+        assert run.logs_dir is None
+        assert run.sink_ids == []
+
+
+def test_configure_logs_deprecated(monkeypatch):
+    monkeypatch.setattr(utils, "_STDERR_CONFIGURED", True)
+    with pytest.deprecated_call():
+        utils.configure_logs(write_logs=False)
@@ -0,0 +1,67 @@
+import json
+
+from ecoinvent_migrate.cli import main
+from ecoinvent_migrate.migration_coverage import migration_coverage
+
+
+def ds(name: str, location: str = "GLO") -> dict:
+    return {"name": name, "location": location, "reference product": "p", "unit": "kg"}
+
+
+def key(name: str, location: str = "GLO") -> tuple:
+    return (name, location, "p", "kg")
+
+
+MIGRATION = {
+    "replace": [{"source": ds("a"), "target": ds("b")}],
+    "disaggregate": [
+        {
+            "source": ds("d"),
+            "targets": [ds("d", "CH") | {"allocation": 0.5}, ds("d", "RoW") | {"allocation": 0.5}],
+        }
+    ],
+}
+
+DATABASES = {
+    "first": [
+        {"exchanges": [ds("a"), ds("a"), ds("d"), ds("x"), ds("foreground")]},
+        {"exchanges": [ds("b")]},
+    ],
+    "second": [{"exchanges": [ds("x"), ds("y")]}],
+}
+
+
+def test_migration_coverage_inline():
+    reports = migration_coverage(
+        DATABASES,
+        MIGRATION,
+        source_keys={key("a"), key("b"), key("d"), key("x"), key("y")},
+        target_keys={key("b"), key("y")},
+        processes=1,
+    )
+    first = reports["first"]
+    assert (first.exchanges, first.replaced, first.disaggregated, first.dangling) == (5, 2, 1, 1)
+    assert first.unchanged == 1
+    assert first.unmatched == [key("x")]
+    assert reports["second"].dangling == 1
+
+
+def test_migration_coverage_processes(tmp_path):
+    databases = {}
+    for name, datasets in DATABASES.items():
+        databases[name] = tmp_path / f"{name}.json"
+        json.dump(datasets, open(databases[name], "w"))
+    reports = migration_coverage(databases, MIGRATION, processes=2)
+    assert reports["first"].exchanges == 6
+    assert reports["first"].replaced == 2
+    # No target keys, so can't detect dangling exchanges
+    assert reports["second"].dangling == 0
+
+
+def test_coverage_command(tmp_path, capsys):
+    migration = tmp_path / "migration.json"
+    json.dump(MIGRATION, open(migration, "w"))
+    database = tmp_path / "first.json"
+    json.dump(DATABASES["first"], open(database, "w"))
+    assert main(["coverage", str(migration), str(database), "--processes", "1"]) == 0
+    assert "first\t6\t2\t1\t0" in capsys.readouterr().out
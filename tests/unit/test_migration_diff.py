@@ -0,0 +1,64 @@
+import copy
+import json
+from pathlib import Path
+
+from ecoinvent_migrate.cli import main
+from ecoinvent_migrate.migration_diff import diff_migrations
+
+OUTPUTS = Path(__file__).parent.parent.parent / "outputs"
+
+OLD = {
+    "created": "2024-06-14T12:17:38",
+    "replace": [
+        {"source": {"name": "a"}, "target": {"name": "b"}, "comment": "x"},
+        {"source": {"name": "c"}, "target": {"name": "d"}},
+    ],
+    "disaggregate": [
+        {
+            "source": {"name": "e"},
+            "targets": [
+                {"name": "f", "allocation": 0.25},
+                {"name": "g", "allocation": 0.75},
+            ],
+        }
+    ],
+}
+
+
+def test_diff_migrations_unchanged():
+    new = copy.deepcopy(OLD)
+    new["created"] = "2025-01-01"
+    new["replace"][0]["comment"] = "y"
+    new["disaggregate"][0]["targets"][0]["allocation"] += 1e-9
+    new["disaggregate"][0]["targets"][1]["allocation"] -= 1e-9
+    new["replace"].reverse()
+    assert diff_migrations(OLD, new).ok
+
+
+def test_diff_migrations_changes():
+    new = copy.deepcopy(OLD)
+    new["replace"][1]["target"] = {"name": "h"}
+    new["replace"][0]["source"] = {"name": "i"}
+    new["disaggregate"][0]["targets"][0]["allocation"] = 0.3
+    new["disaggregate"][0]["targets"][1] = {"name": "j", "allocation": 0.7}
+
+    result = diff_migrations(OLD, new)
+    assert result.added == [("replace", {"name": "i"})]
+    assert result.removed == [("replace", {"name": "a"})]
+    assert [(c.verb, c.source) for c in result.changed] == [
+        ("disaggregate", {"name": "e"}),
+        ("replace", {"name": "c"}),
+    ]
+    assert len(result.changed[0].reasons) == 3
+    assert result.summary() == "1 added, 1 removed, 2 changed mappings"
+
+
+def test_diff_command(tmp_path, capsys):
+    fp = sorted(OUTPUTS.glob("*.json"))[0]
+    assert main(["diff", str(fp), str(fp)]) == 0
+
+    data = json.load(open(fp))
+    data["replace"].pop()
+    (tmp_path / "new.json").write_text(json.dumps(data))
+    assert main(["diff", str(fp), str(tmp_path / "new.json")]) == 1
+    assert "0 added, 1 removed, 0 changed mappings" in capsys.readouterr().out
@@ -0,0 +1,68 @@
+from ecoinvent_migrate.patches import available_patch_pairs, load_patches, normalize_labels
+from ecoinvent_migrate.wrangling import apply_replacement_patches, compile_replacement_patches
+
+LABELS = {"activity_name", "geography", "product_name", "unit"}
+
+
+def test_normalize_labels():
+    given = {"name": "a", "location": "b", "reference product": "c", "unit": "d"}
+    expected = {"activity_name": "a", "geography": "b", "product_name": "c", "unit": "d"}
+    assert normalize_labels(given) == expected
+
+
+def test_load_patches_missing_pair():
+    patches = load_patches("1.0", "1.1")
+    assert patches.missing == []
+    assert patches.replacement == []
+    assert patches.replacement_index == {}
+
+
+def test_load_patches_normalized_labels():
+    pairs = available_patch_pairs()
+    assert ("3.9.1", "3.10") in pairs
+    assert ("3.10.1", "3.11") in pairs
+    for source_version, target_version in pairs:
+        patches = load_patches(source_version, target_version)
+        for patch in patches.missing + patches.replacement:
+            assert set(patch["source"]) == LABELS
+            for target in patch.get("targets", [patch.get("target", {})]):
+                assert set(target).issubset(LABELS)
+
+
+def test_load_patches_cached():
+    assert load_patches("3.10.1", "3.11") is load_patches("3.10.1", "3.11")
+
+
+def test_compile_replacement_patches():
+    patches = load_patches("3.10.1", "3.11").replacement
+    index = compile_replacement_patches(patches)
+    assert sum(len(value) for value in index.values()) == len(patches)
+    key = ("target", ("market for straw", "RER", "straw", "kg"))
+    assert index[key] == [(0, patches[0])]
+
+
+def test_apply_replacement_patches_order():
+    given = [
+        {
+            "source": {"activity_name": "a", "geography": "GLO", "product_name": "p", "unit": "kg"},
+            "target": {"activity_name": "b", "geography": "GLO", "product_name": "p", "unit": "kg"},
+        }
+    ]
+    patches = [
+        {
+            "source": {"activity_name": "b", "geography": "GLO", "product_name": "p", "unit": "kg"},
+            "target": {"geography": "RoW"},
+            "context": "target",
+            "comment": "First",
+        },
+        {
+            "source": {"activity_name": "a", "geography": "GLO", "product_name": "p", "unit": "kg"},
+            "target": {"geography": "RoW"},
+            "context": "source",
+            "comment": "Second",
+        },
+    ]
+    result = apply_replacement_patches(given, patches)
+    assert result[0]["source"]["geography"] == "RoW"
+    assert result[0]["target"]["geography"] == "RoW"
+    assert result[0]["comment"] == "First. Patched with comment 'Second'."
@@ -0,0 +1,43 @@
+import math
+
+import pandas as pd
+
+from ecoinvent_migrate.production_volumes import production_volume_changes, write_table
+
+
+def lookup(*rows) -> dict:
+    return {
+        (name, "GLO", "p", "kg"): {
+            "activity_name": name,
+            "geography": "GLO",
+            "product_name": "p",
+            "unit": "kg",
+            "production_volume": volume,
+            "filename": f"{name}.spold",
+        }
+        for name, volume in rows
+    }
+
+
+def test_production_volume_changes():
+    df = production_volume_changes(
+        lookup(("a", 10), ("b", 4), ("c", 0), ("d", 1), ("e", 0)),
+        lookup(("a", 15), ("b", 4), ("c", 2), ("f", 3), ("e", 0)),
+    )
+    rows = {row["activity_name"]: row for row in df.to_dict(orient="records")}
+    assert len(df) == 6
+    assert rows["a"]["absolute_change"] == 5
+    assert rows["a"]["relative_change"] == 0.5
+    assert rows["b"]["relative_change"] == 0
+    assert math.isinf(rows["c"]["relative_change"])
+    assert rows["e"]["relative_change"] == 0
+    assert rows["d"]["status"] == "source only"
+    assert math.isnan(rows["d"]["target_volume"])
+    assert rows["f"]["status"] == "target only"
+    assert list(df["activity_name"][:2]) == ["c", "a"]
+
+
+def test_write_table(tmp_path):
+    df = production_volume_changes(lookup(("a", 1)), lookup(("a", 2)))
+    fp = write_table(df, tmp_path / "changes.csv")
+    assert pd.read_csv(fp)["relative_change"].tolist() == [1.0]
@@ -0,0 +1,156 @@
+import gzip
+import json
+import sys
+import threading
+from dataclasses import asdict
+
+import pytest
+import xmltodict
+
+from ecoinvent_migrate import utils
+from ecoinvent_migrate.biosphere import elementary_flows
+from ecoinvent_migrate.data_io import (
+    add_uuids_from_filename,
+    cached_releases,
+    load_release_data,
+    read_master_data,
+    release_lock_filepath,
+    soupinfo_for_file,
+    soupinfos_from_archive,
+)
+from ecoinvent_migrate.utils import atomic_write_json, read_json
+
+
+def test_soupinfo_for_file(release_directory):
+    result = asdict(soupinfo_for_file(release_directory / "datasets" / "a2_p2.spold"))
+    assert result == {
+        "activity_name": "market for straw",
+        "product_name": "straw",
+        "unit": "kg",
+        "geography": "RER",
+        "production_volume": 2.5,
+        "filename": "a2_p2.spold",
+        "activity_uuid": "a2",
+        "product_uuid": "p2",
+    }
+
+
+def test_soupinfos_from_archive(release_directory, release_archive):
+    from_files = sorted(
+        (asdict(soupinfo_for_file(fp)) for fp in (release_directory / "datasets").glob("*.spold")),
+        key=lambda x: x["filename"],
+    )
+    from_archive = sorted(soupinfos_from_archive(release_archive), key=lambda x: x["filename"])
+    assert len(from_archive) == 2
+    assert from_archive == from_files
+
+
+def test_atomic_write_json(tmp_path):
+    fp = atomic_write_json({"a": 1}, tmp_path / "data.json")
+    assert json.load(open(fp)) == {"a": 1}
+    assert list(tmp_path.iterdir()) == [fp]
+
+
+def test_load_release_data_concurrent(cache_directory, fake_release):
+    results = []
+
+    def work():
+        results.append(load_release_data("3.10", "cutoff", release=fake_release))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fake_release.calls) == 1
+    assert len(results) == 4
+    assert all(result == results[0] for result in results)
+    assert ("baling", "GLO", "baling", "unit") in results[0]
+
+
+def test_load_release_data_corrupted_cache(cache_directory, fake_release):
+    cache_directory.mkdir(parents=True)
+    (cache_directory / "ecoinvent-3.10-cutoff.json").write_text('[{"activity_name": ')
+    assert len(load_release_data("3.10", "cutoff", release=fake_release)) == 2
+    assert len(fake_release.calls) == 1
+    assert len(json.load(open(cache_directory / "ecoinvent-3.10-cutoff.json"))) == 2
+
+
+def test_add_uuids_from_filename():
+    given = {"filename": "a1_p1.spold"}
+    assert add_uuids_from_filename(given) == {
+        "filename": "a1_p1.spold",
+        "activity_uuid": "a1",
+        "product_uuid": "p1",
+    }
+
+
+def test_read_master_data(release_archive, fake_release):
+    from_directory = read_master_data("3.10", "ElementaryExchanges.xml", fake_release)
+    assert fake_release.calls == [("3.10", "cutoff", False)]
+
+    fake_release.path = release_archive
+    assert read_master_data("3.10", "ElementaryExchanges.xml", fake_release) == from_directory
+    flows = elementary_flows(xmltodict.parse(from_directory))
+    assert flows["e1"]["name"] == "Carbon dioxide, fossil"
+
+
+@pytest.mark.parametrize("suffix", [".json", ".json.gz"])
+def test_atomic_write_json_compressed(tmp_path, suffix):
+    fp = atomic_write_json({"a": [1, "ü"]}, tmp_path / f"data{suffix}")
+    assert read_json(fp) == {"a": [1, "ü"]}
+    assert list(tmp_path.iterdir()) == [fp]
+    if suffix == ".json.gz":
+        assert gzip.open(fp).read() == b'{"a": [1, "\\u00fc"]}'
+
+
+def test_atomic_write_json_zstd(tmp_path):
+    pytest.importorskip("backports.zstd" if sys.version_info < (3, 14) else "compression.zstd")
+    fp = atomic_write_json({"a": 1}, tmp_path / "data.json.zst")
+    assert read_json(fp) == {"a": 1}
+
+
+def test_load_release_data_compressed(cache_directory, fake_release, monkeypatch):
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "gzip")
+    first = load_release_data("3.10", "cutoff", release=fake_release)
+    assert (cache_directory / "ecoinvent-3.10-cutoff.json.gz").is_file()
+    assert not (cache_directory / "ecoinvent-3.10-cutoff.json").exists()
+
+    # Existing caches are read in any format
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "none")
+    assert load_release_data("3.10", "cutoff", release=fake_release) == first
+    assert len(fake_release.calls) == 1
+    assert [(version, fp.name) for version, _, fp in cached_releases()] == [
+        ("3.10", "ecoinvent-3.10-cutoff.json.gz")
+    ]
+
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "lz4")
+    with pytest.raises(ValueError):
+        load_release_data("3.10", "cutoff", release=fake_release)
+
+
+def test_load_release_data_corrupted_compressed_cache(cache_directory, fake_release, monkeypatch):
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "gzip")
+    cache_directory.mkdir(parents=True)
+    (cache_directory / "ecoinvent-3.10-cutoff.json.gz").write_bytes(gzip.compress(b"[{")[:-4])
+    assert len(load_release_data("3.10", "cutoff", release=fake_release)) == 2
+    assert len(read_json(cache_directory / "ecoinvent-3.10-cutoff.json.gz")) == 2
+
+
+def test_release_lock_independent_of_compression(cache_directory, monkeypatch):
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "gzip")
+    lock = release_lock_filepath("3.10", "cutoff")
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "none")
+    assert release_lock_filepath("3.10", "cutoff") == lock
+    assert lock.name == "ecoinvent-3.10-cutoff.lock"
+
+
+def test_load_release_data_zstd_unavailable(cache_directory, fake_release, monkeypatch):
+    first = load_release_data("3.10", "cutoff", release=fake_release)
+    monkeypatch.setattr(utils, "zstd", None)
+    monkeypatch.setenv("ECOINVENT_MIGRATE_CACHE_COMPRESSION", "zstd")
+    # Existing caches are read without zstd; only writing a new cache needs it
+    assert load_release_data("3.10", "cutoff", release=fake_release) == first
+    with pytest.raises(ImportError):
+        load_release_data("3.9.1", "cutoff", release=fake_release)
@@ -0,0 +1,69 @@
+from ecoinvent_migrate.release_diff import release_diff
+from ecoinvent_migrate.wrangling import split_replace_disaggregate, tuple_key_for_data
+
+
+def record(name, activity_uuid, product_uuid, geography="CH", product="p", pv=1.0):
+    return {
+        "activity_name": name,
+        "geography": geography,
+        "product_name": product,
+        "unit": "kg",
+        "production_volume": pv,
+        "filename": f"{activity_uuid}_{product_uuid}.spold",
+        "activity_uuid": activity_uuid,
+        "product_uuid": product_uuid,
+    }
+
+
+def lookup(*records):
+    return {tuple_key_for_data(obj): obj for obj in records}
+
+
+SOURCE = lookup(
+    record("unchanged", "a0", "p0"),
+    record("old name", "a1", "p1"),
+    record("old wheat", "a2", "p2"),
+    record("old barley", "a3", "p3"),
+    record("deleted", "a4", "p4"),
+)
+TARGET = lookup(
+    record("unchanged", "a0", "p0"),
+    record("new name", "a1", "p1", product="new product"),
+    record("new wheat", "b2", "p2"),
+    record("barley, winter", "b3", "p3", pv=3.0),
+    record("barley, spring", "c3", "p3", pv=1.0),
+    record("barley, elsewhere", "d3", "p3", geography="DE"),
+)
+
+
+def test_release_diff():
+    pairs = release_diff(SOURCE, TARGET)
+    by_source = {}
+    for obj in pairs:
+        by_source.setdefault(obj["source"]["activity_name"], []).append(obj)
+
+    assert set(by_source) == {"old name", "old wheat", "old barley"}
+    assert by_source["old name"][0]["target"] == {
+        "activity_name": "new name",
+        "geography": "CH",
+        "product_name": "new product",
+        "unit": "kg",
+    }
+    assert by_source["old name"][0]["comment"].endswith("changed activity name, product name")
+    assert [o["target"]["activity_name"] for o in by_source["old wheat"]] == ["new wheat"]
+    assert [o["target"]["activity_name"] for o in by_source["old barley"]] == [
+        "barley, spring",
+        "barley, winter",
+    ]
+
+
+def test_release_diff_keys():
+    keys = [tuple_key_for_data(SOURCE[("old wheat", "CH", "p", "kg")])]
+    assert len(release_diff(SOURCE, TARGET, keys=keys)) == 1
+
+
+def test_release_diff_split_replace_disaggregate():
+    result = split_replace_disaggregate(release_diff(SOURCE, TARGET), TARGET)
+    assert len(result["replace"]) == 2
+    (split,) = result["disaggregate"]
+    assert [t["allocation"] for t in split["targets"]] == [0.25, 0.75]
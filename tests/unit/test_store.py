@@ -0,0 +1,74 @@
+import warnings
+
+import pytest
+
+from ecoinvent_migrate.data_io import load_cached_release_data, load_release_data
+from ecoinvent_migrate.store import ReleaseStore
+from ecoinvent_migrate.wrangling import disaggregated, resolve_glo_row_rer_roe
+
+
+@pytest.fixture
+def store(cache_directory, fake_release):
+    load_release_data("3.10", "cutoff", release=fake_release)
+    store = ReleaseStore()
+    assert store.add_cached_releases() == [("3.10", "cutoff")]
+    yield store
+    store.close()
+
+
+def test_release_store_lookup(store):
+    lookup = store.lookup("3.10", "cutoff")
+    expected = load_cached_release_data("3.10", "cutoff")
+    assert len(lookup) == 2
+    assert set(lookup) == set(expected)
+    assert (
+        lookup[("baling", "GLO", "baling", "unit")] == expected[("baling", "GLO", "baling", "unit")]
+    )
+    assert ("baling", "RoW", "baling", "unit") not in lookup
+    assert lookup.by_filename("a2_p2.spold")["activity_name"] == "market for straw"
+    assert store.add_cached_releases() == []
+
+
+def test_release_store_missing_release(store):
+    with pytest.raises(KeyError):
+        store.lookup("3.11", "cutoff")
+
+
+def test_release_store_drop_in(store):
+    lookup = store.lookup("3.10", "cutoff")
+    data = [
+        {
+            "source": {
+                "activity_name": "baling",
+                "geography": "GLO",
+                "product_name": "baling",
+                "unit": "unit",
+            },
+            "target": {
+                "activity_name": "baling",
+                "geography": "GLO",
+                "product_name": "baling",
+                "unit": "unit",
+            },
+        }
+    ]
+    assert resolve_glo_row_rer_roe(data, "a", "b", lookup, lookup) == data
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert resolve_glo_row_rer_roe(data, "a", "b", lookup, lookup, engine="pandas") == data
+    result = disaggregated(
+        [
+            {"source": {"a": 1}, "target": data[0]["target"]},
+            {
+                "source": {"a": 1},
+                "target": {
+                    "activity_name": "market for straw",
+                    "geography": "RER",
+                    "product_name": "straw",
+                    "unit": "kg",
+                },
+            },
+        ],
+        lookup,
+    )
+    assert [obj["allocation"] for obj in result["targets"]] == [0.8, 0.2]
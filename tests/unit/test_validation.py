@@ -0,0 +1,83 @@
+from ecoinvent_migrate.diagnostics import Diagnostics
+from ecoinvent_migrate.patches import PatchSet
+from ecoinvent_migrate.validation import validate_migration, validate_patches
+
+
+def ds(name: str, geography: str = "GLO", product: str = "p") -> dict:
+    return {"activity_name": name, "geography": geography, "product_name": product, "unit": "kg"}
+
+
+def key(name: str, geography: str = "GLO", product: str = "p") -> tuple:
+    return (name, geography, product, "kg")
+
+
+def test_validate_patches_ok():
+    patches = PatchSet(
+        source_version="1",
+        target_version="2",
+        missing=[{"source": ds("a"), "target": {"activity_name": "b"}}],
+        replacement=[
+            {"source": ds("c"), "target": {"geography": "RoW"}, "context": "target"},
+        ],
+    )
+    report = validate_patches(
+        patches, source_lookup={key("a"): {}}, target_lookup={key("b"): {}, key("c", "RoW"): {}}
+    )
+    assert report.ok
+
+
+def test_validate_patches_problems():
+    patches = PatchSet(
+        source_version="1",
+        target_version="2",
+        missing=[
+            {"source": ds("a"), "target": {"activity_name": "b"}},
+            {"source": ds("a"), "targets": [{"activity_name": "b"}, {"activity_name": "x"}]},
+        ],
+        replacement=[
+            {"source": ds("c"), "target": {"geography": "RoW"}, "context": "source"},
+            {"source": ds("c"), "target": {"geography": "RoE"}, "context": "source"},
+        ],
+    )
+    report = validate_patches(patches, source_lookup={key("a"): {}}, target_lookup={key("b"): {}})
+    assert not report.ok
+    assert report.dangling_sources == [key("c", "RoE"), key("c", "RoW")]
+    assert report.missing_targets == [key("x")]
+    assert report.overlapping == [("missing", key("a")), ("source", key("c"))]
+    assert "1 missing targets" in report.summary()
+
+
+def relabeled(name: str, allocation=None) -> dict:
+    obj = {"name": name, "location": "GLO", "reference product": "p", "unit": "kg"}
+    if allocation is not None:
+        obj["allocation"] = allocation
+    return obj
+
+
+def test_validate_migration():
+    data = {
+        "replace": [
+            {"source": relabeled("a"), "target": relabeled("b")},
+            {"source": relabeled("c"), "target": relabeled("missing")},
+        ],
+        "disaggregate": [
+            {"source": relabeled("d"), "targets": [relabeled("b", 0.25), relabeled("e", 0.75)]},
+            {"source": relabeled("f"), "targets": [relabeled("b", 0.5), relabeled("e", 0.4)]},
+        ],
+    }
+    report = validate_migration(data, target_lookup={key("b"): {}, key("e"): {}})
+    assert report.missing_targets == [key("missing")]
+    assert [(source, round(total, 6)) for source, total in report.bad_allocations] == [
+        (key("f"), 0.9)
+    ]
+    assert not report.ok
+
+    diagnostics = Diagnostics()
+    report.annotate(diagnostics)
+    assert diagnostics.counts["invalid_migration_target"] == 1
+    assert diagnostics.counts["invalid_allocation"] == 1
+
+
+def test_validate_migration_ok():
+    data = {"replace": [{"source": relabeled("a"), "target": relabeled("b")}]}
+    assert validate_migration(data, target_lookup={key("b"): {}}).ok